@@ -0,0 +1,358 @@
+from __future__ import annotations
+
+import asyncio
+from pathlib import Path
+from typing import AsyncIterator, NamedTuple, Any
+
+import aiohttp
+
+from client import DEFAULT_ITEM_FIELDS, YandexSettings, is_dir_exists_error, listing_fields
+from models import Resource
+from ratelimit import AdaptiveRateLimiter
+from retry import DEFAULT_RETRY_POLICIES, RetryBudget, RetryPolicy, async_call_with_retry
+
+RETRYABLE_EXCEPTIONS = (aiohttp.ClientConnectionError, asyncio.TimeoutError)
+
+
+class _HrefRefused(Exception):
+    """API не выдал ссылку для загрузки; ответ возвращается вызывающему как есть"""
+
+    def __init__(self, response: aiohttp.ClientResponse) -> None:
+        super().__init__(response.status)
+        self.response = response
+
+
+class AsyncListFilesResult(NamedTuple):
+    """Результат получения списка файлов асинхронным клиентом."""
+
+    response: aiohttp.ClientResponse
+    files: list[Resource] | None
+
+
+class AsyncTransferResult(NamedTuple):
+    """
+    Результат передачи одного файла или создания папки асинхронным клиентом.
+    response равен None, если запрос не понадобился (папка уже существует).
+    """
+
+    local_path: Path
+    remote_path: Path
+    response: aiohttp.ClientResponse | None
+    error: Exception | None = None
+
+    @property
+    def ok(self) -> bool:
+        """Передача завершилась без исключения и с успешным кодом ответа"""
+        return self.error is None and (
+            self.response is None or self.response.status in (200, 201, 202)
+        )
+
+
+class AsyncYandexDiskClient:
+    """Асинхронный клиент для работы с Яндекс Диском на aiohttp"""
+
+    def __init__(
+            self,
+            settings: YandexSettings | None = None,
+            pool_maxsize: int = 100,
+            pool_per_host: int = 0,
+            keep_alive: bool = True,
+            retry_policies: dict[str, RetryPolicy] | None = None,
+            retry_budget: RetryBudget | None = None,
+            rate_limiter: AdaptiveRateLimiter | None = None,
+    ) -> None:
+        """
+        settings - настройки подключения (по умолчанию читаются из yandexSettings.env),
+        pool_maxsize - общий лимит одновременных соединений,
+        pool_per_host - лимит соединений к одному хосту (0 - без ограничения),
+        keep_alive - переиспользовать соединения между запросами,
+        retry_policies - политики повторов по видам операций поверх DEFAULT_RETRY_POLICIES,
+        retry_budget - общий лимит повторов (можно разделить между несколькими клиентами),
+        rate_limiter - ограничитель частоты запросов к API (не к серверам данных).
+        """
+        self._settings = settings or YandexSettings()  # type: ignore
+        self._base_url = self._settings.base_url
+        self._headers = {
+            "Authorization": f"OAuth {self._settings.access_token}",
+            "Accept": "application/json",
+        }
+        self._pool_maxsize = pool_maxsize
+        self._pool_per_host = pool_per_host
+        self._keep_alive = keep_alive
+        self._session: aiohttp.ClientSession | None = None
+        self._retry_policies = {**DEFAULT_RETRY_POLICIES, **(retry_policies or {})}
+        self._retry_budget = retry_budget or RetryBudget()
+        self._rate_limiter = rate_limiter or AdaptiveRateLimiter()
+
+    async def __aenter__(self) -> AsyncYandexDiskClient:
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        """Закрывает сессию и все соединения пула"""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Сессия создается лениво, уже внутри работающего цикла событий"""
+        if self._session is None:
+            connector = aiohttp.TCPConnector(
+                limit=self._pool_maxsize,
+                limit_per_host=self._pool_per_host,
+                force_close=not self._keep_alive,
+            )
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    async def _request(
+            self, method: str, url: str, operation: str = "api", stream: bool = False, **kwargs: Any
+    ) -> aiohttp.ClientResponse:
+        """
+        Выполняет HTTP-запрос и читает тело ответа целиком.
+        При stream=True тело не читается: его читает и освобождает соединение вызывающий код.
+        Повторы определяются политикой для operation (см. DEFAULT_RETRY_POLICIES),
+        запросы к API (operation="api") дополнительно проходят через ограничитель частоты.
+        """
+        async def send() -> aiohttp.ClientResponse:
+            if operation == "api":
+                await self._rate_limiter.acquire_async()
+            response = await self._get_session().request(method, url, **kwargs)
+            if not stream:
+                async with response:
+                    await response.read()
+            if operation == "api":
+                self._rate_limiter.on_response(response.status)
+            return response
+
+        return await async_call_with_retry(
+            send, self._retry_policies[operation], self._retry_budget, RETRYABLE_EXCEPTIONS
+        )
+
+    async def check_disk_access(self) -> aiohttp.ClientResponse:
+        """Проверка доступности Диска"""
+        return await self._request("GET", self._base_url, headers=self._headers)
+
+    async def _ensure_path_exists(self, remote_path: Path | None) -> bool:
+        """
+        Рекурсивно создает путь к файлу/папке, если его не существует.
+        Папки создаются без предварительной проверки, как в YandexDiskClient.
+        """
+        if not remote_path:
+            return True
+
+        current_path = ""
+        for part in remote_path.parts:
+            if not part or part == "/":
+                continue
+
+            current_path = f"{current_path}/{part}" if current_path else part
+            response = await self._make_dir(current_path)
+            if response is not None and response.status not in (200, 201):
+                raise Exception(
+                    f"Ошибка при создании папки {current_path}: {response.status} - {await response.text()}"
+                )
+
+        return True
+
+    async def _make_dir(self, remote_path: Path | str) -> aiohttp.ClientResponse | None:
+        """Создает одну папку; None, если она уже существует"""
+        url = f"{self._base_url}{self._settings.resources_endpoint}?path={remote_path}"
+        response = await self._request("PUT", url, headers=self._headers)
+        if is_dir_exists_error(response.status, await response.text()):
+            return None
+        return response
+
+    async def upload_file(
+            self, local_path: Path | None, remote_path: Path | None, create_new_version: bool = False
+    ) -> aiohttp.ClientResponse:
+        """Загрузка файла на Диск"""
+        if create_new_version:
+            raise NotImplementedError("Яндекс.Диск не поддерживает версионирование")
+        if not local_path:
+            raise ValueError("Локальный путь не может быть None")
+        if not local_path.exists():
+            raise FileNotFoundError(f"Локальный файл не найден: {local_path}")
+
+        async def attempt() -> aiohttp.ClientResponse:
+            url = f"{self._base_url}{self._settings.upload_endpoint}?path={remote_path}&overwrite=true"
+            response = await self._request("GET", url, headers=self._headers)
+            if response.status != 200:
+                raise _HrefRefused(response)
+
+            upload_url = (await response.json()).get("href")
+            if not upload_url:
+                raise Exception("Не удалось получить URL для загрузки")
+
+            with open(local_path, "rb") as f:
+                form = aiohttp.FormData()
+                form.add_field("file", f, filename=local_path.name)
+                return await self._request("PUT", upload_url, operation="upload_data", data=form)
+
+        try:
+            return await async_call_with_retry(
+                attempt, self._retry_policies["upload"], self._retry_budget, RETRYABLE_EXCEPTIONS
+            )
+        except _HrefRefused as e:
+            return e.response
+
+    async def upload_folder(
+            self, local_folder: Path | None, remote_folder: Path | None, jobs: int = 16
+    ) -> list[AsyncTransferResult]:
+        """
+        Рекурсивная загрузка папки с содержимым.
+        Папки создаются по уровням вложенности до загрузки файлов,
+        одновременно выполняется не более jobs загрузок.
+        """
+        if not local_folder:
+            raise ValueError("Локальная папка не может быть None")
+        if not local_folder.is_dir():
+            raise NotADirectoryError(f"Локальная папка не найдена: {local_folder}")
+        if jobs < 1:
+            raise ValueError("Количество одновременных загрузок должно быть положительным")
+
+        await self._ensure_path_exists(remote_folder)
+
+        folders: list[tuple[Path, Path]] = []
+        files: list[tuple[Path, Path]] = []
+        for item in local_folder.rglob("*"):
+            relative_path = item.relative_to(local_folder)
+            remote_item_path = Path(remote_folder) / relative_path if remote_folder else relative_path
+            if item.is_dir():
+                folders.append((item, remote_item_path))
+            else:
+                files.append((item, remote_item_path))
+
+        results = []
+        folders.sort(key=lambda pair: len(pair[1].parts))
+        for local_item, remote_item_path in folders:
+            try:
+                response = await self._make_dir(remote_item_path)
+            except Exception as e:
+                results.append(AsyncTransferResult(local_item, remote_item_path, None, e))
+            else:
+                results.append(AsyncTransferResult(local_item, remote_item_path, response))
+
+        semaphore = asyncio.Semaphore(jobs)
+
+        async def upload_one(local_path: Path, remote_path: Path) -> AsyncTransferResult:
+            async with semaphore:
+                try:
+                    response = await self.upload_file(local_path, remote_path)
+                except Exception as e:
+                    return AsyncTransferResult(local_path, remote_path, None, e)
+                return AsyncTransferResult(local_path, remote_path, response)
+
+        results.extend(await asyncio.gather(*(upload_one(*pair) for pair in files)))
+        return results
+
+    async def download_file(self, remote_path: Path | None, local_path: Path | None) -> aiohttp.ClientResponse:
+        """Скачивание файла с Диска"""
+        if not remote_path:
+            raise ValueError("Не указан путь к файлу на Яндекс Диске")
+
+        url = f"{self._base_url}{self._settings.download_endpoint}?path={remote_path}"
+        response = await self._request("GET", url, headers=self._headers)
+
+        if response.status != 200:
+            error_msg = (await response.json()).get("message", "Ошибка")
+            raise Exception(f"Яндекс.Диск вернул ошибку: {error_msg} (код {response.status})")
+
+        download_url = (await response.json()).get("href")
+        if not download_url:
+            raise Exception("Не удалось получить URL для скачивания")
+
+        download_path = Path(local_path) if local_path else Path(remote_path.name)
+        download_path.parent.mkdir(parents=True, exist_ok=True)
+
+        file_response = await self._request("GET", download_url, operation="download", stream=True)
+        async with file_response:
+            if file_response.status != 200:
+                raise Exception(f"Ошибка при загрузке файла: {file_response.status}")
+
+            with download_path.open("wb") as f:
+                async for chunk in file_response.content.iter_chunked(65536):
+                    f.write(chunk)
+
+        return file_response
+
+    async def list_files(
+            self, remote_path: Path | None = None, page_size: int = 1000, fields: str | None = DEFAULT_ITEM_FIELDS
+    ) -> AsyncListFilesResult:
+        """
+        Получение полного списка файлов в папке Диска (все страницы).
+        fields - какие поля элементов запрашивать (None - все).
+        """
+        path_to_list = str(remote_path) if remote_path else ""
+        response = await self._files_page(path_to_list, 0, page_size, fields)
+
+        if response.status != 200:
+            return AsyncListFilesResult(response=response, files=None)
+
+        items = [item async for item in self._iter_pages(path_to_list, page_size, fields, response)]
+        return AsyncListFilesResult(response=response, files=items)
+
+    async def iter_files(
+            self, remote_path: Path | None = None, page_size: int = 1000, fields: str | None = DEFAULT_ITEM_FIELDS
+    ) -> AsyncIterator[Resource]:
+        """
+        Постранично перебирает содержимое папки Диска.
+        Следующая страница запрашивается в фоне, пока вызывающий код обрабатывает текущую.
+        fields - какие поля элементов запрашивать (None - все).
+        """
+        path_to_list = str(remote_path) if remote_path else ""
+        response = await self._files_page(path_to_list, 0, page_size, fields)
+        async for item in self._iter_pages(path_to_list, page_size, fields, response):
+            yield item
+
+    async def _files_page(
+            self, path_to_list: str, offset: int, limit: int, fields: str | None = None
+    ) -> aiohttp.ClientResponse:
+        """Запрашивает одну страницу содержимого папки"""
+        url = f"{self._base_url}{self._settings.resources_endpoint}"
+        params: dict[str, Any] = {"path": path_to_list, "offset": offset, "limit": limit}
+        if fields is not None:
+            params["fields"] = listing_fields(fields)
+        return await self._request(
+            "GET",
+            url,
+            headers=self._headers,
+            params=params,
+        )
+
+    async def _iter_pages(
+            self, path_to_list: str, page_size: int, fields: str | None, response: aiohttp.ClientResponse
+    ) -> AsyncIterator[Resource]:
+        """Отдает элементы начиная с уже полученной страницы, подгружая следующие заранее"""
+        offset = 0
+        while True:
+            if response.status != 200:
+                raise aiohttp.ClientResponseError(
+                    response.request_info,
+                    response.history,
+                    status=response.status,
+                    message=f"Ошибка получения списка файлов: {await response.text()}",
+                )
+
+            embedded = (await response.json()).get("_embedded", {})
+            items = embedded.get("items", [])
+            total = embedded.get("total", 0)
+            offset += len(items)
+
+            next_page = None
+            if items and offset < total:
+                next_page = asyncio.create_task(self._files_page(path_to_list, offset, page_size, fields))
+
+            try:
+                for item in items:
+                    yield Resource.from_json(item)
+            except BaseException:
+                if next_page is not None:
+                    next_page.cancel()
+                raise
+
+            if next_page is None:
+                return
+            response = await next_page
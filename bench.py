@@ -0,0 +1,287 @@
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, NamedTuple
+
+from client import YandexDiskClient, YandexSettings
+from stub_server import StubDiskServer
+
+KB = 1024
+MB = 1024 * KB
+BASELINE_TOLERANCE = 0.10
+
+
+class BenchResult(NamedTuple):
+    """Результат одного сценария бенчмарка."""
+
+    name: str
+    seconds: float
+    ops: int
+    bytes: int
+    requests: dict[str, int]
+    peak_rss_kb: int | None
+
+    @property
+    def ops_per_sec(self) -> float:
+        return self.ops / self.seconds if self.seconds else 0.0
+
+    @property
+    def mb_per_sec(self) -> float:
+        return self.bytes / MB / self.seconds if self.seconds else 0.0
+
+    @property
+    def requests_per_op(self) -> float:
+        return sum(self.requests.values()) / self.ops if self.ops else 0.0
+
+
+class _Scenario(NamedTuple):
+    name: str
+    prepare: Callable[[StubDiskServer, Path], None]
+    run: Callable[[YandexDiskClient, Path], tuple[int, int]]
+
+
+def _peak_rss_kb() -> int | None:
+    """
+    Пиковый RSS процесса в КБ; None там, где его не узнать.
+    Это максимум за всю жизнь процесса, поэтому клиент каждого сценария работает в своем процессе,
+    а заглушка и подготовка данных остаются в родительском. В Linux берется VmHWM:
+    ru_maxrss дочернего процесса включает пик родителя на момент fork.
+    """
+    try:
+        with open("/proc/self/status", encoding="ascii") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // KB if sys.platform == "darwin" else peak
+
+
+def _write_files(folder: Path, count: int, size: int) -> list[Path]:
+    folder.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for i in range(count):
+        path = folder / f"file_{i:06d}.bin"
+        path.write_bytes(os.urandom(size))
+        paths.append(path)
+    return paths
+
+
+def _seed_folder(server: StubDiskServer, folder: str, count: int, size: int) -> None:
+    """Наполняет Диск заглушки напрямую, минуя HTTP"""
+    state = server.state
+    with state.lock:
+        state.dirs.setdefault(folder, "2024-01-01T00:00:00+00:00")
+        payload = os.urandom(size)
+        for i in range(count):
+            state.store(f"{folder}/file_{i:06d}.bin", payload)
+
+
+def _scenarios(scale: float, jobs: int) -> list[_Scenario]:
+    def n(count: int) -> int:
+        return max(1, int(count * scale))
+
+    def list_prepare(server: StubDiskServer, workdir: Path) -> None:
+        _seed_folder(server, "bench_list", n(20000), 0)
+
+    def list_run(client: YandexDiskClient, workdir: Path) -> tuple[int, int]:
+        files = client.list_files(Path("bench_list")).files or []
+        return len(files), 0
+
+    def small_prepare(server: StubDiskServer, workdir: Path) -> None:
+        _write_files(workdir / "small", n(200), 4 * KB)
+        _seed_folder(server, "bench_small", 0, 0)
+
+    def small_run(client: YandexDiskClient, workdir: Path) -> tuple[int, int]:
+        paths = sorted((workdir / "small").iterdir())
+        for path in paths:
+            client.upload_file(path, Path("bench_small") / path.name)
+        return len(paths), sum(path.stat().st_size for path in paths)
+
+    def large_prepare(server: StubDiskServer, workdir: Path) -> None:
+        _write_files(workdir / "large", 1, n(128) * MB)
+
+    def large_run(client: YandexDiskClient, workdir: Path) -> tuple[int, int]:
+        path = next((workdir / "large").iterdir())
+        client.upload_file(path, Path(path.name))
+        return 1, path.stat().st_size
+
+    def wide_prepare(server: StubDiskServer, workdir: Path) -> None:
+        for i in range(n(20)):
+            _write_files(workdir / "wide" / f"dir_{i:03d}", 25, 2 * KB)
+
+    def wide_run(client: YandexDiskClient, workdir: Path) -> tuple[int, int]:
+        results = client.upload_folder(workdir / "wide", Path("bench_wide"), jobs=jobs)
+        return len(results), sum(r.local_path.stat().st_size for r in results if r.local_path.is_file())
+
+    def deep_prepare(server: StubDiskServer, workdir: Path) -> None:
+        folder = workdir / "deep"
+        for i in range(n(30)):
+            folder = folder / f"level_{i:02d}"
+            _write_files(folder, 5, 2 * KB)
+
+    def deep_run(client: YandexDiskClient, workdir: Path) -> tuple[int, int]:
+        results = client.upload_folder(workdir / "deep", Path("bench_deep"), jobs=jobs)
+        return len(results), sum(r.local_path.stat().st_size for r in results if r.local_path.is_file())
+
+    def download_case(size: int, count: int) -> tuple[Callable, Callable]:
+        folder = f"bench_download_{size}"
+
+        def prepare(server: StubDiskServer, workdir: Path) -> None:
+            _seed_folder(server, folder, count, size)
+
+        def run(client: YandexDiskClient, workdir: Path) -> tuple[int, int]:
+            for i in range(count):
+                client.download_file(Path(folder) / f"file_{i:06d}.bin", workdir / folder / f"file_{i:06d}.bin")
+            return count, count * size
+
+        return prepare, run
+
+    scenarios = [
+        _Scenario("list_files_large_folder", list_prepare, list_run),
+        _Scenario("upload_file_small", small_prepare, small_run),
+        _Scenario("upload_file_large", large_prepare, large_run),
+        _Scenario("upload_folder_wide", wide_prepare, wide_run),
+        _Scenario("upload_folder_deep", deep_prepare, deep_run),
+    ]
+    for label, size, count in (("4k", 4 * KB, n(200)), ("1m", MB, n(50)), ("64m", 64 * MB, max(1, n(2)))):
+        prepare, run = download_case(size, count)
+        scenarios.append(_Scenario(f"download_file_{label}", prepare, run))
+    return scenarios
+
+
+def _run_client(
+        name: str, scale: float, jobs: int, settings: YandexSettings, workdir: Path
+) -> tuple[float, int, int, int | None]:
+    """
+    Выполняет замеряемую часть сценария; вызывается в отдельном процессе без заглушки,
+    чтобы пиковый RSS относился только к клиенту. Возвращает время, операции, байты и RSS.
+    """
+    scenario = next(scenario for scenario in _scenarios(scale, jobs) if scenario.name == name)
+    with YandexDiskClient(settings) as client:
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            ops, size = scenario.run(client, workdir)
+        elapsed = time.perf_counter() - started
+    return elapsed, ops, size, _peak_rss_kb()
+
+
+def _run_scenario(
+        scenario: _Scenario,
+        scale: float,
+        jobs: int,
+        latency: float,
+        bandwidth: float | None,
+        api_rate_limit: float | None,
+) -> BenchResult:
+    """Готовит данные в заглушке текущего процесса и прогоняет клиент сценария в новом процессе"""
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as tmp, \
+            StubDiskServer(latency=latency, bandwidth=bandwidth, api_rate_limit=api_rate_limit) as server, \
+            ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        workdir = Path(tmp)
+        scenario.prepare(server, workdir)
+        before = Counter(server.requests)
+        future = executor.submit(_run_client, scenario.name, scale, jobs, server.settings(), workdir)
+        elapsed, ops, size, peak_rss_kb = future.result()
+        delta = Counter(server.requests) - before
+    # счетчики *_bytes заглушки - объем данных, а не запросы
+    requests = {name: count for name, count in delta.items() if not name.endswith("_bytes")}
+    return BenchResult(scenario.name, elapsed, ops, size, requests, peak_rss_kb)
+
+
+def run_benchmarks(
+        scale: float = 1.0,
+        jobs: int = 8,
+        latency: float = 0.0,
+        bandwidth: float | None = None,
+        only: list[str] | None = None,
+        api_rate_limit: float | None = None,
+) -> list[BenchResult]:
+    """Прогоняет сценарии против локальной заглушки API, клиент каждого - в новом процессе, и возвращает замеры"""
+    results = []
+    for scenario in _scenarios(scale, jobs):
+        if only and not any(pattern in scenario.name for pattern in only):
+            continue
+        results.append(_run_scenario(scenario, scale, jobs, latency, bandwidth, api_rate_limit))
+    return results
+
+
+def _to_json(results: list[BenchResult]) -> dict[str, dict[str, float]]:
+    return {
+        result.name: {
+            "seconds": result.seconds,
+            "ops_per_sec": result.ops_per_sec,
+            "mb_per_sec": result.mb_per_sec,
+            "requests_per_op": result.requests_per_op,
+        }
+        for result in results
+    }
+
+
+def print_report(results: list[BenchResult], baseline: dict[str, dict[str, float]] | None = None) -> list[str]:
+    """Печатает таблицу замеров и возвращает сценарии, ставшие медленнее базовой линии"""
+    regressions = []
+    print(f"{'scenario':<26} {'ops/s':>10} {'MB/s':>9} {'req/op':>7} {'rss MB':>7}  requests")
+    for result in results:
+        rss = f"{result.peak_rss_kb / KB:.0f}" if result.peak_rss_kb else "-"
+        line = (
+            f"{result.name:<26} {result.ops_per_sec:>10.1f} {result.mb_per_sec:>9.1f} "
+            f"{result.requests_per_op:>7.2f} {rss:>7}  {result.requests}"
+        )
+        reference = (baseline or {}).get(result.name)
+        if reference and reference.get("ops_per_sec"):
+            change = result.ops_per_sec / reference["ops_per_sec"] - 1
+            line += f"  {change:+.0%} vs baseline"
+            if change < -BASELINE_TOLERANCE:
+                regressions.append(result.name)
+        print(line)
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк клиента Яндекс Диска на локальной заглушке API")
+    parser.add_argument("--scale", type=float, default=1.0, help="Множитель количества и размера данных")
+    parser.add_argument("--jobs", type=int, default=8, help="Количество потоков для upload_folder")
+    parser.add_argument("--latency", type=float, default=0.002, help="Задержка ответа заглушки в секундах")
+    parser.add_argument("--bandwidth", type=float, help="Скорость передачи заглушки в байтах в секунду")
+    parser.add_argument("--api-rate-limit", type=float, help="Лимит запросов к API заглушки в секунду")
+    parser.add_argument("--only", nargs="*", help="Запустить только сценарии, содержащие эти подстроки")
+    parser.add_argument("--baseline", help="JSON с базовыми замерами для сравнения")
+    parser.add_argument("--save-baseline", help="Сохранить замеры в JSON как новую базовую линию")
+    args = parser.parse_args()
+
+    results = run_benchmarks(
+        args.scale, args.jobs, args.latency, args.bandwidth, args.only, args.api_rate_limit
+    )
+
+    baseline = None
+    if args.baseline and Path(args.baseline).exists():
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+    regressions = print_report(results, baseline)
+
+    if args.save_baseline:
+        Path(args.save_baseline).write_text(json.dumps(_to_json(results), indent=2), encoding="utf-8")
+    if regressions:
+        print(f"Замедление больше {BASELINE_TOLERANCE:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
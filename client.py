@@ -1,18 +1,286 @@
 from __future__ import annotations
 
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import NamedTuple, Any
+from typing import Callable, Iterable, Iterator, NamedTuple, Any, TYPE_CHECKING
 
 import requests
 from pydantic_settings import BaseSettings, SettingsConfigDict
+from requests.adapters import HTTPAdapter
 from requests.models import Response
 
+from compression import (
+    ORIGINAL_MD5, ORIGINAL_SIZE, PROPERTY_NAME, Codec, StreamDecompressor, by_local_name, codec_for_name,
+    get_codec, is_compressible, iter_compressed, marked_codec, original_content,
+)
+from metrics import RequestMetrics, TimedHTTPAdapter
+from models import Resource, ResourceColumns
+from packing import (
+    PACK_DIR, PACK_SIZE, WHOLE_ARCHIVE_RATIO, Manifest, ManifestEntry, Pack, PackStream, build_manifest,
+    extract_archive, extract_range, latest_entries, plan_packs, plan_ranges, read_manifest, safe_target,
+)
+from ratelimit import AdaptiveRateLimiter
+from retry import DEFAULT_RETRY_POLICIES, RetryBudget, RetryPolicy, call_with_retry
+
+if TYPE_CHECKING:
+    from disk_index import DiskIndex
+
+
+LARGE_FILE_THRESHOLD = 64 * 1024 * 1024
+RESUME_ATTEMPTS = 5
+MIN_SEGMENT_SIZE = 1024 * 1024
+SEGMENT_ATTEMPTS = 3
+HASH_CHUNK_SIZE = 1024 * 1024
+HREF_TTL = 20 * 60
+"""Сколько секунд заранее полученная ссылка считается пригодной (Диск выдает их на 30 минут)"""
+HREF_PREFETCH_WORKERS = 2
+
+DIR_EXISTS_ERROR = "DiskPathPointsToExistentDirectoryError"
+"""Код ошибки 409, которым API отвечает на создание уже существующей папки"""
+
+DEFAULT_ITEM_FIELDS = "name,path,type,size,md5,sha256,modified"
+"""Поля элементов листинга по умолчанию; None вместо строки запрашивает ресурс целиком"""
+
+CODEC_ITEM_FIELDS = f"{DEFAULT_ITEM_FIELDS},custom_properties"
+"""Поля листингов, в которых файлы, сжатые при загрузке, узнаются по отметке в custom_properties"""
+
+ProgressCallback = Callable[[int, int], None]
+"""Вызывается с количеством отправленных байт и полным размером файла"""
+
 
 class ListFilesResult(NamedTuple):
     """Результат получения списка файлов."""
 
     response: Response
-    files: list[dict[str, Any]] | None
+    files: list[Resource] | ResourceColumns | None
+
+
+class TransferResult(NamedTuple):
+    """
+    Результат передачи одного файла или создания папки.
+    response равен None, если запрос не понадобился (папка уже существует).
+    """
+
+    local_path: Path
+    remote_path: Path
+    response: Response | None
+    error: Exception | None = None
+    skipped: bool = False
+
+    @property
+    def ok(self) -> bool:
+        """Передача завершилась без исключения и с успешным кодом ответа"""
+        return self.error is None and (
+            self.response is None or self.response.status_code in (200, 201, 202, 206)
+        )
+
+
+ResultCallback = Callable[[TransferResult], None]
+"""Вызывается в потоке вызывающего кода с результатом каждого файла или папки по мере готовности"""
+
+
+class PoolStats(NamedTuple):
+    """Статистика переиспользования соединений пула."""
+
+    requests: int
+    connections: int
+    hosts: int
+
+    @property
+    def reused(self) -> int:
+        """Количество запросов, выполненных по уже открытому соединению"""
+        return max(self.requests - self.connections, 0)
+
+    @property
+    def reuse_ratio(self) -> float:
+        """Доля запросов, не потребовавших нового соединения"""
+        return self.reused / self.requests if self.requests else 0.0
+
+
+def is_dir_exists_error(status: int, body: str) -> bool:
+    """
+    Означает ли ответ на создание папки, что она уже есть.
+    Другие 409 (нет родительской папки, на этом месте файл) - настоящие ошибки.
+    """
+    if status != 409:
+        return False
+    try:
+        return json.loads(body).get("error") == DIR_EXISTS_ERROR
+    except (ValueError, AttributeError):
+        return False
+
+
+def file_md5(path: Path) -> str:
+    """Потоково считает md5 файла; hashlib отпускает GIL, поэтому хеширование параллелится потоками"""
+    digest = hashlib.md5()
+    with open(path, "rb") as f:
+        while chunk := f.read(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def listing_fields(item_fields: str | None) -> str | None:
+    """Переводит поля элементов в параметр fields для листинга папки"""
+    if item_fields is None:
+        return None
+    items = ",".join(f"_embedded.items.{field.strip()}" for field in item_fields.split(",") if field.strip())
+    return f"type,_embedded.offset,_embedded.limit,_embedded.total,{items}"
+
+
+def flat_listing_fields(item_fields: str | None) -> str | None:
+    """Переводит поля элементов в параметр fields для плоского списка файлов"""
+    if item_fields is None:
+        return None
+    items = ",".join(f"items.{field.strip()}" for field in item_fields.split(",") if field.strip())
+    return f"offset,limit,{items}"
+
+
+class _HrefRefused(Exception):
+    """API не выдал ссылку для загрузки; ответ возвращается вызывающему как есть"""
+
+    def __init__(self, response: Response) -> None:
+        super().__init__(response.status_code)
+        self.response = response
+
+
+class _FileSlice:
+    """Файлоподобный объект с хвостом файла от offset, сообщающий о прогрессе чтения"""
+
+    def __init__(self, path: Path, offset: int, size: int, progress: ProgressCallback | None) -> None:
+        self._file = open(path, "rb")
+        self._file.seek(offset)
+        self._sent = offset
+        self._size = size
+        self._progress = progress
+        if progress:
+            progress(offset, size)
+
+    def __len__(self) -> int:
+        return self._size - self._sent
+
+    def __enter__(self) -> _FileSlice:
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self._file.close()
+
+    def read(self, amount: int = -1) -> bytes:
+        chunk = self._file.read(amount)
+        if chunk:
+            self._sent += len(chunk)
+            if self._progress:
+                self._progress(self._sent, self._size)
+        return chunk
+
+
+class _DirCache:
+    """Потокобезопасный кэш папок Диска, существование которых уже подтверждено"""
+
+    def __init__(self, ttl: float) -> None:
+        self._ttl = ttl
+        self._confirmed: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(path: Path | str) -> str:
+        return str(path).removeprefix("disk:").strip("/")
+
+    def __contains__(self, path: Path | str) -> bool:
+        if self._ttl <= 0:
+            return False
+        key = self._key(path)
+        with self._lock:
+            confirmed_at = self._confirmed.get(key)
+            if confirmed_at is None:
+                return False
+            if time.monotonic() - confirmed_at > self._ttl:
+                del self._confirmed[key]
+                return False
+            return True
+
+    def add(self, path: Path | str) -> None:
+        if self._ttl <= 0:
+            return
+        with self._lock:
+            self._confirmed[self._key(path)] = time.monotonic()
+
+    def invalidate(self, path: Path | str | None = None) -> None:
+        """Забывает папку и все вложенные в нее; без аргумента очищает кэш целиком"""
+        with self._lock:
+            if path is None:
+                self._confirmed.clear()
+                return
+            key = self._key(path)
+            prefix = f"{key}/"
+            for cached in [c for c in self._confirmed if c == key or c.startswith(prefix) or not key]:
+                del self._confirmed[cached]
+
+
+class _HrefPrefetcher:
+    """
+    Заранее запрашивает ссылки для файлов в порядке их постановки в очередь.
+    Одновременно получено или запрашивается не больше lookahead ссылок, поэтому они не успевают устареть.
+    Ссылку, запрос которой еще не начат, вызывающий код запрашивает сам, а не ждет очереди.
+    """
+
+    def __init__(self, fetch: Callable[[Path], Response], lookahead: int, workers: int = HREF_PREFETCH_WORKERS) -> None:
+        self._fetch = fetch
+        self._lookahead = lookahead
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        self._queued: deque[Path] = deque()
+        self._started: dict[Path, Future[tuple[Response, float]]] = {}
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> _HrefPrefetcher:
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        with self._lock:
+            self._queued.clear()
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def add(self, remote_path: Path) -> None:
+        """Ставит путь в очередь на получение ссылки"""
+        with self._lock:
+            self._queued.append(remote_path)
+            self._fill()
+
+    def take(self, remote_path: Path) -> Response | None:
+        """Ответ с заранее полученной ссылкой; None - ссылку нужно запросить самому"""
+        with self._lock:
+            future = self._started.pop(remote_path, None)
+            if future is None:
+                try:
+                    self._queued.remove(remote_path)
+                except ValueError:
+                    pass
+            self._fill()
+        if future is None or future.cancel():
+            return None
+        try:
+            response, fetched_at = future.result()
+        except Exception:
+            return None
+        if time.monotonic() - fetched_at > HREF_TTL:
+            return None
+        return response
+
+    def _fill(self) -> None:
+        while self._queued and len(self._started) < self._lookahead:
+            remote_path = self._queued.popleft()
+            self._started[remote_path] = self._executor.submit(self._timed_fetch, remote_path)
+
+    def _timed_fetch(self, remote_path: Path) -> tuple[Response, float]:
+        return self._fetch(remote_path), time.monotonic()
 
 
 class YandexSettings(BaseSettings):
@@ -23,26 +291,160 @@ class YandexSettings(BaseSettings):
     resources_endpoint: str
     upload_endpoint: str
     download_endpoint: str
+    files_endpoint: str = "/resources/files"
     model_config = SettingsConfigDict(env_file="yandexSettings.env", env_prefix='YANDEX_')
 
 
 class YandexDiskClient:
     """Класс для работы с Яндекс Диском"""
 
-    def __init__(self) -> None:
-        self._settings = YandexSettings()  # type: ignore
+    def __init__(
+            self,
+            settings: YandexSettings | None = None,
+            pool_connections: int = 4,
+            pool_maxsize: int = 16,
+            pool_block: bool = False,
+            keep_alive: bool = True,
+            dir_cache_ttl: float = 300.0,
+            large_file_threshold: int = LARGE_FILE_THRESHOLD,
+            index: DiskIndex | None = None,
+            retry_policies: dict[str, RetryPolicy] | None = None,
+            retry_budget: RetryBudget | None = None,
+            rate_limiter: AdaptiveRateLimiter | None = None,
+            metrics: RequestMetrics | None = None,
+    ) -> None:
+        """
+        settings - настройки подключения (по умолчанию читаются из yandexSettings.env),
+        pool_connections - сколько пулов (хостов) держать открытыми одновременно,
+        pool_maxsize - максимум соединений к одному хосту,
+        pool_block - ждать свободного соединения вместо открытия лишнего,
+        keep_alive - переиспользовать соединения между запросами,
+        dir_cache_ttl - сколько секунд помнить созданные или найденные папки (0 - не кэшировать),
+        large_file_threshold - размер файла, начиная с которого используется докачиваемая загрузка,
+        index - локальный индекс Диска, которым отвечаются проверки существования путей,
+        retry_policies - политики повторов по видам операций поверх DEFAULT_RETRY_POLICIES,
+        retry_budget - общий лимит повторов (можно разделить между несколькими клиентами),
+        rate_limiter - ограничитель частоты запросов к API (не к серверам данных),
+        metrics - сборщик замеров по каждому HTTP-запросу (фазы, коды, байты).
+        """
+        self._settings = settings or YandexSettings()  # type: ignore
         self._base_url = self._settings.base_url
         self._headers = {
             "Authorization": f"OAuth {self._settings.access_token}",
             "Accept": "application/json",
         }
+        self._metrics = metrics
+        adapter_class = TimedHTTPAdapter if metrics is not None else HTTPAdapter
+        self._adapter = adapter_class(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            pool_block=pool_block,
+        )
+        self._session = requests.Session()
+        self._session.mount("https://", self._adapter)
+        self._session.mount("http://", self._adapter)
+        if not keep_alive:
+            self._session.headers["Connection"] = "close"
+        self._dir_cache = _DirCache(dir_cache_ttl)
+        self._large_file_threshold = large_file_threshold
+        self._index = index
+        self._retry_policies = {**DEFAULT_RETRY_POLICIES, **(retry_policies or {})}
+        self._retry_budget = retry_budget or RetryBudget()
+        self._rate_limiter = rate_limiter or AdaptiveRateLimiter()
+
+    def __enter__(self) -> YandexDiskClient:
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Закрывает все соединения пула"""
+        self._session.close()
+
+    def pool_stats(self) -> PoolStats:
+        """Статистика по запросам и открытым соединениям для всех хостов"""
+        pools = self._adapter.poolmanager.pools
+        total_requests = 0
+        total_connections = 0
+        hosts = 0
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            hosts += 1
+            total_requests += pool.num_requests
+            total_connections += pool.num_connections
+        return PoolStats(requests=total_requests, connections=total_connections, hosts=hosts)
+
+    def invalidate_dir_cache(self, remote_path: Path | None = None) -> None:
+        """Сбрасывает кэш папок для пути и всех вложенных; без аргумента - целиком"""
+        self._dir_cache.invalidate(remote_path)
+
+    def _request(self, method: str, url: str, operation: str = "api", **kwargs: Any) -> Response:
+        """
+        Выполняет HTTP-запрос через общую сессию клиента.
+        Повторы определяются политикой для operation (см. DEFAULT_RETRY_POLICIES),
+        запросы к API (operation="api") дополнительно проходят через ограничитель частоты.
+        """
+        if operation != "api":
+            return call_with_retry(
+                lambda: self._send(method, url, operation, **kwargs),
+                self._retry_policies[operation],
+                self._retry_budget,
+            )
+
+        def send() -> Response:
+            self._rate_limiter.acquire()
+            response = self._send(method, url, operation, **kwargs)
+            self._rate_limiter.on_response(response.status_code)
+            return response
+
+        return call_with_retry(send, self._retry_policies[operation], self._retry_budget)
+
+    def _send(self, method: str, url: str, operation: str, **kwargs: Any) -> Response:
+        """Одна попытка запроса; при включенных метриках записывает ее замер"""
+        if self._metrics is None:
+            return self._session.request(method, url, **kwargs)
+        return self._metrics.observe(
+            self._endpoint_class(url, operation),
+            url,
+            lambda: self._session.request(method, url, **kwargs),
+            stream=kwargs.get("stream", False),
+        )
+
+    def _endpoint_class(self, url: str, operation: str) -> str:
+        """Класс эндпоинта для метрик: disk, resources, upload_href, download_href или data"""
+        if operation != "api":
+            return "data"
+        path = url[len(self._base_url):].split("?", 1)[0]
+        if path == self._settings.upload_endpoint:
+            return "upload_href"
+        if path == self._settings.download_endpoint:
+            return "download_href"
+        if path.startswith(self._settings.resources_endpoint) or path == self._settings.files_endpoint:
+            return "resources"
+        return "disk"
+
+    @property
+    def settings(self) -> YandexSettings:
+        """Настройки, с которыми создан клиент"""
+        return self._settings
+
+    @property
+    def index(self) -> DiskIndex | None:
+        """Локальный индекс Диска, если он передан клиенту"""
+        return self._index
 
     def check_disk_access(self) -> Response:
         """Проверка доступности Диска"""
-        return requests.get(self._base_url, headers=self._headers)
+        return self._request("GET", self._base_url, headers=self._headers)
 
     def _ensure_path_exists(self, remote_path: Path | None) -> bool:
-        """Рекурсивно создает путь к файлу/папке, если его не существует"""
+        """
+        Рекурсивно создает путь к файлу/папке, если его не существует.
+        Папки создаются без предварительной проверки: ответ 409 с кодом DIR_EXISTS_ERROR означает, что папка уже есть.
+        """
         if not remote_path:
             return True
 
@@ -50,36 +452,81 @@ class YandexDiskClient:
         current_path = ""
 
         for part in parts:
-            if not part:
+            if not part or part == "/":
                 continue
 
             current_path = f"{current_path}/{part}" if current_path else part
-            if not self._path_exists(Path(current_path)):
-                url = f"{self._base_url}{self._settings.resources_endpoint}?path={current_path}"
-                response = requests.put(
-                    url,
-                    headers=self._headers,
+            response = self._make_dir(current_path)
+            if response is not None and response.status_code not in (200, 201):
+                raise Exception(
+                    f"Ошибка при создании папки {current_path}: {response.status_code} - {response.text}"
                 )
-                if response.status_code not in (200, 201):
-                    raise Exception(
-                        f"Ошибка при создании папки {current_path}: {response.status_code} - {response.text}"
-                    )
 
         return True
 
-    def _path_exists(self, path: Path | None) -> bool:
-        """Проверяет, существует ли путь на Яндекс Диске"""
-        if not path:
-            return False
+    def _make_dir(self, remote_path: Path | str) -> Response | None:
+        """
+        Создает одну папку, если она еще не известна кэшу или свежему индексу.
+        Возвращает None, если папка уже существует.
+        """
+        if remote_path in self._dir_cache:
+            return None
+        if self._index is not None and self._index.exists(Path(remote_path), "dir"):
+            self._dir_cache.add(remote_path)
+            return None
+
+        url = f"{self._base_url}{self._settings.resources_endpoint}?path={remote_path}"
+        response = self._request(
+            "PUT",
+            url,
+            headers=self._headers,
+        )
+        if is_dir_exists_error(response.status_code, response.text):
+            self._dir_cache.add(remote_path)
+            return None
+        if response.status_code in (200, 201):
+            self._dir_cache.add(remote_path)
+            self._index_changed(remote_path)
+        return response
 
-        url = f"{self._base_url}{self._settings.resources_endpoint}?path={path}"
-        response = requests.get(url, headers=self._headers)
-        return response.status_code == 200
+    def create_folder(self, remote_path: Path) -> bool:
+        """Создание папки на Диске вместе с недостающими родительскими"""
+        return self._ensure_path_exists(remote_path)
+
+    def delete(self, remote_path: Path, permanently: bool = False) -> Response:
+        """Удаление файла или папки на Диске (по умолчанию в Корзину)"""
+        url = f"{self._base_url}{self._settings.resources_endpoint}"
+        response = self._request(
+            "DELETE",
+            url,
+            headers=self._headers,
+            params={"path": str(remote_path), "permanently": str(permanently).lower()},
+        )
+        self._dir_cache.invalidate(remote_path)
+        if self._index is not None:
+            self._index.invalidate(remote_path.parent)
+        return response
+
+    def _index_changed(self, remote_path: Path | str | None) -> None:
+        """После записи по пути листинг его папки в индексе больше не актуален"""
+        if self._index is not None and remote_path:
+            self._index.invalidate(Path(remote_path).parent, recursive=False)
 
     def upload_file(
-            self, local_path: Path | None, remote_path: Path | None, create_new_version: bool = False
+            self,
+            local_path: Path | None,
+            remote_path: Path | None,
+            create_new_version: bool = False,
+            progress: ProgressCallback | None = None,
+            compress: str | None = None,
     ) -> Response:
-        """Загрузка файла на Диск"""
+        """
+        Загрузка файла на Диск.
+        Файлы от large_file_threshold байт отправляются потоком без multipart
+        и докачиваются после обрыва соединения.
+        compress - кодек (gzip или zstd), которым файл сжимается на лету при отправке;
+        уже сжатые форматы отправляются как есть (см. _upload_compressed).
+        """
         if create_new_version:
             raise NotImplementedError("Яндекс.Диск не поддерживает версионирование")
         if not local_path:
@@ -87,104 +534,941 @@ class YandexDiskClient:
         if not local_path.exists():
             raise FileNotFoundError(f"Локальный файл не найден: {local_path}")
 
-        url = f"{self._base_url}{self._settings.upload_endpoint}?path={remote_path}&overwrite=true"
-        response = requests.get(url, headers=self._headers)
+        size = local_path.stat().st_size
+        codec = self._compression_for(local_path, compress)
+        if codec is not None:
+            return self._upload_compressed(local_path, remote_path, codec, progress)
+        if size >= self._large_file_threshold:
+            return self._upload_large_file(local_path, remote_path, size, progress)
+        return self._upload_small_file(local_path, remote_path, size, progress)
+
+    def _upload_small_file(
+            self,
+            local_path: Path,
+            remote_path: Path | None,
+            size: int,
+            progress: ProgressCallback | None = None,
+            href_response: Response | None = None,
+    ) -> Response:
+        """Загрузка файла одним multipart-запросом; href_response - заранее полученная ссылка для первой попытки"""
+        hrefs = [href_response] if href_response is not None else []
+        try:
+            response = call_with_retry(
+                lambda: self._upload_to_fresh_href(local_path, remote_path, hrefs.pop() if hrefs else None),
+                self._retry_policies["upload"],
+                self._retry_budget,
+            )
+        except _HrefRefused as e:
+            return e.response
+
+        if progress:
+            progress(size, size)
+        return response
+
+    def _upload_to_fresh_href(
+            self, local_path: Path, remote_path: Path | None, href_response: Response | None = None
+    ) -> Response:
+        """Одна попытка загрузки: ссылка одноразовая, поэтому каждый раз запрашивается новая"""
+        response = href_response if href_response is not None else self._request_upload_href(remote_path)
 
         if response.status_code != 200:
-            return response
+            raise _HrefRefused(response)
 
+        upload_url = self._upload_href(response)
+        with open(local_path, 'rb') as f:
+            response = self._request("PUT", upload_url, operation="upload_data", files={"file": f})
+        self._index_changed(remote_path)
+        return response
+
+    def _request_upload_href(self, remote_path: Path | None) -> Response:
+        """Запрашивает одноразовую ссылку для загрузки файла"""
+        url = f"{self._base_url}{self._settings.upload_endpoint}?path={remote_path}&overwrite=true"
+        return self._request("GET", url, headers=self._headers)
+
+    @staticmethod
+    def _upload_href(response: Response) -> str:
         upload_url = response.json().get("href")
         if not upload_url:
             raise Exception("Не удалось получить URL для загрузки")
+        return upload_url
 
-        with open(local_path, 'rb') as f:
-            response = requests.put(upload_url, files={"file": f})
+    def _upload_large_file(
+            self, local_path: Path, remote_path: Path | None, size: int, progress: ProgressCallback | None
+    ) -> Response:
+        """
+        Потоковая загрузка большого файла.
+        После обрыва загрузка продолжается с подтвержденного сервером смещения,
+        если ссылка это поддерживает, иначе начинается заново с новой ссылкой.
+        """
+        policy = self._retry_policies["upload"]
+        upload_url: str | None = None
+        offset = 0
+        last_error: Exception | None = None
 
-        return response
+        for attempt in range(RESUME_ATTEMPTS):
+            try:
+                if upload_url is None:
+                    response = self._request_upload_href(remote_path)
+                    if response.status_code != 200:
+                        return response
+                    upload_url = self._upload_href(response)
+                    offset = 0
+
+                with _FileSlice(local_path, offset, size, progress) as body:
+                    headers = {"Content-Type": "application/octet-stream"}
+                    if offset:
+                        headers["Content-Range"] = f"bytes {offset}-{size - 1}/{size}"
+                    response = self._request("PUT", upload_url, operation="upload_data", data=body, headers=headers)
+                self._index_changed(remote_path)
+                return response
+            except (requests.ConnectionError, requests.Timeout) as e:
+                last_error = e
+                if not self._retry_budget.withdraw():
+                    raise
+                time.sleep(policy.delay(attempt))
+                if upload_url is not None:
+                    acknowledged, probe = self._acknowledged_offset(upload_url, size)
+                    if acknowledged is None:
+                        upload_url = None
+                    elif acknowledged >= size and probe is not None:
+                        self._index_changed(remote_path)
+                        return probe
+                    else:
+                        offset = acknowledged
+
+        raise last_error or Exception(f"Не удалось загрузить файл {local_path}")
+
+    @staticmethod
+    def _compression_for(local_path: Path, compress: str | None) -> Codec | None:
+        """Кодек для файла или None, если сжатие не запрошено или файл уже сжат"""
+        if not compress:
+            return None
+        codec = get_codec(compress)
+        return codec if is_compressible(local_path) else None
+
+    def _upload_compressed(
+            self, local_path: Path, remote_path: Path | None, codec: Codec, progress: ProgressCallback | None = None
+    ) -> Response:
+        """
+        Загрузка файла, сжимаемого на лету: тело отправляется кусками по мере сжатия,
+        без временного файла и без multipart. На Диске к имени добавляется суффикс кодека,
+        а в custom_properties записывается кодек, по которому download_file распаковывает файл.
+        Докачки нет: после обрыва файл сжимается и отправляется заново.
+        """
+        size = local_path.stat().st_size
+        remote_path = Path(remote_path) if remote_path else Path(local_path.name)
+        target = remote_path.with_name(remote_path.name + codec.suffix)
+        on_read = (lambda done: progress(done, size)) if progress else None
+        digests: list[Any] = []
+
+        def make_body() -> Iterator[bytes]:
+            digests.append(hashlib.md5())
+            return iter_compressed(local_path, codec, on_read, digests[-1])
+
+        response = self._upload_body(target, make_body)
+        if response.status_code not in (200, 201, 202):
+            return response
+        marked = self._mark_compressed(target, codec, size, digests[-1].hexdigest())
+        return response if marked.status_code == 200 else marked
 
-    def upload_folder(self, local_folder: Path | None, remote_folder: Path | None) -> list[Response]:
-        """Рекурсивная загрузка папки с содержимым"""
+    def _mark_compressed(self, remote_path: Path, codec: Codec, original_size: int, original_md5: str) -> Response:
+        """Записывает в custom_properties ресурса кодек, исходный размер и md5 файла"""
+        url = f"{self._base_url}{self._settings.resources_endpoint}?path={remote_path}&fields=custom_properties"
+        properties = {PROPERTY_NAME: codec.name, ORIGINAL_SIZE: original_size, ORIGINAL_MD5: original_md5}
+        return self._request("PATCH", url, headers=self._headers, json={"custom_properties": properties})
+
+    def _acknowledged_offset(self, upload_url: str, size: int) -> tuple[int | None, Response | None]:
+        """
+        Спрашивает у сервера загрузки, сколько байт уже принято; возвращает смещение и ответ сервера.
+        Ответ 200/201 означает, что загрузка завершилась (смещение равно size), 308 без Range - что не принято ничего.
+        None вместо смещения - докачка не поддерживается, и файл нужно загружать заново.
+        """
+        try:
+            response = self._request(
+                "PUT",
+                upload_url,
+                operation="upload_data",
+                data=b"",
+                headers={"Content-Range": f"bytes */{size}"},
+            )
+        except requests.RequestException:
+            return None, None
+
+        if response.status_code in (200, 201):
+            return size, response
+        if response.status_code not in (202, 308):
+            return None, response
+        accepted = response.headers.get("Range")
+        if accepted is None:
+            return 0, response
+        if not accepted.startswith("bytes=0-"):
+            return None, response
+        try:
+            return int(accepted.removeprefix("bytes=0-")) + 1, response
+        except ValueError:
+            return None, response
+
+    def upload_folder(
+            self,
+            local_folder: Path | None,
+            remote_folder: Path | None,
+            jobs: int = 1,
+            skip_unchanged: bool = False,
+            pack_below: int | None = None,
+            pack_size: int = PACK_SIZE,
+            compress: str | None = None,
+    ) -> list[TransferResult]:
+        """
+        Рекурсивная загрузка папки с содержимым.
+        Папки создаются только те, которых нет на Диске: каждая уже существующая папка
+        читается одним листингом, содержимое только что созданных не проверяется.
+        Вложенные папки создаются сразу после подтверждения родительской, параллельно;
+        файлы папки начинают загружаться, как только подтверждена она сама.
+        Все запросы выполняются в jobs потоков.
+        При skip_unchanged файлы с тем же размером и md5, что и на Диске, не загружаются.
+        pack_below - файлы меньше этого размера не загружаются по одному, а упаковываются на лету
+        в архивы tar по pack_size байт с манифестами в папке PACK_DIR (восстановление - restore_packed);
+        skip_unchanged на упакованные файлы не действует, папки только с упакованными файлами не создаются.
+        compress - кодек, которым сжимаются отдельно загружаемые файлы (см. upload_file).
+        skip_unchanged сверяет x.log и с x.log.gz, сжатым прошлой загрузкой, по исходным размеру и md5;
+        измененный файл загружается в том виде, в каком уже хранится на Диске, чтобы не появилось двух копий.
+        """
 
         if not local_folder:
             raise ValueError("Локальная папка не может быть None")
         if not local_folder.is_dir():
             raise NotADirectoryError(f"Локальная папка не найдена: {local_folder}")
+        if jobs < 1:
+            raise ValueError("Количество потоков должно быть положительным")
+        if compress:
+            get_codec(compress)
 
-        responses = []
-        self._ensure_path_exists(remote_folder)
-
-        for item in local_folder.rglob("*"):
-            relative_path = item.relative_to(local_folder)
-            remote_item_path = Path(remote_folder) / relative_path if remote_folder else relative_path
-
+        subdirs: dict[Path, list[Path]] = {}
+        files: dict[Path, list[Path]] = {}
+        packed: list[tuple[Path, str]] = []
+        for item in sorted(local_folder.rglob("*")):
             if item.is_dir():
-                url = f"{self._base_url}{self._settings.resources_endpoint}?path={remote_item_path}"
-                response = requests.put(
-                    url,
-                    headers=self._headers,
-                )
-                responses.append(response)
+                subdirs.setdefault(item.parent, []).append(item)
+            elif pack_below is not None and item.stat().st_size < pack_below:
+                packed.append((item, item.relative_to(local_folder).as_posix()))
             else:
-                response = self.upload_file(item, remote_item_path)
-                responses.append(response)
+                files.setdefault(item.parent, []).append(item)
+        skipped_dirs = self._packed_only_dirs(subdirs, files, {item.parent for item, _ in packed})
 
-        return responses
+        remote_root = Path(remote_folder) if remote_folder else Path(".")
+        root_listing = self._remote_items_by_name(remote_root)
+        if root_listing is None:
+            self._ensure_path_exists(remote_folder)
+
+        pack_dir = remote_root / PACK_DIR
+        packs = plan_packs(packed, pack_size)
+        if packs:
+            self._ensure_path_exists(pack_dir)
+
+        pending: deque[Future[list[TransferResult]]] = deque()
+        with self._upload_href_prefetcher(jobs) as prefetcher, ThreadPoolExecutor(max_workers=jobs) as executor:
+
+            def enter(local_dir: Path, remote_dir: Path, listing: dict[str, Resource] | None) -> list[TransferResult]:
+                """Папка есть на Диске: планирует ее подпапки и загрузку ее файлов"""
+                confirmed = []
+                listing = listing or {}
+                for local_item in subdirs.get(local_dir, []):
+                    if local_item in skipped_dirs:
+                        continue
+                    remote_item_path = remote_dir / local_item.name
+                    remote_item = listing.get(local_item.name)
+                    if remote_item is not None and remote_item.is_dir:
+                        self._dir_cache.add(remote_item_path)
+                        confirmed.append(TransferResult(local_item, remote_item_path, None))
+                        pending.append(executor.submit(list_and_enter, local_item, remote_item_path))
+                    else:
+                        pending.append(executor.submit(create, local_item, remote_item_path))
+                for local_item in files.get(local_dir, []):
+                    remote_item_path = remote_dir / local_item.name
+                    codec = self._compression_for(local_item, compress)
+                    remote_item = listing.get(local_item.name) if skip_unchanged else None
+                    if remote_item is not None and not remote_item.is_dir:
+                        codec = marked_codec(remote_item.name, remote_item.custom_properties)
+                    if codec is None and self._wants_upload_href(local_item, remote_item):
+                        prefetcher.add(remote_item_path)
+                    pending.append(executor.submit(upload, local_item, remote_item_path, remote_item, codec))
+                return confirmed
+
+            def upload(
+                    local_path: Path, remote_path: Path, remote_item: Resource | None, codec: Codec | None
+            ) -> list[TransferResult]:
+                return [self._upload_one(local_path, remote_path, remote_item, prefetcher, codec)]
+
+            def list_and_enter(local_dir: Path, remote_dir: Path) -> list[TransferResult]:
+                return enter(local_dir, remote_dir, self._remote_items_by_name(remote_dir))
+
+            def create(local_dir: Path, remote_dir: Path) -> list[TransferResult]:
+                result = self._create_folder(local_dir, remote_dir)
+                if not result.ok:
+                    error = Exception(f"Папка {remote_dir} не создана")
+                    return [result] + [
+                        TransferResult(item, remote_dir / item.relative_to(local_dir), None, error)
+                        for item in sorted(local_dir.rglob("*"))
+                    ]
+                if result.response is None:
+                    pending.append(executor.submit(list_and_enter, local_dir, remote_dir))
+                else:
+                    pending.append(executor.submit(enter, local_dir, remote_dir, None))
+                return [result]
+
+            for pack in packs:
+                pending.append(executor.submit(self._upload_pack, pack, pack_dir))
+            results = enter(local_folder, remote_root, root_listing)
+            while pending:
+                results.extend(pending.popleft().result())
+
+        if packs and all(result.ok for result in results if result.remote_path.parent == pack_dir):
+            current = {name for pack in packs for name in (pack.archive_name, pack.manifest_name)}
+            self._remove_stale_packs(pack_dir, current)
+        return results
+
+    @staticmethod
+    def _packed_only_dirs(
+            subdirs: dict[Path, list[Path]], files: dict[Path, list[Path]], packed_parents: set[Path]
+    ) -> set[Path]:
+        """
+        Локальные папки, все содержимое которых уходит в архивы: их не нужно создавать на Диске,
+        restore_packed восстановит их вместе с файлами. Пустые папки в архивы не попадают и создаются.
+        """
+        skipped: set[Path] = set()
+        if not packed_parents:
+            return skipped
+        for local_dir in sorted((item for items in subdirs.values() for item in items), reverse=True):
+            children = subdirs.get(local_dir, [])
+            if local_dir in files or (not children and local_dir not in packed_parents):
+                continue
+            if all(child in skipped for child in children):
+                skipped.add(local_dir)
+        return skipped
+
+    def _upload_pack(self, pack: Pack, pack_dir: Path) -> list[TransferResult]:
+        """
+        Загружает архив, собираемый на лету, и затем его манифест с md5 файлов, посчитанными при отправке;
+        результат - по одному на каждый файл. Архив без манифеста при восстановлении не читается.
+        """
+        archive_path = pack_dir / pack.archive_name
+        streams: list[PackStream] = []
+
+        def make_stream() -> PackStream:
+            streams.append(PackStream(pack))
+            return streams[-1]
 
-    def download_file(self, remote_path: Path | None, local_path: Path | None) -> Response:
-        """Скачивание файла с Диска с полной обработкой ошибок"""
         try:
-            if not remote_path:
-                raise ValueError("Не указан путь к файлу на Яндекс Диске")
+            response = self._upload_body(archive_path, make_stream)
+            if response.status_code in (200, 201, 202):
+                manifest = build_manifest(pack, streams[-1].md5s)
+                manifest_response = self._upload_body(pack_dir / pack.manifest_name, lambda: manifest)
+                if manifest_response.status_code not in (200, 201, 202):
+                    response = manifest_response
+        except Exception as e:
+            return [TransferResult(member.local_path, archive_path, None, e) for member in pack.members]
+        return [TransferResult(member.local_path, archive_path, response) for member in pack.members]
 
-            url = f"{self._base_url}{self._settings.download_endpoint}?path={remote_path}"
-            response = requests.get(
-                url,
-                headers=self._headers,
+    def _upload_body(self, remote_path: Path, make_body: Callable[[], Any]) -> Response:
+        """Загружает тело одним PUT без multipart; make_body создает его заново для каждой попытки"""
+        def attempt() -> Response:
+            response = self._request_upload_href(remote_path)
+            if response.status_code != 200:
+                raise _HrefRefused(response)
+            response = self._request(
+                "PUT",
+                self._upload_href(response),
+                operation="upload_data",
+                data=make_body(),
+                headers={"Content-Type": "application/octet-stream"},
             )
+            self._index_changed(remote_path)
+            return response
 
-            if response.status_code != 200:
-                error_msg = response.json().get("message", "Ошибка")
-                raise Exception(f"Яндекс.Диск вернул ошибку: {error_msg} (код {response.status_code})")
+        try:
+            return call_with_retry(attempt, self._retry_policies["upload"], self._retry_budget)
+        except _HrefRefused as e:
+            return e.response
 
-            download_url = response.json().get("href")
-            if not download_url:
-                raise Exception("Не удалось получить URL для скачивания")
+    def _remove_stale_packs(self, pack_dir: Path, keep: set[str]) -> None:
+        """Удаляет архивы и манифесты прошлых загрузок, которых нет в новом наборе"""
+        for item in self.iter_files(pack_dir, fields="name"):
+            if item.name not in keep:
+                self.delete(pack_dir / item.name, permanently=True)
 
-            file_response = requests.get(download_url, stream=True)
-            if file_response.status_code != 200:
-                raise Exception(f"Ошибка при загрузке файла: {file_response.status_code}")
+    def restore_packed(
+            self,
+            remote_folder: Path | None,
+            local_folder: Path,
+            names: Iterable[str] | None = None,
+            jobs: int = 4,
+    ) -> list[TransferResult]:
+        """
+        Восстанавливает файлы, упакованные upload_folder(pack_below=...).
+        names - пути файлов относительно загруженной папки (по умолчанию все).
+        Скачиваются только архивы с нужными файлами; если нужна малая часть архива,
+        файлы читаются Range-запросами по смещениям из манифеста и сверяются с его md5.
+        Если на Диске остались манифесты прошлой загрузки, каждый файл берется из самого нового.
+        """
+        if jobs < 1:
+            raise ValueError("Количество потоков должно быть положительным")
 
-            download_path = Path(local_path) if local_path else Path(remote_path.name)
-            if download_path.parent:
-                download_path.parent.mkdir(parents=True, exist_ok=True)
+        pack_dir = (Path(remote_folder) if remote_folder else Path(".")) / PACK_DIR
+        wanted = set(names) if names is not None else None
+        manifests = [item.name for item in self.iter_files(pack_dir, fields="name") if item.name.endswith(".json")]
 
-            with download_path.open("wb") as f:
-                for chunk in file_response.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
+        results: list[TransferResult] = []
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            read = list(executor.map(lambda name: self._read_manifest(pack_dir / name), manifests))
+            archives = {manifest.archive: manifest for manifest in read}
+            futures = []
+            for archive, entries in latest_entries(read).items():
+                needed = entries if wanted is None else [entry for entry in entries if entry.name in wanted]
+                if needed:
+                    manifest = archives[archive]
+                    everything = len(needed) == len(manifest.entries)
+                    futures.append(executor.submit(
+                        self._restore_pack, pack_dir / archive, manifest.size, needed, everything, local_folder
+                    ))
+            for future in futures:
+                results.extend(future.result())
+        return results
 
-            print(f"Файл успешно скачан: {remote_path} -> {download_path}")
-            return file_response
+    def _read_manifest(self, remote_path: Path) -> Manifest:
+        response = self._request_download_href(remote_path)
+        if response.status_code != 200:
+            raise Exception(f"Не удалось получить манифест {remote_path}: {response.status_code}")
+        data = self._request("GET", response.json()["href"], operation="download")
+        if data.status_code != 200:
+            raise Exception(f"Не удалось скачать манифест {remote_path}: {data.status_code}")
+        return read_manifest(data.content)
+
+    def _restore_pack(
+            self, archive_path: Path, size: int, entries: list[ManifestEntry], everything: bool, local_root: Path
+    ) -> list[TransferResult]:
+        """Скачивает нужные файлы одного архива: весь архив потоком или диапазонами"""
+        def outcome(response: Response | None, error: Exception | None = None) -> list[TransferResult]:
+            return [
+                TransferResult(local_root / entry.name, archive_path, response, error)
+                for entry in entries
+            ]
 
+        try:
+            for entry in entries:
+                safe_target(local_root, entry.name)
+            href = self._request_download_href(archive_path)
+            if href.status_code != 200:
+                return outcome(href)
+            download_url = href.json()["href"]
+
+            if everything or sum(entry.size for entry in entries) >= size * WHOLE_ARCHIVE_RATIO:
+                response = self._request("GET", download_url, operation="download", stream=True)
+                with response:
+                    if response.status_code != 200:
+                        return outcome(response)
+                    response.raw.decode_content = True
+                    extract_archive(response.raw, local_root, entries)
+                return outcome(response)
+
+            for start, end, group in plan_ranges(entries):
+                response = self._request(
+                    "GET", download_url, operation="download", stream=True, headers={"Range": f"bytes={start}-{end}"}
+                )
+                with response:
+                    if response.status_code == 200:
+                        response.raw.decode_content = True
+                        extract_archive(response.raw, local_root, entries)
+                        return outcome(response)
+                    if response.status_code != 206:
+                        raise Exception(f"Сервер не вернул диапазон {start}-{end}: {response.status_code}")
+                    response.raw.decode_content = True
+                    extract_range(response.raw, start, group, local_root)
+            return outcome(response)
         except Exception as e:
-            print(f"Ошибка при скачивании файла: {str(e)}")
+            return outcome(None, e)
+
+    def upload_files(
+            self, files: Iterable[tuple[Path, Path]], jobs: int = 4, compress: str | None = None
+    ) -> list[TransferResult]:
+        """
+        Загрузка набора файлов (пар локальный путь - путь на Диске) в jobs потоков.
+        Ссылки для следующих файлов запрашиваются заранее, пока идут текущие загрузки,
+        поэтому запрос к API не задерживает передачу данных. Папки на Диске должны существовать.
+        compress - кодек сжатия, как в upload_file.
+        """
+        if jobs < 1:
+            raise ValueError("Количество потоков должно быть положительным")
+        if compress:
+            get_codec(compress)
+
+        with self._upload_href_prefetcher(jobs) as prefetcher, ThreadPoolExecutor(max_workers=jobs) as executor:
+            futures = []
+            for local_path, remote_path in files:
+                codec = self._compression_for(local_path, compress) if local_path.is_file() else None
+                if codec is None and self._wants_upload_href(local_path, None):
+                    prefetcher.add(remote_path)
+                futures.append(executor.submit(self._upload_one, local_path, remote_path, None, prefetcher, codec))
+            return [future.result() for future in futures]
+
+    def _upload_href_prefetcher(self, jobs: int) -> _HrefPrefetcher:
+        return _HrefPrefetcher(
+            self._request_upload_href, lookahead=2 * jobs, workers=max(HREF_PREFETCH_WORKERS, jobs // 2)
+        )
+
+    def _wants_upload_href(self, local_path: Path, remote_item: Resource | None) -> bool:
+        """Нужна ли файлу заранее полученная ссылка: не для больших файлов и не для кандидатов на пропуск"""
+        try:
+            size = local_path.stat().st_size
+        except OSError:
+            return False
+        if size >= self._large_file_threshold:
+            return False
+        return remote_item is None or not self._may_be_same(size, remote_item)
+
+    def _remote_items_by_name(self, remote_path: Path) -> dict[str, Resource] | None:
+        """Содержимое папки Диска по именам локальных файлов (см. by_local_name); None, если папки нет"""
+        if remote_path == Path("."):
+            remote_path = Path("/")
+        if self._index is not None:
+            indexed = self._index.list_folder(remote_path)
+            if indexed is not None:
+                return by_local_name(indexed)
+            if self._index.exists(remote_path, "dir") is False:
+                return None
+        try:
+            return by_local_name(self.iter_files(remote_path, fields=CODEC_ITEM_FIELDS))
+        except requests.HTTPError as e:
+            if e.response is not None and e.response.status_code == 404:
+                return None
             raise
 
-    def list_files(self, remote_path: Path | None = None) -> ListFilesResult:
-        """Получение списка файлов на Диске"""
+    def _create_folder(self, local_path: Path, remote_path: Path) -> TransferResult:
+        """Создает одну папку на Диске, не прерывая загрузку при ошибке"""
+        try:
+            response = self._make_dir(remote_path)
+        except Exception as e:
+            return TransferResult(local_path, remote_path, None, e)
+        return TransferResult(local_path, remote_path, response)
+
+    def _upload_one(
+            self,
+            local_path: Path,
+            remote_path: Path,
+            remote_item: Resource | None = None,
+            prefetcher: _HrefPrefetcher | None = None,
+            codec: Codec | None = None,
+    ) -> TransferResult:
+        """
+        Загружает один файл, не прерывая загрузку папки при ошибке.
+        Файл, совпадающий с remote_item по размеру и md5, не загружается.
+        Если prefetcher уже получил ссылку для файла, первая попытка использует ее.
+        С codec файл сжимается на лету (см. _upload_compressed).
+        """
+        try:
+            href_response = prefetcher.take(remote_path) if prefetcher is not None else None
+            if remote_item is not None and self._same_content(local_path, remote_item):
+                return TransferResult(local_path, remote_path, None, skipped=True)
+            if codec is not None:
+                response = self._upload_compressed(local_path, remote_path, codec)
+            elif href_response is not None:
+                response = self._upload_small_file(
+                    local_path, remote_path, local_path.stat().st_size, href_response=href_response
+                )
+            else:
+                response = self.upload_file(local_path, remote_path)
+        except Exception as e:
+            return TransferResult(local_path, remote_path, None, e)
+        return TransferResult(local_path, remote_path, response)
+
+    @staticmethod
+    def _may_be_same(size: int, remote_item: Resource) -> bool:
+        original_size, md5, _ = original_content(remote_item)
+        return not remote_item.is_dir and bool(md5) and original_size == size
+
+    @classmethod
+    def _same_content(cls, local_path: Path, remote_item: Resource) -> bool:
+        """md5 считается только для файлов совпадающего размера; сжатые сверяются по исходным"""
+        return (
+                cls._may_be_same(local_path.stat().st_size, remote_item)
+                and file_md5(local_path) == original_content(remote_item)[1]
+        )
+
+    def download_file(self, remote_path: Path | None, local_path: Path | None, segments: int = 1) -> Response:
+        """
+        Скачивание файла с Диска с полной обработкой ошибок.
+        При segments > 1 файл качается параллельными Range-запросами.
+        Файл, сжатый при загрузке (upload_file с compress), распаковывается на лету;
+        без local_path он сохраняется под именем без суффикса кодека, заданный local_path не меняется.
+        """
+        codec = self._stored_codec(remote_path) if remote_path else None
+        local_path = self._download_target(remote_path, local_path, codec)
+        return self._download_file(remote_path, local_path, segments, codec=codec)
+
+    def _download_file(
+            self,
+            remote_path: Path | None,
+            local_path: Path | None,
+            segments: int = 1,
+            href_response: Response | None = None,
+            codec: Codec | None = None,
+    ) -> Response:
+        """
+        Скачивание файла; href_response - заранее полученный ответ со ссылкой на скачивание,
+        codec - кодек, которым распаковывается тело (такие файлы качаются одним потоком).
+        """
+        if not remote_path:
+            raise ValueError("Не указан путь к файлу на Яндекс Диске")
+
+        response = href_response if href_response is not None else self._request_download_href(remote_path)
+
+        if response.status_code != 200:
+            error_msg = response.json().get("message", "Ошибка")
+            raise Exception(f"Яндекс.Диск вернул ошибку: {error_msg} (код {response.status_code})")
+
+        download_url = response.json().get("href")
+        if not download_url:
+            raise Exception("Не удалось получить URL для скачивания")
+
+        download_path = Path(local_path) if local_path else Path(remote_path.name)
+        if download_path.parent:
+            download_path.parent.mkdir(parents=True, exist_ok=True)
+
+        if segments > 1 and codec is None and hasattr(os, "pwrite"):
+            return self._download_segmented(download_url, download_path, segments)
+        file_response = self._request("GET", download_url, operation="download", stream=True)
+        self._write_stream(file_response, download_path, codec)
+        return file_response
+
+    def _stored_codec(self, remote_path: Path) -> Codec | None:
+        """
+        Кодек файла, сжатого при загрузке. Метаданные запрашиваются только для имен
+        с суффиксом кодека; файл с таким именем без отметки в custom_properties не распаковывается.
+        """
+        if codec_for_name(remote_path.name) is None:
+            return None
+        url = f"{self._base_url}{self._settings.resources_endpoint}?path={remote_path}&fields=custom_properties"
+        response = self._request("GET", url, headers=self._headers)
+        if response.status_code != 200:
+            return None
+        return marked_codec(remote_path.name, response.json().get("custom_properties"))
+
+    @staticmethod
+    def _download_target(remote_path: Path | None, local_path: Path | None, codec: Codec | None) -> Path | None:
+        """Локальный путь для скачивания: если он не задан, у распаковываемого файла снимается суффикс кодека"""
+        if codec is None or remote_path is None or local_path is not None:
+            return local_path
+        return Path(remote_path.name.removesuffix(codec.suffix))
+
+    def _request_download_href(self, remote_path: Path) -> Response:
+        """Запрашивает ссылку для скачивания файла"""
+        url = f"{self._base_url}{self._settings.download_endpoint}?path={remote_path}"
+        return self._request("GET", url, headers=self._headers)
+
+    def download_files(
+            self,
+            files: Iterable[tuple[Path, Path]],
+            jobs: int = 4,
+            segments: int = 1,
+            on_result: ResultCallback | None = None,
+    ) -> list[TransferResult]:
+        """
+        Скачивание набора файлов (пар путь на Диске - локальный путь) в jobs потоков.
+        Ссылки для следующих файлов запрашиваются заранее отдельным небольшим пулом,
+        поэтому каждое скачивание сразу начинается с запроса к серверу данных.
+        on_result - отчет о каждом скачанном файле; рабочие потоки сами ничего не печатают.
+        """
+        if jobs < 1:
+            raise ValueError("Количество потоков должно быть положительным")
+
+        with self._download_href_prefetcher(jobs) as prefetcher, ThreadPoolExecutor(max_workers=jobs) as executor:
+            futures = []
+            for remote_path, local_path in files:
+                prefetcher.add(remote_path)
+                futures.append(executor.submit(self._download_one, remote_path, local_path, segments, prefetcher))
+            return self._collect(futures, on_result)
+
+    @staticmethod
+    def _collect(futures: list[Future[TransferResult]], on_result: ResultCallback | None) -> list[TransferResult]:
+        """Результаты в порядке запуска; on_result вызывается в текущем потоке по мере их готовности"""
+        if on_result is not None:
+            for future in as_completed(futures):
+                on_result(future.result())
+        return [future.result() for future in futures]
+
+    def _download_href_prefetcher(self, jobs: int) -> _HrefPrefetcher:
+        return _HrefPrefetcher(
+            self._request_download_href, lookahead=2 * jobs, workers=max(HREF_PREFETCH_WORKERS, jobs // 2)
+        )
+
+    def download_folder(
+            self,
+            remote_folder: Path | None,
+            local_folder: Path | None,
+            jobs: int = 4,
+            segments: int = 1,
+            on_result: ResultCallback | None = None,
+    ) -> list[TransferResult]:
+        """
+        Рекурсивное скачивание папки с Диска.
+        Дерево обходится постраничными листингами, локальные папки создаются по ходу обхода,
+        файлы скачиваются параллельно в jobs потоков, не дожидаясь конца обхода;
+        ссылки на скачивание запрашиваются заранее, как в download_files.
+        Файлы, сжатые при загрузке, распаковываются и сохраняются под именами без суффикса кодека;
+        если в папке есть и несжатый x.log, x.log.gz скачивается как есть, под своим именем.
+        on_result - отчет о каждой папке и файле, как в download_files.
+        """
+        if not remote_folder:
+            raise ValueError("Не указан путь к папке на Яндекс Диске")
+        if jobs < 1:
+            raise ValueError("Количество потоков должно быть положительным")
+
+        local_root = Path(local_folder) if local_folder else Path(remote_folder.name)
+        local_root.mkdir(parents=True, exist_ok=True)
+
+        results: list[TransferResult] = []
+        pending = deque([(remote_folder, local_root)])
+        with self._download_href_prefetcher(jobs) as prefetcher, ThreadPoolExecutor(max_workers=jobs) as executor:
+            futures = []
+            while pending:
+                remote_dir, local_dir = pending.popleft()
+                items = list(self.iter_files(remote_dir, fields=CODEC_ITEM_FIELDS))
+                names = {item.name for item in items}
+                for item in items:
+                    remote_item_path = remote_dir / item.name
+                    local_item = local_dir / item.name
+                    if item.is_dir:
+                        local_item.mkdir(exist_ok=True)
+                        results.append(TransferResult(local_item, remote_item_path, None))
+                        if on_result is not None:
+                            on_result(results[-1])
+                        pending.append((remote_item_path, local_item))
+                    else:
+                        codec = marked_codec(item.name, item.custom_properties)
+                        raw = codec is not None and item.name.removesuffix(codec.suffix) in names
+                        if codec is not None and not raw:
+                            local_item = local_dir / item.name.removesuffix(codec.suffix)
+                        prefetcher.add(remote_item_path)
+                        futures.append(executor.submit(
+                            self._download_one, remote_item_path, local_item, segments, prefetcher, item, raw
+                        ))
+            results.extend(self._collect(futures, on_result))
+
+        return results
+
+    def _download_one(
+            self,
+            remote_path: Path,
+            local_path: Path,
+            segments: int,
+            prefetcher: _HrefPrefetcher | None = None,
+            listed: Resource | None = None,
+            raw: bool = False,
+    ) -> TransferResult:
+        """
+        Скачивает один файл в local_path, не прерывая скачивание папки при ошибке.
+        listed - элемент листинга, по custom_properties которого известно, сжат ли файл;
+        без него это выясняется отдельным запросом. raw - сохранить сжатый файл без распаковки.
+        """
+        try:
+            href_response = prefetcher.take(remote_path) if prefetcher is not None else None
+            if raw:
+                codec = None
+            elif listed is not None:
+                codec = marked_codec(listed.name, listed.custom_properties)
+            else:
+                codec = self._stored_codec(remote_path)
+            response = self._download_file(remote_path, local_path, segments, href_response, codec)
+        except Exception as e:
+            return TransferResult(local_path, remote_path, None, e)
+        return TransferResult(local_path, remote_path, response)
+
+    def _write_stream(self, file_response: Response, download_path: Path, codec: Codec | None = None) -> None:
+        """Записывает тело ответа в файл по мере получения, с codec - распаковывая его"""
+        if file_response.status_code != 200:
+            raise Exception(f"Ошибка при загрузке файла: {file_response.status_code}")
+
+        decompressor = StreamDecompressor(codec) if codec is not None else None
+        started = time.perf_counter()
+        received = 0
+        with download_path.open("wb") as f:
+            for chunk in file_response.iter_content(chunk_size=8192):
+                if chunk:
+                    f.write(decompressor.feed(chunk) if decompressor else chunk)
+                    received += len(chunk)
+            if decompressor:
+                f.write(decompressor.finish())
+        if self._metrics is not None:
+            self._metrics.observe_body("data", time.perf_counter() - started, received)
+
+    def _download_segmented(self, download_url: str, download_path: Path, segments: int) -> Response:
+        """
+        Скачивает файл несколькими Range-запросами в заранее выделенный файл.
+        Если сервер не поддерживает Range, файл качается одним потоком.
+        """
+        probe = self._request(
+            "GET", download_url, operation="download", stream=True, headers={"Range": "bytes=0-0"}
+        )
+        content_range = probe.headers.get("Content-Range", "")
+        if probe.status_code == 416:
+            probe.close()
+            probe = self._request("GET", download_url, operation="download", stream=True)
+        if probe.status_code != 206 or "/" not in content_range:
+            self._write_stream(probe, download_path)
+            return probe
+        probe.close()
+
+        total = int(content_range.rsplit("/", 1)[1])
+        segments = max(1, min(segments, total // MIN_SEGMENT_SIZE))
+        bounds = [(total * i // segments, total * (i + 1) // segments - 1) for i in range(segments)]
+
+        fd = os.open(download_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            os.ftruncate(fd, total)
+            with ThreadPoolExecutor(max_workers=segments) as executor:
+                futures = [
+                    executor.submit(self._download_segment, download_url, fd, start, end)
+                    for start, end in bounds
+                ]
+                for future in futures:
+                    future.result()
+        finally:
+            os.close(fd)
+
+        return probe
+
+    def _download_segment(self, download_url: str, fd: int, start: int, end: int) -> None:
+        """Качает диапазон [start, end] и пишет его по месту; после обрыва продолжает с недокачанного байта"""
+        policy = self._retry_policies["download"]
+        position = start
+        for attempt in range(SEGMENT_ATTEMPTS):
+            try:
+                response = self._request(
+                    "GET",
+                    download_url,
+                    operation="download",
+                    stream=True,
+                    headers={"Range": f"bytes={position}-{end}"},
+                )
+                with response:
+                    if response.status_code != 206:
+                        raise Exception(f"Ошибка при загрузке части файла: {response.status_code}")
+                    started, first = time.perf_counter(), position
+                    for chunk in response.iter_content(chunk_size=65536):
+                        os.pwrite(fd, chunk, position)
+                        position += len(chunk)
+                    if self._metrics is not None:
+                        self._metrics.observe_body("data", time.perf_counter() - started, position - first)
+                if position > end:
+                    return
+            except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError):
+                if attempt == SEGMENT_ATTEMPTS - 1 or not self._retry_budget.withdraw():
+                    raise
+                time.sleep(policy.delay(attempt))
+        raise Exception(f"Не удалось скачать байты {start}-{end}")
+
+    def list_files(
+            self,
+            remote_path: Path | None = None,
+            page_size: int = 1000,
+            fields: str | None = DEFAULT_ITEM_FIELDS,
+            columnar: bool = False,
+    ) -> ListFilesResult:
+        """
+        Получение полного списка файлов в папке Диска (все страницы).
+        fields - какие поля элементов запрашивать (None - все),
+        columnar - сложить листинг в ResourceColumns вместо списка (экономнее для больших папок).
+        """
         try:
             path_to_list = str(remote_path) if remote_path else ""
-            url = f"{self._base_url}{self._settings.resources_endpoint}?path={path_to_list}&limit=1000"
-            response = requests.get(
-                url,
-                headers=self._headers,
-            )
+            response = self._files_page(path_to_list, 0, page_size, fields)
 
             if response.status_code != 200:
                 return ListFilesResult(response=response, files=None)
 
-            items = response.json().get("_embedded", {}).get("items", [])
+            pages = self._iter_pages(lambda offset: self._files_page(path_to_list, offset, page_size, fields), response)
+            items = ResourceColumns(pages) if columnar else list(pages)
             return ListFilesResult(response=response, files=items)
         except Exception as e:
             print(f"Ошибка при получении списка файлов: {str(e)}")
-            raise
\ No newline at end of file
+            raise
+
+    def iter_files(
+            self, remote_path: Path | None = None, page_size: int = 1000, fields: str | None = DEFAULT_ITEM_FIELDS
+    ) -> Iterator[Resource]:
+        """
+        Постранично перебирает содержимое папки Диска.
+        Следующая страница запрашивается в фоне, пока вызывающий код обрабатывает текущую.
+        fields - какие поля элементов запрашивать (None - все).
+        """
+        path_to_list = str(remote_path) if remote_path else ""
+        response = self._files_page(path_to_list, 0, page_size, fields)
+        yield from self._iter_pages(
+            lambda offset: self._files_page(path_to_list, offset, page_size, fields), response
+        )
+
+    def iter_all_files(
+            self,
+            media_type: str | None = None,
+            fields: str | None = DEFAULT_ITEM_FIELDS,
+            page_size: int = 1000,
+    ) -> Iterator[Resource]:
+        """
+        Плоский перебор всех файлов Диска без обхода папок (эндпоинт /resources/files).
+        media_type - фильтр по типу (например "image,video"),
+        fields - какие поля элементов запрашивать (None - все).
+        """
+        def fetch(offset: int) -> Response:
+            params: dict[str, Any] = {"offset": offset, "limit": page_size}
+            if media_type:
+                params["media_type"] = media_type
+            if fields is not None:
+                params["fields"] = flat_listing_fields(fields)
+            url = f"{self._base_url}{self._settings.files_endpoint}"
+            return self._request("GET", url, headers=self._headers, params=params)
+
+        yield from self._iter_pages(fetch, fetch(0))
+
+    def _files_page(self, path_to_list: str, offset: int, limit: int, fields: str | None = None) -> Response:
+        """Запрашивает одну страницу содержимого папки"""
+        url = f"{self._base_url}{self._settings.resources_endpoint}"
+        params: dict[str, Any] = {"path": path_to_list, "offset": offset, "limit": limit}
+        if fields is not None:
+            params["fields"] = listing_fields(fields)
+        return self._request(
+            "GET",
+            url,
+            headers=self._headers,
+            params=params,
+        )
+
+    def _iter_pages(self, fetch: Callable[[int], Response], response: Response) -> Iterator[Resource]:
+        """
+        Отдает элементы начиная с уже полученной страницы, подгружая следующие заранее.
+        Понимает и листинг папки (_embedded с total), и плоский список без total:
+        там страница считается последней, если она неполная.
+        """
+        offset = 0
+        with ThreadPoolExecutor(max_workers=1) as prefetcher:
+            while True:
+                if response.status_code != 200:
+                    raise requests.HTTPError(
+                        f"Ошибка получения списка файлов: {response.status_code}", response=response
+                    )
+
+                payload = response.json()
+                page = payload.get("_embedded", payload) if payload.get("type") != "file" else {}
+                items = page.get("items", [])
+                total = page.get("total")
+                offset += len(items)
+                has_more = offset < total if total is not None else len(items) >= page.get("limit", len(items) + 1)
+
+                next_page = None
+                if items and has_more:
+                    next_page = prefetcher.submit(fetch, offset)
+
+                for item in items:
+                    yield Resource.from_json(item)
+
+                if next_page is None:
+                    return
+                response = next_page.result()
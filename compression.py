@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+import mimetypes
+import zlib
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Iterable, Iterator, NamedTuple
+
+if TYPE_CHECKING:
+    from models import Resource
+
+READ_CHUNK_SIZE = 1024 * 1024
+SAMPLE_SIZE = 64 * 1024
+MIN_COMPRESS_SIZE = 1024
+"""Файлы меньше этого размера не сжимаются: заголовок кодека съест выигрыш"""
+MIN_SAVING = 0.1
+"""Файл сжимается, только если пробный кусок из его начала сжался хотя бы на эту долю"""
+
+PROPERTY_NAME = "compression"
+"""Ключ custom_properties ресурса Диска, в котором записан кодек сжатого при загрузке файла"""
+ORIGINAL_SIZE = "original_size"
+ORIGINAL_MD5 = "original_md5"
+"""Размер и md5 файла до сжатия, тоже в custom_properties"""
+
+_COMPRESSED_SUFFIXES = frozenset({
+    ".gz", ".tgz", ".zst", ".bz2", ".xz", ".lz4", ".lzma", ".7z", ".zip", ".rar", ".br",
+    ".jar", ".apk", ".docx", ".xlsx", ".pptx", ".odt", ".ods", ".epub", ".pdf",
+    ".jpg", ".jpeg", ".png", ".gif", ".webp", ".heic", ".avif",
+    ".mp3", ".aac", ".ogg", ".opus", ".flac", ".m4a", ".mp4", ".mkv", ".mov", ".avi", ".webm",
+})
+_COMPRESSED_MEDIA = ("image/", "video/", "audio/")
+
+
+class Codec(NamedTuple):
+    """Кодек сжатия: suffix добавляется к имени файла на Диске"""
+
+    name: str
+    suffix: str
+    compressor: Callable[[], Any]
+    decompressor: Callable[[], Any]
+
+
+def _gzip_compressor() -> Any:
+    return zlib.compressobj(6, zlib.DEFLATED, 31)
+
+
+def _gzip_decompressor() -> Any:
+    return zlib.decompressobj(31)
+
+
+def _zstandard() -> Any:
+    try:
+        import zstandard
+    except ImportError:
+        raise Exception("Для сжатия zstd нужен пакет zstandard (pip install zstandard)") from None
+    return zstandard
+
+
+def _zstd_compressor() -> Any:
+    return _zstandard().ZstdCompressor(level=3).compressobj()
+
+
+def _zstd_decompressor() -> Any:
+    return _zstandard().ZstdDecompressor().decompressobj()
+
+
+CODECS = {
+    "gzip": Codec("gzip", ".gz", _gzip_compressor, _gzip_decompressor),
+    "zstd": Codec("zstd", ".zst", _zstd_compressor, _zstd_decompressor),
+}
+
+
+def get_codec(name: str) -> Codec:
+    codec = CODECS.get(name)
+    if codec is None:
+        raise ValueError(f"Неизвестный кодек сжатия: {name} (доступны {', '.join(CODECS)})")
+    return codec
+
+
+def codec_for_name(name: str) -> Codec | None:
+    """Кодек, суффикс которого стоит в конце имени файла"""
+    for codec in CODECS.values():
+        if name.endswith(codec.suffix) and len(name) > len(codec.suffix):
+            return codec
+    return None
+
+
+def marked_codec(name: str, custom_properties: dict[str, Any] | None) -> Codec | None:
+    """Кодек ресурса, сжатого при загрузке: суффикс кодека в имени и отметка в custom_properties"""
+    codec = codec_for_name(name)
+    if codec is None or not custom_properties or custom_properties.get(PROPERTY_NAME) != codec.name:
+        return None
+    return codec
+
+
+def by_local_name(items: Iterable[Resource]) -> dict[str, Resource]:
+    """
+    Ресурсы папки Диска по именам локальных файлов: сжатый при загрузке x.log.gz соответствует x.log.
+    Если на Диске есть и несжатый файл с тем же именем, берется он.
+    """
+    result: dict[str, Resource] = {}
+    marked = []
+    for item in items:
+        codec = None if item.is_dir else marked_codec(item.name, item.custom_properties)
+        if codec is None:
+            result[item.name] = item
+        else:
+            marked.append((item.name.removesuffix(codec.suffix), item))
+    for name, item in marked:
+        result.setdefault(name, item)
+    return result
+
+
+def original_content(item: Resource) -> tuple[int, str | None, str | None]:
+    """Размер, md5 и кодек содержимого файла Диска до сжатия"""
+    codec = marked_codec(item.name, item.custom_properties)
+    if codec is None:
+        return item.size or 0, item.md5, None
+    properties = item.custom_properties or {}
+    return properties.get(ORIGINAL_SIZE, item.size or 0), properties.get(ORIGINAL_MD5), codec.name
+
+
+def is_compressible(path: Path) -> bool:
+    """
+    Имеет ли смысл сжимать файл: уже сжатые форматы отсеиваются по расширению и типу,
+    остальные - пробным сжатием начала файла.
+    """
+    if path.suffix.lower() in _COMPRESSED_SUFFIXES:
+        return False
+    mime, encoding = mimetypes.guess_type(path.name)
+    if encoding is not None or (mime or "").startswith(_COMPRESSED_MEDIA):
+        return False
+    if path.stat().st_size < MIN_COMPRESS_SIZE:
+        return False
+    with path.open("rb") as f:
+        sample = f.read(SAMPLE_SIZE)
+    return len(zlib.compress(sample, 1)) <= len(sample) * (1 - MIN_SAVING)
+
+
+def iter_compressed(
+        path: Path, codec: Codec, on_read: Callable[[int], None] | None = None, digest: Any = None
+) -> Iterator[bytes]:
+    """
+    Сжатое содержимое файла кусками по мере чтения, без временного файла:
+    в памяти находится один прочитанный блок и буфер кодека.
+    on_read вызывается с числом прочитанных несжатых байт, в digest (объект hashlib) добавляются несжатые данные.
+    """
+    compressor = codec.compressor()
+    done = 0
+    with path.open("rb") as f:
+        while chunk := f.read(READ_CHUNK_SIZE):
+            done += len(chunk)
+            if digest is not None:
+                digest.update(chunk)
+            if on_read:
+                on_read(done)
+            compressed = compressor.compress(chunk)
+            if compressed:
+                yield compressed
+    tail = compressor.flush()
+    if tail:
+        yield tail
+
+
+class StreamDecompressor:
+    """Распаковывает поток кусками; finish проверяет, что сжатые данные не оборвались"""
+
+    def __init__(self, codec: Codec) -> None:
+        self._codec = codec
+        self._decompressor = codec.decompressor()
+
+    def feed(self, chunk: bytes) -> bytes:
+        return self._decompressor.decompress(chunk)
+
+    def finish(self) -> bytes:
+        tail = self._decompressor.flush()
+        if not getattr(self._decompressor, "eof", True):
+            raise EOFError(f"Сжатые данные ({self._codec.name}) оборвались")
+        return tail
@@ -0,0 +1,250 @@
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Iterable, Iterator, NamedTuple, TYPE_CHECKING
+
+from models import Resource
+
+if TYPE_CHECKING:
+    from client import YandexDiskClient
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS resources (
+    path TEXT PRIMARY KEY,
+    parent TEXT NOT NULL,
+    name TEXT NOT NULL,
+    type TEXT NOT NULL,
+    size INTEGER,
+    md5 TEXT,
+    sha256 TEXT,
+    modified TEXT,
+    custom_properties TEXT
+);
+CREATE INDEX IF NOT EXISTS resources_parent ON resources (parent);
+CREATE TABLE IF NOT EXISTS dirs (
+    path TEXT PRIMARY KEY,
+    refreshed_at REAL NOT NULL
+);
+"""
+
+_COLUMNS = ("path", "name", "type", "size", "md5", "sha256", "modified", "custom_properties")
+
+
+class DiffEntry(NamedTuple):
+    """Расхождение между локальной папкой и индексом Диска."""
+
+    status: str
+    relative_path: Path
+
+
+def _key(path: Path | str | None) -> str:
+    """Путь Диска в виде 'a/b' без префикса disk: и крайних слешей; корень - пустая строка"""
+    if path is None:
+        return ""
+    key = str(path).removeprefix("disk:").strip("/")
+    return "" if key == "." else key
+
+
+def _parent(key: str) -> str:
+    return key.rsplit("/", 1)[0] if "/" in key else ""
+
+
+class DiskIndex:
+    """
+    Локальный индекс дерева Яндекс Диска в SQLite.
+    Заполняется листингами папок, свежесть отслеживается для каждой папки отдельно.
+    """
+
+    def __init__(self, db_path: Path | str, max_age: float = 3600.0) -> None:
+        """
+        db_path - файл базы данных,
+        max_age - сколько секунд листинг папки считается актуальным.
+        """
+        self._max_age = max_age
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(db_path), check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(resources)")}
+        if "custom_properties" not in columns:
+            with self._db:
+                self._db.execute("ALTER TABLE resources ADD COLUMN custom_properties TEXT")
+
+    def __enter__(self) -> DiskIndex:
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Закрывает базу данных"""
+        self._db.close()
+
+    def refresh(
+            self,
+            client: YandexDiskClient,
+            remote_path: Path | None = None,
+            recursive: bool = True,
+            stale_only: bool = False,
+    ) -> int:
+        """
+        Перечитывает папку (и при recursive все вложенные) с Диска, возвращает число записанных элементов.
+        stale_only - перечитываются только устаревшие и еще не проиндексированные папки,
+        в подпапки свежих обход спускается по индексу без запросов к API.
+        """
+        pending = deque([_key(remote_path)])
+        count = 0
+        while pending:
+            folder = pending.popleft()
+            if stale_only and self.is_fresh(Path(folder)):
+                if recursive:
+                    pending.extend(self._subdirs(folder))
+                continue
+            items = client.iter_files(Path(folder) if folder else Path("/"), fields=",".join(_COLUMNS))
+            count += self._replace_folder(folder, items, pending if recursive else None)
+        return count
+
+    def _subdirs(self, folder: str) -> list[str]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT path FROM resources WHERE parent = ? AND type = 'dir' ORDER BY path", (folder,)
+            ).fetchall()
+        return [path for (path,) in rows]
+
+    def _replace_folder(self, folder: str, items: Iterator[Resource], pending: deque[str] | None) -> int:
+        """Заменяет содержимое одной папки в индексе новым листингом"""
+        rows = []
+        for item in items:
+            key = _key(item.path) or f"{folder}/{item.name}".strip("/")
+            properties = json.dumps(item.custom_properties) if item.custom_properties is not None else None
+            rows.append((
+                key, folder, item.name, item.type, item.size, item.md5, item.sha256, item.modified, properties
+            ))
+            if pending is not None and item.is_dir:
+                pending.append(key)
+
+        new_keys = {row[0] for row in rows}
+        with self._lock, self._db:
+            old_dirs = self._db.execute(
+                "SELECT path FROM resources WHERE parent = ? AND type = 'dir'", (folder,)
+            ).fetchall()
+            for (old_dir,) in old_dirs:
+                if old_dir not in new_keys:
+                    self._delete_subtree(old_dir)
+            self._db.execute("DELETE FROM resources WHERE parent = ?", (folder,))
+            self._db.executemany(
+                "INSERT OR REPLACE INTO resources "
+                "(path, parent, name, type, size, md5, sha256, modified, custom_properties) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._db.execute("INSERT OR REPLACE INTO dirs VALUES (?, ?)", (folder, time.time()))
+        return len(rows)
+
+    def _delete_subtree(self, key: str) -> None:
+        pattern = f"{key}/%"
+        self._db.execute("DELETE FROM resources WHERE path = ? OR path LIKE ?", (key, pattern))
+        self._db.execute("DELETE FROM dirs WHERE path = ? OR path LIKE ?", (key, pattern))
+
+    def update_folder(self, remote_path: Path | None, items: Iterable[Resource]) -> int:
+        """Записывает свежий листинг одной папки, полученный с Диска, без обхода вложенных"""
+        return self._replace_folder(_key(remote_path), iter(items), None)
+
+    def invalidate(self, remote_path: Path | None = None, recursive: bool = True) -> None:
+        """Помечает папку (при recursive - и все вложенные) как устаревшую"""
+        key = _key(remote_path)
+        with self._lock, self._db:
+            if not recursive:
+                self._db.execute("DELETE FROM dirs WHERE path = ?", (key,))
+            elif key:
+                self._db.execute("DELETE FROM dirs WHERE path = ? OR path LIKE ?", (key, f"{key}/%"))
+            else:
+                self._db.execute("DELETE FROM dirs")
+
+    def is_fresh(self, remote_path: Path | None) -> bool:
+        """Листинг папки есть в индексе и не старше max_age"""
+        with self._lock:
+            row = self._db.execute("SELECT refreshed_at FROM dirs WHERE path = ?", (_key(remote_path),)).fetchone()
+        return row is not None and time.time() - row[0] <= self._max_age
+
+    def exists(self, remote_path: Path | None, kind: str | None = None) -> bool | None:
+        """
+        Существует ли путь по данным индекса; kind - file или dir, если важен тип ресурса.
+        None - родительская папка не проиндексирована или устарела, нужен запрос к Диску.
+        """
+        key = _key(remote_path)
+        if not key:
+            return kind in (None, "dir")
+
+        parts = key.split("/")
+        for depth in range(len(parts) - 1, -1, -1):
+            if not self.is_fresh(Path("/".join(parts[:depth]))):
+                continue
+            with self._lock:
+                row = self._db.execute(
+                    "SELECT type FROM resources WHERE path = ?", ("/".join(parts[:depth + 1]),)
+                ).fetchone()
+            if row is None:
+                return False
+            if depth < len(parts) - 1:
+                return None
+            return kind is None or row[0] == kind
+        return None
+
+    def list_folder(self, remote_path: Path | None = None) -> list[Resource] | None:
+        """Содержимое папки в том же виде, что и листинг клиента; None - папка не проиндексирована или устарела"""
+        if not self.is_fresh(remote_path):
+            return None
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM resources WHERE parent = ? ORDER BY name",
+                (_key(remote_path),),
+            ).fetchall()
+        return [
+            Resource(name, f"disk:/{path}", *rest, custom_properties=json.loads(properties) if properties else None)
+            for path, name, *rest, properties in rows
+        ]
+
+    def diff(self, local_folder: Path, remote_folder: Path | None) -> Iterator[DiffEntry]:
+        """
+        Сравнивает локальную папку с индексом по размеру файлов.
+        Статусы: added - только локально, modified - размер отличается, deleted - только на Диске,
+        unknown - папка на Диске не проиндексирована или устарела, ее содержимое не сравнивается.
+        """
+        root = _key(remote_folder)
+        for current, dirnames, filenames in os.walk(local_folder):
+            relative = Path(current).relative_to(local_folder)
+            folder = "/".join(part for part in (root, relative.as_posix()) if part and part != ".")
+            if not self.is_fresh(Path(folder)):
+                yield DiffEntry("unknown", relative)
+                dirnames[:] = []
+                continue
+            with self._lock:
+                remote = {
+                    name: (kind, size)
+                    for name, kind, size in self._db.execute(
+                        "SELECT name, type, size FROM resources WHERE parent = ?", (folder,)
+                    )
+                }
+
+            for name in filenames:
+                entry = remote.pop(name, None)
+                if entry is None:
+                    yield DiffEntry("added", relative / name)
+                elif entry[0] != "file" or entry[1] != os.path.getsize(os.path.join(current, name)):
+                    yield DiffEntry("modified", relative / name)
+
+            for name in list(dirnames):
+                entry = remote.pop(name, None)
+                if entry is None:
+                    yield DiffEntry("added", relative / name)
+                    dirnames.remove(name)
+
+            for name in remote:
+                yield DiffEntry("deleted", relative / name)
@@ -1,25 +1,154 @@
 import argparse
+import hashlib
+import os
+import sys
+import time
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import TYPE_CHECKING, Iterable, Iterator, List, Optional, Tuple
 
-from client import YandexDiskClient
+# Тяжелые модули (requests, pydantic_settings) импортируются только внутри main(),
+# чтобы --help и ошибки в аргументах не тратили на них время.
+if TYPE_CHECKING:
+    from client import TransferResult, YandexDiskClient
+    from disk_index import DiskIndex
+    from metrics import RequestMetrics
+    from models import Resource
 
+ACCESS_CACHE_DIR = Path(os.environ.get("XDG_CACHE_HOME", "~/.cache")).expanduser() / "yandex-disk-cli"
 
-def get_client() -> YandexDiskClient:
+
+class PhaseTimer:
+    """Замеряет длительность фаз работы CLI для --timings"""
+
+    def __init__(self, enabled: bool) -> None:
+        self.enabled = enabled
+        self.phases: List[Tuple[str, float]] = []
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - started))
+
+    def report(self) -> None:
+        if not self.enabled:
+            return
+        for name, seconds in self.phases:
+            print(f"{name:<14} {seconds * 1000:8.1f} ms", file=sys.stderr)
+        print(f"{'total':<14} {sum(seconds for _, seconds in self.phases) * 1000:8.1f} ms", file=sys.stderr)
+
+
+def get_client(
+        index: Optional["DiskIndex"] = None, metrics: Optional["RequestMetrics"] = None
+) -> "YandexDiskClient":
     """Возвращает клиент для Яндекс Диска"""
-    return YandexDiskClient()
+    from client import TransferResult, YandexDiskClient
+
+    return YandexDiskClient(index=index, metrics=metrics)
+
+
+def write_metrics(metrics: "RequestMetrics", fmt: str, path: Optional[str]) -> None:
+    """Выводит замеры запросов в формате Prometheus или JSON в файл или в stderr"""
+    text = metrics.to_prometheus() if fmt == "prometheus" else metrics.to_json() + "\n"
+    if path:
+        Path(path).write_text(text, encoding="utf-8")
+    else:
+        sys.stderr.write(text)
+
 
+def check_access(client: "YandexDiskClient", cache_ttl: float = 0.0) -> bool:
+    """
+    Проверяет доступ к Диску и печатает ошибку, если доступа нет.
+    cache_ttl - сколько секунд доверять последней успешной проверке с тем же токеном
+    (отметка хранится в ACCESS_CACHE_DIR), 0 - проверять при каждом запуске.
+    """
+    settings = client.settings
+    key = hashlib.sha256(f"{settings.base_url}\0{settings.access_token}".encode()).hexdigest()[:32]
+    marker = ACCESS_CACHE_DIR / f"access-{key}"
+    if cache_ttl > 0:
+        try:
+            if time.time() - marker.stat().st_mtime < cache_ttl:
+                return True
+        except OSError:
+            pass
 
-def print_file_list(items: List[Dict[str, Any]]) -> None:
-    """Выводит список файлов в удобном формате"""
+    access_response = client.check_disk_access()
+    if access_response.status_code != 200:
+        print(f"Ошибка доступа к Яндекс Диску: {access_response.status_code}")
+        print(access_response.text)
+        return False
+
+    if cache_ttl > 0:
+        try:
+            ACCESS_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            marker.touch()
+        except OSError:
+            pass
+    return True
+
+
+def print_file_list(items: Iterable["Resource"], show_path: bool = False) -> int:
+    """
+    Выводит список файлов в удобном формате по мере получения, возвращает их количество.
+    items - список ресурсов, ResourceColumns или итератор листинга.
+    """
+    count = 0
     for item in items:
-        item_type = "папка" if item.get("type") == "dir" else "файл"
-        print(f"{item_type:<5} {item.get('name')}" f" ({item.get('size', 'N/A')} bytes)")
+        item_type = "папка" if item.is_dir else "файл"
+        label = item.path if show_path else item.name
+        size = item.size if item.size is not None else "N/A"
+        print(f"{item_type:<5} {label}" f" ({size} bytes)", flush=True)
+        count += 1
+    return count
+
+
+def print_downloaded(result: "TransferResult") -> None:
+    """Печатает скачанный файл; вызывается клиентом в основном потоке, поэтому строки не перемешиваются"""
+    if result.ok and result.response is not None:
+        print(f"Файл успешно скачан: {result.remote_path} -> {result.local_path}", flush=True)
 
 
 def parse_args(args: Optional[List[str]] = None) -> argparse.Namespace:
     """Парсер аргументов с поддержкой пробелов в путях"""
     parser = argparse.ArgumentParser(description="Yandex Disk CLI Client")
+    parser.add_argument(
+        "--index",
+        help="Файл локального индекса Диска (SQLite) для ответов без запросов к API",
+    )
+    parser.add_argument(
+        "--max-age",
+        type=float,
+        default=3600.0,
+        help="Сколько секунд листинг папки в индексе считается актуальным",
+    )
+    parser.add_argument(
+        "--no-access-check",
+        action="store_true",
+        help="Не проверять доступ к Диску перед командой",
+    )
+    parser.add_argument(
+        "--access-cache-ttl",
+        type=float,
+        default=0.0,
+        help="Сколько секунд не повторять успешную проверку доступа (0 - проверять всегда)",
+    )
+    parser.add_argument(
+        "--timings",
+        action="store_true",
+        help="Вывести в stderr длительность фаз: импорты, клиент, проверка доступа, команда",
+    )
+    parser.add_argument(
+        "--metrics",
+        choices=["prometheus", "json"],
+        help="В конце работы вывести замеры HTTP-запросов (фазы, коды ответа, байты) в этом формате",
+    )
+    parser.add_argument(
+        "--metrics-file",
+        help="Файл для --metrics (по умолчанию stderr)",
+    )
 
     subparsers = parser.add_subparsers(dest="command", required=True)
 
@@ -37,16 +166,55 @@ def parse_args(args: Optional[List[str]] = None) -> argparse.Namespace:
         choices=["file", "folder"],
         help="Укажите тип загружаемого объекта",
     )
+    upload_parser.add_argument(
+        "--jobs",
+        type=int,
+        default=4,
+        help="Количество параллельных загрузок для папки",
+    )
+    upload_parser.add_argument(
+        "--skip-unchanged",
+        action="store_true",
+        help="Не загружать файлы, совпадающие с уже лежащими на Диске по размеру и md5",
+    )
+    upload_parser.add_argument(
+        "--pack-below",
+        type=int,
+        help="Упаковывать файлы меньше этого размера (в байтах) в архивы tar вместо загрузки по одному",
+    )
+    upload_parser.add_argument(
+        "--compress",
+        choices=["gzip", "zstd"],
+        help="Сжимать файлы на лету при загрузке (уже сжатые форматы отправляются как есть)",
+    )
 
-    download_parser = subparsers.add_parser("download", help="Скачать файл из облака")
+    download_parser = subparsers.add_parser("download", help="Скачать файл или папку из облака")
     download_parser.add_argument(
         "source",
-        help="Удаленный путь к файлу в облаке (можно в кавычках)",
+        help="Удаленный путь к файлу или папке в облаке (можно в кавычках)",
     )
     download_parser.add_argument(
         "destination",
         help="Локальный путь для сохранения файла (можно в кавычках)",
     )
+    download_parser.add_argument(
+        "--segments",
+        type=int,
+        default=1,
+        help="Количество параллельных Range-запросов для одного файла",
+    )
+    download_parser.add_argument(
+        "--type",
+        choices=["file", "folder"],
+        default="file",
+        help="Укажите тип скачиваемого объекта",
+    )
+    download_parser.add_argument(
+        "--jobs",
+        type=int,
+        default=4,
+        help="Количество параллельных скачиваний для папки",
+    )
 
     list_parser = subparsers.add_parser("list", help="Список файлов в облаке")
     list_parser.add_argument(
@@ -55,75 +223,264 @@ def parse_args(args: Optional[List[str]] = None) -> argparse.Namespace:
         default="",
         help="Путь в облачном хранилище (можно в кавычках)",
     )
+    list_parser.add_argument(
+        "--page-size",
+        type=int,
+        default=1000,
+        help="Количество элементов, запрашиваемых за один запрос",
+    )
+    list_parser.add_argument(
+        "--all",
+        action="store_true",
+        help="Плоский список всех файлов Диска без обхода папок",
+    )
+    list_parser.add_argument(
+        "--media-type",
+        help="Фильтр для --all по типу файлов через запятую (image, video, document, ...)",
+    )
+
+    sync_parser = subparsers.add_parser("sync", help="Синхронизировать локальную папку с папкой в облаке")
+    sync_parser.add_argument(
+        "source",
+        help="Путь к локальной папке (можно в кавычках)",
+    )
+    sync_parser.add_argument(
+        "destination",
+        help="Путь к папке в облачном хранилище (можно в кавычках)",
+    )
+    sync_parser.add_argument(
+        "--direction",
+        choices=["push", "pull", "both"],
+        default="push",
+        help="push - в облако, pull - из облака, both - в обе стороны по времени изменения",
+    )
+    sync_parser.add_argument(
+        "--delete",
+        action="store_true",
+        help="Удалять файлы, которых нет на стороне-источнике (для push и pull)",
+    )
+    sync_parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Только вывести план синхронизации",
+    )
+    sync_parser.add_argument(
+        "--jobs",
+        type=int,
+        default=4,
+        help="Количество параллельных передач",
+    )
+
+    restore_parser = subparsers.add_parser("restore", help="Восстановить файлы, загруженные с --pack-below")
+    restore_parser.add_argument(
+        "source",
+        help="Папка в облачном хранилище, загруженная с --pack-below (можно в кавычках)",
+    )
+    restore_parser.add_argument(
+        "destination",
+        help="Локальная папка для восстановления (можно в кавычках)",
+    )
+    restore_parser.add_argument(
+        "--only",
+        nargs="+",
+        help="Восстановить только эти файлы (пути относительно загруженной папки)",
+    )
+    restore_parser.add_argument(
+        "--jobs",
+        type=int,
+        default=4,
+        help="Количество параллельных скачиваний",
+    )
+
+    refresh_parser = subparsers.add_parser("refresh", help="Обновить локальный индекс Диска")
+    refresh_parser.add_argument(
+        "path",
+        nargs="?",
+        default="",
+        help="Папка в облачном хранилище, с которой начать обход (можно в кавычках)",
+    )
+    refresh_parser.add_argument(
+        "--no-recursive",
+        action="store_true",
+        help="Обновить только саму папку, без вложенных",
+    )
+    refresh_parser.add_argument(
+        "--stale-only",
+        action="store_true",
+        help="Перечитать только устаревшие и еще не проиндексированные папки",
+    )
+
+    diff_parser = subparsers.add_parser("diff", help="Сравнить локальную папку с индексом Диска без запросов к API")
+    diff_parser.add_argument("source", help="Локальная папка")
+    diff_parser.add_argument("destination", help="Папка в облачном хранилище (можно в кавычках)")
 
     return parser.parse_args(args)
 
 
 def main() -> None:
+    args = parse_args()
+    timer = PhaseTimer(args.timings)
+    metrics = None
+    index = None
     try:
-        args = parse_args()
-        client = get_client()
-        access_response = client.check_disk_access()
+        with timer.phase("imports"):
+            from disk_index import DiskIndex
+            from sync import describe_plan, plan_sync, run_sync
+        with timer.phase("client"):
+            if args.metrics:
+                from metrics import RequestMetrics
 
-        if access_response.status_code != 200:
-            print(f"Ошибка доступа к Яндекс Диску: {access_response.status_code}")
-            print(access_response.text)
-            return
+                metrics = RequestMetrics()
+            index = DiskIndex(args.index, max_age=args.max_age) if args.index else None
+            client = get_client(index, metrics)
+        with client:
+            if not args.no_access_check and args.command != "diff":
+                with timer.phase("access check"):
+                    if not check_access(client, args.access_cache_ttl):
+                        return
+
+            with timer.phase(args.command):
+                if args.command == "upload":
+                    source = Path(args.source).expanduser().resolve()
+                    destination = Path(args.destination.strip("\"'"))
+
+                    if not source.exists():
+                        raise FileNotFoundError(f"Локальный путь не существует: {source}")
+
+                    upload_type = args.type.lower() if args.type else "folder" if source.is_dir() else "file"
+
+                    if upload_type == "folder":
+                        print(f"Загрузка папки '{source}' в '{destination}'...")
+                        results = client.upload_folder(
+                            source,
+                            destination,
+                            jobs=args.jobs,
+                            skip_unchanged=args.skip_unchanged,
+                            pack_below=args.pack_below,
+                            compress=args.compress,
+                        )
+                        failed = [result for result in results if not result.ok]
+                        skipped = sum(result.skipped for result in results)
+                        print(f"Успешно загружено {len(results) - len(failed) - skipped} элементов")
+                        if skipped:
+                            print(f"Пропущено без изменений: {skipped}")
+                        for result in failed:
+                            reason = result.error or f"код {result.response.status_code}"
+                            print(f"Ошибка загрузки '{result.local_path}': {reason}")
+                    else:
+                        print(f"Загрузка файла '{source}' в '{destination}'...")
+                        response = client.upload_file(source, destination, compress=args.compress)
+                        if response.status_code in (200, 201):
+                            print("Файл успешно загружен!")
+                        else:
+                            print(f"Ошибка загрузки: {response.status_code}")
+                            print(response.text)
+
+                elif args.command == "download":
+                    source = Path(args.source.strip("\"'"))
+                    destination = Path(args.destination).expanduser().resolve()
+
+                    print(f"Скачивание '{source}' в '{destination}'...")
+
+                    destination.parent.mkdir(parents=True, exist_ok=True)
+
+                    if args.type == "folder":
+                        results = client.download_folder(
+                            source, destination, jobs=args.jobs, segments=args.segments, on_result=print_downloaded
+                        )
+                        failed = [result for result in results if not result.ok]
+                        print(f"Успешно скачано {len(results) - len(failed)} элементов")
+                        for result in failed:
+                            reason = result.error or f"код {result.response.status_code}"
+                            print(f"Ошибка скачивания '{result.remote_path}': {reason}")
+                    else:
+                        response = client.download_file(source, destination, segments=args.segments)
+                        if response.status_code in (200, 206):
+                            print("Файл успешно скачан!")
+                        else:
+                            print(f"Ошибка скачивания: {response.status_code}")
+                            print(response.text)
+
+                elif args.command == "list" and args.all:
+                    print("Все файлы на Яндекс Диске:")
+                    items = client.iter_all_files(media_type=args.media_type, page_size=args.page_size)
+                    if not print_file_list(items, show_path=True):
+                        print("Файлов нет")
+
+                elif args.command == "list":
+                    path = Path(args.path.strip("\"'")) if args.path else Path("/")
+                    print(f"Содержимое '{path}' на Яндекс Диске:")
+
+                    indexed = index.list_folder(path) if index else None
+                    items = indexed if indexed is not None else client.iter_files(path, page_size=args.page_size)
+                    if not print_file_list(items):
+                        print("Папка пуста")
+
+                elif args.command == "sync":
+                    source = Path(args.source).expanduser().resolve()
+                    destination = Path(args.destination.strip("\"'"))
+                    if args.delete and args.direction == "both":
+                        raise ValueError("Удаление при синхронизации в обе стороны не поддерживается")
+
+                    actions = plan_sync(client, source, destination, direction=args.direction, delete=args.delete)
+                    if args.dry_run:
+                        counts, sizes = describe_plan(actions)
+                        if not counts:
+                            print("Изменений нет")
+                        for kind, count in counts.items():
+                            print(f"{kind}: {count} ({sizes[kind]} bytes)")
+                    else:
+                        summary = run_sync(client, actions, jobs=args.jobs)
+                        for kind, count in summary.done.items():
+                            print(f"{kind}: {count}")
+                        print(f"Передано {summary.transferred_bytes} bytes")
+                        for result in summary.failed:
+                            reason = result.error or f"код {result.response.status_code}"
+                            print(f"Ошибка синхронизации '{result.local_path}': {reason}")
+
+                elif args.command == "restore":
+                    source = Path(args.source.strip("\"'"))
+                    destination = Path(args.destination).expanduser().resolve()
+                    print(f"Восстановление '{source}' в '{destination}'...")
+                    results = client.restore_packed(source, destination, names=args.only, jobs=args.jobs)
+                    failed = [result for result in results if not result.ok]
+                    print(f"Успешно восстановлено {len(results) - len(failed)} файлов")
+                    for result in failed:
+                        reason = result.error or f"код {result.response.status_code}"
+                        print(f"Ошибка восстановления '{result.local_path}': {reason}")
+
+                elif args.command == "refresh":
+                    if not index:
+                        raise ValueError("Для обновления индекса укажите файл через --index")
+                    path = Path(args.path.strip("\"'")) if args.path else Path("/")
+                    print(f"Обновление индекса для '{path}'...")
+                    count = index.refresh(
+                        client, path, recursive=not args.no_recursive, stale_only=args.stale_only
+                    )
+                    print(f"В индекс записано {count} элементов")
 
-        if args.command == "upload":
-            source = Path(args.source).expanduser().resolve()
-            destination = Path(args.destination.strip("\"'"))
-
-            if not source.exists():
-                raise FileNotFoundError(f"Локальный путь не существует: {source}")
-
-            upload_type = args.type.lower() if args.type else "folder" if source.is_dir() else "file"
-
-            if upload_type == "folder":
-                print(f"Загрузка папки '{source}' в '{destination}'...")
-                responses = client.upload_folder(source, destination)
-                print(f"Успешно загружено {len(responses)} элементов")
-            else:
-                print(f"Загрузка файла '{source}' в '{destination}'...")
-                response = client.upload_file(source, destination)
-                if response.status_code in (200, 201):
-                    print("Файл успешно загружен!")
-                else:
-                    print(f"Ошибка загрузки: {response.status_code}")
-                    print(response.text)
-
-        elif args.command == "download":
-            source = Path(args.source.strip("\"'"))
-            destination = Path(args.destination).expanduser().resolve()
-
-            print(f"Скачивание '{source}' в '{destination}'...")
-
-            destination.parent.mkdir(parents=True, exist_ok=True)
-
-            response = client.download_file(source, destination)
-            if response.status_code == 200:
-                print("Файл успешно скачан!")
-            else:
-                print(f"Ошибка скачивания: {response.status_code}")
-                print(response.text)
-
-        elif args.command == "list":
-            path = Path(args.path.strip("\"'")) if args.path else Path("/")
-            print(f"Содержимое '{path}' на Яндекс Диске:")
-
-            result = client.list_files(path)
-            if result.response.status_code != 200:
-                print(f"Ошибка получения списка файлов: {result.response.status_code}")
-                print(result.response.text)
-            elif not result.files:
-                print("Папка пуста")
-            else:
-                print_file_list(result.files)
+                elif args.command == "diff":
+                    if not index:
+                        raise ValueError("Для сравнения с индексом укажите файл через --index")
+                    source = Path(args.source).expanduser().resolve()
+                    destination = Path(args.destination.strip("\"'"))
+                    changes = 0
+                    for entry in index.diff(source, destination):
+                        print(f"{entry.status:<8} {entry.relative_path}")
+                        changes += 1
+                    if not changes:
+                        print("Отличий от индекса нет")
 
     except Exception as e:
         print(f"Произошла ошибка: {str(e)}")
         if hasattr(e, "response") and hasattr(e.response, "text"):
             print("Детали ошибки:", e.response.text)
+    finally:
+        if index is not None:
+            index.close()
+        timer.report()
+        if metrics is not None:
+            write_metrics(metrics, args.metrics, args.metrics_file)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,285 @@
+from __future__ import annotations
+
+import json
+import socket
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Callable
+from urllib.parse import urlsplit
+
+from requests.adapters import HTTPAdapter
+from requests.models import Response
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+PHASES = ("dns", "connect", "tls", "send", "ttfb", "body", "total")
+"""
+dns, connect, tls - установка нового соединения (у переиспользованного их нет),
+send - отправка запроса с телом, ttfb - ожидание заголовков ответа,
+body - чтение тела, total - весь запрос целиком.
+"""
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_current = threading.local()
+
+
+class Histogram:
+    """Гистограмма с фиксированными границами корзин, как у Prometheus"""
+
+    __slots__ = ("bounds", "counts", "count", "sum")
+
+    def __init__(self, bounds: tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """Оценка квантиля линейной интерполяцией внутри корзины"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                lower = self.bounds[i - 1] if i else 0.0
+                upper = self.bounds[i] if i < len(self.bounds) else self.bounds[-1]
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.bounds[-1]
+
+    def summary(self) -> dict[str, float]:
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "mean": round(self.sum / self.count, 6) if self.count else 0.0,
+            "p50": round(self.quantile(0.5), 6),
+            "p90": round(self.quantile(0.9), 6),
+            "p99": round(self.quantile(0.99), 6),
+        }
+
+
+def _phase(name: str, seconds: float) -> None:
+    phases = getattr(_current, "phases", None)
+    if phases is not None:
+        phases[name] = phases.get(name, 0.0) + seconds
+
+
+def _setup_time(phases: dict[str, float]) -> float:
+    return phases.get("dns", 0.0) + phases.get("connect", 0.0) + phases.get("tls", 0.0)
+
+
+class _TimedConnectionMixin:
+    """Замеряет фазы запроса на уровне соединения urllib3 и складывает их в текущий замер потока"""
+
+    _dns_host: str
+    port: int
+
+    def _new_conn(self) -> socket.socket:
+        if getattr(_current, "phases", None) is None:
+            return super()._new_conn()  # type: ignore[misc]
+        started = time.perf_counter()
+        host = self._dns_host
+        try:
+            address = socket.getaddrinfo(host, self.port, 0, socket.SOCK_STREAM)[0][4][0]
+        except OSError:
+            address = host
+        resolved = time.perf_counter()
+        _phase("dns", resolved - started)
+        self._dns_host = address
+        try:
+            sock = super()._new_conn()  # type: ignore[misc]
+        except OSError:
+            self._dns_host = host
+            sock = super()._new_conn()  # type: ignore[misc]
+        finally:
+            self._dns_host = host
+        _phase("connect", time.perf_counter() - resolved)
+        return sock
+
+    def request(self, *args: Any, **kwargs: Any) -> None:
+        phases = getattr(_current, "phases", None)
+        if phases is None:
+            return super().request(*args, **kwargs)  # type: ignore[misc]
+        setup_before = _setup_time(phases)
+        started = time.perf_counter()
+        super().request(*args, **kwargs)  # type: ignore[misc]
+        now = time.perf_counter()
+        phases["send"] = max(now - started - (_setup_time(phases) - setup_before), 0.0)
+        phases["_sent_at"] = now
+
+    def getresponse(self) -> Any:
+        response = super().getresponse()  # type: ignore[misc]
+        phases = getattr(_current, "phases", None)
+        if phases is not None and "_sent_at" in phases:
+            now = time.perf_counter()
+            phases["ttfb"] = now - phases["_sent_at"]
+            phases["_headers_at"] = now
+        return response
+
+
+class _TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    pass
+
+
+class _TimedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+    def connect(self) -> None:
+        phases = getattr(_current, "phases", None)
+        started = time.perf_counter()
+        super().connect()
+        if phases is not None:
+            elapsed = time.perf_counter() - started
+            phases["tls"] = max(elapsed - phases.get("dns", 0.0) - phases.get("connect", 0.0), 0.0)
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter, соединения которого замеряют DNS, connect, TLS, отправку и TTFB"""
+
+    def init_poolmanager(self, *args: Any, **kwargs: Any) -> None:
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _TimedHTTPConnectionPool,
+            "https": _TimedHTTPSConnectionPool,
+        }
+
+
+class RequestMetrics:
+    """
+    Собирает замеры HTTP-запросов клиента: число запросов по классу эндпоинта и коду ответа,
+    переданные байты и гистограммы фаз (см. PHASES) по классам эндпоинтов и по хостам.
+    Классы эндпоинтов: disk, resources, upload_href, download_href, data.
+    """
+
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        self._buckets = buckets
+        self._lock = threading.Lock()
+        self._requests: dict[tuple[str, str], int] = {}
+        self._bytes: dict[tuple[str, str], int] = {}
+        self._phases: dict[tuple[str, str], Histogram] = {}
+        self._hosts: dict[str, Histogram] = {}
+
+    def observe(self, endpoint: str, url: str, send: Callable[[], Response], stream: bool = False) -> Response:
+        """
+        Выполняет send и записывает его замер.
+        Для stream=True тело читает вызывающий код, его время и размер передаются через observe_body.
+        """
+        phases: dict[str, float] = {}
+        _current.phases = phases
+        started = time.perf_counter()
+        try:
+            response = send()
+        except Exception as e:
+            self._record(endpoint, url, type(e).__name__, phases, time.perf_counter() - started, 0, 0)
+            raise
+        finally:
+            _current.phases = None
+
+        finished = time.perf_counter()
+        received = 0
+        if not stream:
+            phases["body"] = finished - phases.get("_headers_at", finished)
+            received = len(response.content or b"")
+        sent = int(response.request.headers.get("Content-Length") or 0)
+        self._record(endpoint, url, str(response.status_code), phases, finished - started, sent, received)
+        return response
+
+    def observe_body(self, endpoint: str, seconds: float, received: int) -> None:
+        """Записывает чтение тела потокового ответа"""
+        with self._lock:
+            self._histogram(self._phases, (endpoint, "body")).observe(seconds)
+            key = (endpoint, "received")
+            self._bytes[key] = self._bytes.get(key, 0) + received
+
+    def _record(
+            self, endpoint: str, url: str, status: str, phases: dict[str, float], total: float, sent: int, received: int
+    ) -> None:
+        with self._lock:
+            key = (endpoint, status)
+            self._requests[key] = self._requests.get(key, 0) + 1
+            for direction, count in (("sent", sent), ("received", received)):
+                if count:
+                    self._bytes[(endpoint, direction)] = self._bytes.get((endpoint, direction), 0) + count
+            for phase, seconds in phases.items():
+                if not phase.startswith("_"):
+                    self._histogram(self._phases, (endpoint, phase)).observe(seconds)
+            self._histogram(self._phases, (endpoint, "total")).observe(total)
+            self._hosts_histogram(url).observe(total)
+
+    def _histogram(self, table: dict[Any, Histogram], key: Any) -> Histogram:
+        histogram = table.get(key)
+        if histogram is None:
+            histogram = table[key] = Histogram(self._buckets)
+        return histogram
+
+    def _hosts_histogram(self, url: str) -> Histogram:
+        return self._histogram(self._hosts, urlsplit(url).hostname or "")
+
+    def summary(self) -> dict[str, Any]:
+        """Сводка для JSON: запросы, байты и квантили фаз по эндпоинтам и хостам"""
+        with self._lock:
+            result: dict[str, Any] = {"requests": {}, "bytes": {}, "phases": {}, "hosts": {}}
+            for (endpoint, status), count in sorted(self._requests.items()):
+                result["requests"].setdefault(endpoint, {})[status] = count
+            for (endpoint, direction), count in sorted(self._bytes.items()):
+                result["bytes"].setdefault(endpoint, {})[direction] = count
+            for (endpoint, phase), histogram in sorted(self._phases.items()):
+                result["phases"].setdefault(endpoint, {})[phase] = histogram.summary()
+            for host, histogram in sorted(self._hosts.items()):
+                result["hosts"][host] = histogram.summary()
+            return result
+
+    def to_json(self) -> str:
+        return json.dumps(self.summary(), indent=2, ensure_ascii=False)
+
+    def to_prometheus(self, prefix: str = "yandex_disk_client") -> str:
+        """Замеры в текстовом формате экспозиции Prometheus"""
+        lines = [
+            f"# HELP {prefix}_requests_total HTTP requests by endpoint class and status",
+            f"# TYPE {prefix}_requests_total counter",
+        ]
+        with self._lock:
+            for (endpoint, status), count in sorted(self._requests.items()):
+                lines.append(f'{prefix}_requests_total{{endpoint="{endpoint}",status="{status}"}} {count}')
+            lines += [
+                f"# HELP {prefix}_bytes_total Request and response body bytes by endpoint class",
+                f"# TYPE {prefix}_bytes_total counter",
+            ]
+            for (endpoint, direction), count in sorted(self._bytes.items()):
+                lines.append(f'{prefix}_bytes_total{{endpoint="{endpoint}",direction="{direction}"}} {count}')
+            lines += _prometheus_histograms(
+                f"{prefix}_phase_seconds", "Request phase latency by endpoint class",
+                {f'endpoint="{endpoint}",phase="{phase}"': h for (endpoint, phase), h in sorted(self._phases.items())},
+            )
+            lines += _prometheus_histograms(
+                f"{prefix}_host_seconds", "Request latency by host",
+                {f'host="{host}"': h for host, h in sorted(self._hosts.items())},
+            )
+        return "\n".join(lines) + "\n"
+
+
+def _prometheus_histograms(name: str, help_text: str, histograms: dict[str, Histogram]) -> list[str]:
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for labels, histogram in histograms.items():
+        cumulative = 0
+        for bound, count in zip(histogram.bounds, histogram.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound:g}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+        lines.append(f"{name}_sum{{{labels}}} {histogram.sum:.6f}")
+        lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+    return lines
@@ -0,0 +1,205 @@
+from __future__ import annotations
+
+from array import array
+from datetime import datetime
+from typing import Any, Iterable, Iterator, overload
+
+_TYPES = ("file", "dir")
+_NO_MD5 = bytes(16)
+_NO_SHA256 = bytes(32)
+
+
+def _parse_mtime(modified: str | None) -> float | None:
+    return datetime.fromisoformat(modified).timestamp() if modified else None
+
+
+class Resource:
+    """
+    Файл или папка из листинга Диска.
+    Хранит элемент ответа API как есть: поля читаются из него при обращении,
+    время изменения разбирается из строки при первом обращении.
+    custom_properties - пользовательские свойства ресурса (есть только у ресурсов, где они заданы).
+    Ресурс неизменяем; равенство и хеш считаются по полям, хеш - без custom_properties.
+    """
+
+    __slots__ = ("_item", "_mtime")
+
+    def __init__(
+            self,
+            name: str,
+            path: str | None = None,
+            type: str = "file",
+            size: int | None = None,
+            md5: str | None = None,
+            sha256: str | None = None,
+            modified: str | None = None,
+            custom_properties: dict[str, Any] | None = None,
+    ) -> None:
+        fields = {
+            "path": path, "type": type, "size": size, "md5": md5, "sha256": sha256,
+            "modified": modified, "custom_properties": custom_properties,
+        }
+        self._item: dict[str, Any] = {"name": name}
+        self._item.update((key, value) for key, value in fields.items() if value is not None)
+        self._mtime: float | None = None
+
+    @classmethod
+    def from_json(cls, item: dict[str, Any]) -> Resource:
+        """Создает ресурс из элемента ответа API без копирования полей"""
+        resource = cls.__new__(cls)
+        resource._item = item
+        resource._mtime = None
+        return resource
+
+    @property
+    def name(self) -> str:
+        return self._item["name"]
+
+    @property
+    def path(self) -> str | None:
+        return self._item.get("path")
+
+    @property
+    def type(self) -> str:
+        return self._item.get("type", "file")
+
+    @property
+    def size(self) -> int | None:
+        return self._item.get("size")
+
+    @property
+    def md5(self) -> str | None:
+        return self._item.get("md5")
+
+    @property
+    def sha256(self) -> str | None:
+        return self._item.get("sha256")
+
+    @property
+    def modified(self) -> str | None:
+        return self._item.get("modified")
+
+    @property
+    def custom_properties(self) -> dict[str, Any] | None:
+        return self._item.get("custom_properties")
+
+    @property
+    def is_dir(self) -> bool:
+        return self.type == "dir"
+
+    @property
+    def mtime(self) -> float | None:
+        """Время изменения как timestamp"""
+        if self._mtime is None and self.modified:
+            self._mtime = _parse_mtime(self.modified)
+        return self._mtime
+
+    def _key(self) -> tuple[Any, ...]:
+        return self.name, self.path, self.type, self.size, self.md5, self.sha256, self.modified
+
+    def __repr__(self) -> str:
+        return f"Resource(name={self.name!r}, type={self.type!r}, size={self.size!r})"
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Resource):
+            return NotImplemented
+        return self._key() == other._key() and self.custom_properties == other.custom_properties
+
+    def __hash__(self) -> int:
+        return hash(self._key())
+
+
+class ResourceColumns:
+    """
+    Колоночное хранение большого листинга: пути и строки modified в буферах со смещениями,
+    тип, размер, время изменения и хеши - в типизированных массивах.
+    custom_properties, которые есть у немногих ресурсов, хранятся отдельно по номеру элемента.
+    Элементы отдаются как Resource, поэтому код, работающий со списком ресурсов, работает и с этим классом.
+    """
+
+    __slots__ = (
+        "_paths", "_path_ends", "_name_starts", "_is_dir", "_sizes", "_mtimes", "_modified", "_modified_ends",
+        "_md5", "_sha256", "_custom_properties",
+    )
+
+    def __init__(self, resources: Iterable[Resource] = ()) -> None:
+        self._paths = bytearray()
+        self._path_ends = array("Q")
+        self._name_starts = array("Q")
+        self._is_dir = array("b")
+        self._sizes = array("q")
+        self._mtimes = array("d")
+        self._modified = bytearray()
+        self._modified_ends = array("Q")
+        self._md5 = bytearray()
+        self._sha256 = bytearray()
+        self._custom_properties: dict[int, dict[str, Any]] = {}
+        self.extend(resources)
+
+    def append(self, resource: Resource) -> None:
+        if resource.custom_properties is not None:
+            self._custom_properties[len(self)] = resource.custom_properties
+        start = len(self._paths)
+        encoded = (resource.path or resource.name).encode()
+        self._paths += encoded
+        self._path_ends.append(len(self._paths))
+        self._name_starts.append(start + len(encoded) - len(resource.name.encode()))
+        self._is_dir.append(resource.is_dir)
+        self._sizes.append(-1 if resource.size is None else resource.size)
+        mtime = resource.mtime
+        self._mtimes.append(float("nan") if mtime is None else mtime)
+        self._modified += (resource.modified or "").encode()
+        self._modified_ends.append(len(self._modified))
+        self._md5 += bytes.fromhex(resource.md5) if resource.md5 else _NO_MD5
+        self._sha256 += bytes.fromhex(resource.sha256) if resource.sha256 else _NO_SHA256
+
+    def extend(self, resources: Iterable[Resource]) -> None:
+        for resource in resources:
+            self.append(resource)
+
+    def __len__(self) -> int:
+        return len(self._path_ends)
+
+    @overload
+    def __getitem__(self, index: int) -> Resource: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[Resource]: ...
+
+    def __getitem__(self, index: int | slice) -> Resource | list[Resource]:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("индекс вне листинга")
+
+        start = self._path_ends[index - 1] if index else 0
+        end = self._path_ends[index]
+        name_start = self._name_starts[index]
+        size = self._sizes[index]
+        mtime = self._mtimes[index]
+        md5 = bytes(self._md5[index * 16:(index + 1) * 16])
+        sha256 = bytes(self._sha256[index * 32:(index + 1) * 32])
+        modified = self._modified[self._modified_ends[index - 1] if index else 0:self._modified_ends[index]]
+        resource = Resource(
+            name=self._paths[name_start:end].decode(),
+            path=self._paths[start:end].decode() if name_start != start else None,
+            type=_TYPES[self._is_dir[index]],
+            size=None if size < 0 else size,
+            md5=md5.hex() if md5 != _NO_MD5 else None,
+            sha256=sha256.hex() if sha256 != _NO_SHA256 else None,
+            modified=modified.decode() or None,
+            custom_properties=self._custom_properties.get(index),
+        )
+        if mtime == mtime:
+            resource._mtime = mtime
+        return resource
+
+    def __iter__(self) -> Iterator[Resource]:
+        for index in range(len(self)):
+            yield self[index]
+
+    def total_size(self) -> int:
+        """Суммарный размер файлов без создания объектов Resource"""
+        return sum(size for size in self._sizes if size > 0)
@@ -0,0 +1,293 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import tarfile
+import time
+import uuid
+from pathlib import Path
+from typing import IO, Iterable, Iterator, NamedTuple
+
+PACK_DIR = ".packs"
+"""Папка с архивами и манифестами внутри папки назначения на Диске"""
+PACK_SIZE = 64 * 1024 * 1024
+READ_CHUNK_SIZE = 1024 * 1024
+RANGE_GAP = 64 * 1024
+"""Нужные члены архива, между которыми меньше RANGE_GAP байт, читаются одним Range-запросом"""
+WHOLE_ARCHIVE_RATIO = 0.5
+"""Если нужна такая доля байт архива, он скачивается целиком, а не по диапазонам"""
+
+_END_OF_ARCHIVE = bytes(2 * tarfile.BLOCKSIZE)
+
+
+class PackMember(NamedTuple):
+    """Файл в архиве: header - его заголовок tar, offset - смещение данных от начала архива."""
+
+    local_path: Path
+    name: str
+    size: int
+    mtime: int
+    header: bytes
+    offset: int
+
+
+class Pack(NamedTuple):
+    """Архив из мелких файлов, размер и раскладка которого известны до чтения файлов."""
+
+    name: str
+    members: list[PackMember]
+    size: int
+
+    @property
+    def archive_name(self) -> str:
+        return f"{self.name}.tar"
+
+    @property
+    def manifest_name(self) -> str:
+        return f"{self.name}.json"
+
+
+class ManifestEntry(NamedTuple):
+    """Член архива по данным манифеста; md5 - хеш содержимого для проверки при чтении диапазоном."""
+
+    name: str
+    offset: int
+    size: int
+    mtime: int
+    md5: str | None = None
+
+
+class Manifest(NamedTuple):
+    """Манифест архива: created - время загрузки, по нему выбирается самая свежая копия файла."""
+
+    archive: str
+    size: int
+    entries: list[ManifestEntry]
+    created: float
+
+
+def _padded(size: int) -> int:
+    return -(-size // tarfile.BLOCKSIZE) * tarfile.BLOCKSIZE
+
+
+def plan_packs(files: Iterable[tuple[Path, str]], pack_size: int = PACK_SIZE, run_id: str | None = None) -> list[Pack]:
+    """
+    Раскладывает файлы (локальный путь, имя в архиве) по архивам не больше pack_size байт.
+    Заголовки tar строятся сразу, поэтому смещение каждого файла в архиве известно заранее.
+    Имена архивов содержат run_id (по умолчанию случайный), поэтому повторная загрузка
+    не перезаписывает архивы, на которые ссылаются манифесты прошлой.
+    """
+    run_id = run_id or uuid.uuid4().hex[:12]
+    packs: list[Pack] = []
+    members: list[PackMember] = []
+    offset = 0
+
+    def close_pack() -> None:
+        packs.append(Pack(f"pack-{run_id}-{len(packs) + 1:06d}", members, offset + len(_END_OF_ARCHIVE)))
+
+    for local_path, name in files:
+        stat = local_path.stat()
+        info = tarfile.TarInfo(name)
+        info.size = stat.st_size
+        info.mtime = int(stat.st_mtime)
+        info.mode = 0o644
+        header = info.tobuf(tarfile.PAX_FORMAT, "utf-8", "surrogateescape")
+        length = len(header) + _padded(stat.st_size)
+        if members and offset + length + len(_END_OF_ARCHIVE) > pack_size:
+            close_pack()
+            members, offset = [], 0
+        members.append(PackMember(local_path, name, stat.st_size, info.mtime, header, offset + len(header)))
+        offset += length
+
+    if members:
+        close_pack()
+    return packs
+
+
+class PackStream:
+    """
+    Архив, собираемый при чтении: заголовки, содержимое файлов и выравнивание отдаются по очереди,
+    в памяти находится не больше одного блока файла. len() равен размеру архива.
+    По мере чтения в md5s собираются хеши отданных файлов.
+    """
+
+    def __init__(self, pack: Pack) -> None:
+        self._pack = pack
+        self._parts = self._iter_parts()
+        self._chunk = b""
+        self._position = 0
+        self.md5s: dict[str, str] = {}
+
+    def __len__(self) -> int:
+        return self._pack.size
+
+    def _iter_parts(self) -> Iterator[bytes]:
+        for member in self._pack.members:
+            yield member.header
+            digest = hashlib.md5()
+            with member.local_path.open("rb") as f:
+                remaining = member.size
+                while remaining:
+                    chunk = f.read(min(READ_CHUNK_SIZE, remaining))
+                    if not chunk:
+                        raise OSError(f"Файл {member.local_path} изменился во время упаковки")
+                    remaining -= len(chunk)
+                    digest.update(chunk)
+                    yield chunk
+            self.md5s[member.name] = digest.hexdigest()
+            padding = _padded(member.size) - member.size
+            if padding:
+                yield bytes(padding)
+        yield _END_OF_ARCHIVE
+
+    def read(self, size: int = -1) -> bytes:
+        out = bytearray()
+        while size < 0 or len(out) < size:
+            if self._position >= len(self._chunk):
+                self._chunk = next(self._parts, b"")
+                self._position = 0
+                if not self._chunk:
+                    break
+            available = len(self._chunk) - self._position
+            take = available if size < 0 else min(size - len(out), available)
+            out += self._chunk[self._position:self._position + take]
+            self._position += take
+        return bytes(out)
+
+
+def build_manifest(pack: Pack, md5s: dict[str, str]) -> bytes:
+    """
+    Компактный манифест архива: имена, смещения, размеры, время изменения и md5 отдельными списками.
+    md5s - хеши, собранные PackStream при отправке архива.
+    """
+    members = pack.members
+    return json.dumps(
+        {
+            "version": 2,
+            "archive": pack.archive_name,
+            "size": pack.size,
+            "created": time.time(),
+            "names": [member.name for member in members],
+            "offsets": [member.offset for member in members],
+            "sizes": [member.size for member in members],
+            "mtimes": [member.mtime for member in members],
+            "md5s": [md5s[member.name] for member in members],
+        },
+        ensure_ascii=False,
+        separators=(",", ":"),
+    ).encode()
+
+
+def read_manifest(data: bytes) -> Manifest:
+    """Разбирает манифест; у манифестов первой версии нет md5 и времени загрузки"""
+    manifest = json.loads(data)
+    md5s = manifest.get("md5s") or [None] * len(manifest["names"])
+    entries = [
+        ManifestEntry(*fields)
+        for fields in zip(manifest["names"], manifest["offsets"], manifest["sizes"], manifest["mtimes"], md5s)
+    ]
+    return Manifest(manifest["archive"], manifest["size"], entries, manifest.get("created", 0.0))
+
+
+def latest_entries(manifests: Iterable[Manifest]) -> dict[str, list[ManifestEntry]]:
+    """
+    Члены архивов по именам архивов; файл, который есть в нескольких манифестах
+    (прошлая загрузка еще не удалена), берется из самого нового.
+    """
+    chosen: dict[str, tuple[str, ManifestEntry]] = {}
+    for manifest in sorted(manifests, key=lambda m: m.created):
+        for entry in manifest.entries:
+            chosen[entry.name] = (manifest.archive, entry)
+    by_archive: dict[str, list[ManifestEntry]] = {}
+    for archive, entry in chosen.values():
+        by_archive.setdefault(archive, []).append(entry)
+    return by_archive
+
+
+def plan_ranges(entries: Iterable[ManifestEntry], gap: int = RANGE_GAP) -> list[tuple[int, int, list[ManifestEntry]]]:
+    """Группирует члены архива в диапазоны [start, end] для Range-запросов, сливая близкие"""
+    ranges: list[tuple[int, int, list[ManifestEntry]]] = []
+    for entry in sorted(entries, key=lambda e: e.offset):
+        end = entry.offset + max(entry.size, 1) - 1
+        if ranges and entry.offset - ranges[-1][1] <= gap:
+            start, _, group = ranges[-1]
+            ranges[-1] = (start, max(end, ranges[-1][1]), group + [entry])
+        else:
+            ranges.append((entry.offset, end, [entry]))
+    return ranges
+
+
+def safe_target(local_root: Path, name: str) -> Path:
+    """Локальный путь для члена архива; имена, выходящие за local_root, отвергаются"""
+    root = local_root.resolve()
+    target = (root / name).resolve()
+    if root not in target.parents:
+        raise ValueError(f"Недопустимое имя в архиве: {name}")
+    return target
+
+
+def _write_member(stream: IO[bytes], target: Path, size: int, mtime: int, md5: str | None = None) -> None:
+    """
+    Пишет файл во временный рядом и переименовывает его только после проверки md5,
+    поэтому данные, не совпавшие с манифестом, не попадают на место файла.
+    """
+    target.parent.mkdir(parents=True, exist_ok=True)
+    partial = target.with_name(f"{target.name}.part")
+    digest = hashlib.md5()
+    try:
+        with partial.open("wb") as f:
+            remaining = size
+            while remaining:
+                chunk = stream.read(min(READ_CHUNK_SIZE, remaining))
+                if not chunk:
+                    raise EOFError(f"Архив оборвался на {target}")
+                f.write(chunk)
+                digest.update(chunk)
+                remaining -= len(chunk)
+        if md5 is not None and digest.hexdigest() != md5:
+            raise ValueError(f"Содержимое {target.name} в архиве не совпадает с манифестом")
+        os.utime(partial, (mtime, mtime))
+        os.replace(partial, target)
+    except BaseException:
+        partial.unlink(missing_ok=True)
+        raise
+
+
+def _skip(stream: IO[bytes], count: int) -> None:
+    while count:
+        chunk = stream.read(min(READ_CHUNK_SIZE, count))
+        if not chunk:
+            raise EOFError("Архив оборвался")
+        count -= len(chunk)
+
+
+def extract_range(stream: IO[bytes], start: int, entries: list[ManifestEntry], local_root: Path) -> list[Path]:
+    """Пишет члены архива из потока, начинающегося со смещения start (ответ на Range-запрос)"""
+    position = start
+    written = []
+    for entry in sorted(entries, key=lambda e: e.offset):
+        _skip(stream, entry.offset - position)
+        target = safe_target(local_root, entry.name)
+        _write_member(stream, target, entry.size, entry.mtime, entry.md5)
+        position = entry.offset + entry.size
+        written.append(target)
+    return written
+
+
+def extract_archive(stream: IO[bytes], local_root: Path, entries: Iterable[ManifestEntry]) -> list[Path]:
+    """Распаковывает из потока архива члены, перечисленные в entries, и сверяет их с md5 манифеста"""
+    wanted = {entry.name: entry for entry in entries}
+    written = []
+    with tarfile.open(fileobj=stream, mode="r|") as archive:
+        for info in archive:
+            entry = wanted.pop(info.name, None) if info.isfile() else None
+            source = archive.extractfile(info) if entry is not None else None
+            if source is None:
+                continue
+            target = safe_target(local_root, info.name)
+            _write_member(source, target, info.size, int(info.mtime), entry.md5)
+            written.append(target)
+    if wanted:
+        raise ValueError(f"В архиве нет файлов из манифеста: {', '.join(sorted(wanted))}")
+    return written
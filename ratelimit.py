@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+
+
+class AdaptiveRateLimiter:
+    """
+    Token bucket для запросов к API, общий для всех потоков и задач клиента.
+    Скорость подстраивается по принципу AIMD: ответ 429 делит ее на decrease_factor
+    (не чаще раза в cooldown секунд), каждый успешный ответ понемногу ее поднимает,
+    примерно на increase запросов в секунду за секунду работы.
+    До первого 429 действует "медленный старт": каждый успешный ответ добавляет
+    один запрос в секунду, то есть скорость удваивается примерно каждую секунду.
+    """
+
+    def __init__(
+            self,
+            rate: float = 40.0,
+            burst: float = 10.0,
+            min_rate: float = 1.0,
+            max_rate: float = 200.0,
+            decrease_factor: float = 0.5,
+            increase: float = 1.0,
+            cooldown: float = 1.0,
+    ) -> None:
+        self._rate = rate
+        self._burst = burst
+        self._min_rate = min_rate
+        self._max_rate = max_rate
+        self._decrease_factor = decrease_factor
+        self._increase = increase
+        self._cooldown = cooldown
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._last_decrease = 0.0
+        self._slow_start = True
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self) -> float:
+        """Текущая разрешенная скорость, запросов в секунду"""
+        return self._rate
+
+    def _reserve(self) -> float:
+        """Забирает токен и возвращает, сколько секунд нужно подождать до его появления"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self._burst, self._tokens + (now - self._updated) * self._rate)
+            self._updated = now
+            self._tokens -= 1
+            return -self._tokens / self._rate if self._tokens < 0 else 0.0
+
+    def acquire(self) -> None:
+        """Блокирует поток, пока не будет разрешен следующий запрос"""
+        delay = self._reserve()
+        if delay:
+            time.sleep(delay)
+
+    async def acquire_async(self) -> None:
+        """Приостанавливает задачу, пока не будет разрешен следующий запрос"""
+        delay = self._reserve()
+        if delay:
+            await asyncio.sleep(delay)
+
+    def on_response(self, status: int) -> None:
+        """Подстраивает скорость по коду ответа API"""
+        with self._lock:
+            if status == 429:
+                now = time.monotonic()
+                if now - self._last_decrease >= self._cooldown:
+                    self._rate = max(self._min_rate, self._rate * self._decrease_factor)
+                    self._tokens = min(self._tokens, 0.0)
+                    self._last_decrease = now
+                self._slow_start = False
+            elif status < 500:
+                step = 1.0 if self._slow_start else self._increase / self._rate
+                self._rate = min(self._max_rate, self._rate + step)
@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import asyncio
+import email.utils
+import random
+import threading
+import time
+from typing import Any, Awaitable, Callable, NamedTuple, TypeVar
+
+import requests
+
+RETRYABLE_STATUSES = frozenset({429, 500, 502, 503, 504})
+RETRYABLE_EXCEPTIONS: tuple[type[Exception], ...] = (requests.ConnectionError, requests.Timeout)
+
+T = TypeVar("T")
+
+
+class RetryPolicy(NamedTuple):
+    """
+    Политика повторов для одного вида операций.
+    attempts - общее число попыток (1 - без повторов),
+    backoff, max_backoff - база и потолок экспоненциальной задержки в секундах,
+    jitter - доля задержки, заменяемая случайной величиной (1.0 - full jitter),
+    statuses - коды ответа, после которых запрос повторяется.
+    """
+
+    attempts: int = 4
+    backoff: float = 0.5
+    max_backoff: float = 30.0
+    jitter: float = 1.0
+    statuses: frozenset[int] = RETRYABLE_STATUSES
+
+    def delay(self, attempt: int, retry_after: float | None = None) -> float:
+        """Задержка перед повтором номер attempt (с нуля); Retry-After сервера имеет приоритет"""
+        if retry_after is not None:
+            return min(retry_after, self.max_backoff)
+        ceiling = min(self.max_backoff, self.backoff * 2 ** attempt)
+        return ceiling * (1 - self.jitter) + random.uniform(0, ceiling * self.jitter)
+
+
+NO_RETRY = RetryPolicy(attempts=1)
+
+DEFAULT_RETRY_POLICIES: dict[str, RetryPolicy] = {
+    "api": RetryPolicy(),
+    "upload": RetryPolicy(attempts=3, backoff=1.0),
+    "upload_data": NO_RETRY,
+    "download": RetryPolicy(attempts=3, backoff=1.0),
+}
+"""
+api - запросы к API (ресурсы, выдача ссылок): идемпотентны, повторяются как есть;
+upload - загрузка целиком: повтор всегда начинается с новой одноразовой ссылки;
+upload_data - сам PUT по одноразовой ссылке: повторять его нельзя, этим занимается upload;
+download - GET по ссылке на скачивание.
+"""
+
+
+class RetryBudget:
+    """
+    Общий для клиента лимит повторов, не дающий им умножать нагрузку на сервер.
+    Каждый исходный запрос пополняет бюджет на ratio, каждый повтор тратит единицу.
+    """
+
+    def __init__(self, ratio: float = 0.2, reserve: float = 10.0) -> None:
+        self._ratio = ratio
+        self._max_tokens = reserve
+        self._tokens = reserve
+        self._lock = threading.Lock()
+
+    def deposit(self) -> None:
+        with self._lock:
+            self._tokens = min(self._max_tokens, self._tokens + self._ratio)
+
+    def withdraw(self) -> bool:
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Значение Retry-After в секундах: число секунд или HTTP-дата"""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        moment = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(moment.timestamp() - time.time(), 0.0)
+
+
+def _retry_delay(policy: RetryPolicy, budget: RetryBudget, attempt: int, status: int | None, headers: Any) -> float | None:
+    """Задержка перед следующей попыткой или None, если повторять не нужно"""
+    if status is not None and status not in policy.statuses:
+        return None
+    if attempt + 1 >= policy.attempts or not budget.withdraw():
+        return None
+    retry_after = parse_retry_after(headers.get("Retry-After")) if headers is not None else None
+    return policy.delay(attempt, retry_after)
+
+
+def call_with_retry(
+        send: Callable[[], requests.Response],
+        policy: RetryPolicy,
+        budget: RetryBudget,
+        sleep: Callable[[float], None] = time.sleep,
+) -> requests.Response:
+    """Вызывает send, повторяя его при сетевых ошибках и кодах из policy.statuses"""
+    budget.deposit()
+    attempt = 0
+    while True:
+        try:
+            response = send()
+        except RETRYABLE_EXCEPTIONS:
+            delay = _retry_delay(policy, budget, attempt, None, None)
+            if delay is None:
+                raise
+        else:
+            delay = _retry_delay(policy, budget, attempt, response.status_code, response.headers)
+            if delay is None:
+                return response
+            response.close()
+        attempt += 1
+        sleep(delay)
+
+
+async def async_call_with_retry(
+        send: Callable[[], Awaitable[T]],
+        policy: RetryPolicy,
+        budget: RetryBudget,
+        retryable: tuple[type[Exception], ...],
+) -> T:
+    """Асинхронный вариант call_with_retry для ответов aiohttp"""
+    budget.deposit()
+    attempt = 0
+    while True:
+        try:
+            response: Any = await send()
+        except retryable:
+            delay = _retry_delay(policy, budget, attempt, None, None)
+            if delay is None:
+                raise
+        else:
+            delay = _retry_delay(policy, budget, attempt, response.status, response.headers)
+            if delay is None:
+                return response
+            response.release()
+        attempt += 1
+        await asyncio.sleep(delay)
@@ -0,0 +1,569 @@
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import mimetypes
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, NamedTuple
+from urllib.parse import parse_qs, urlsplit
+
+from client import YandexSettings
+
+API_PREFIX = "/v1/disk"
+DATA_PREFIX = "/_data"
+THROTTLE_CHUNK_SIZE = 64 * 1024
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+def _key(path: str) -> str:
+    """Путь Диска в виде 'a/b' без префикса disk: и крайних слешей; корень - пустая строка"""
+    key = path.removeprefix("disk:").strip("/")
+    return "" if key == "." else key
+
+
+def _media_type(key: str) -> str:
+    """Грубое определение media_type по расширению, как его отдает API"""
+    mime, _ = mimetypes.guess_type(key)
+    if not mime:
+        return "unknown"
+    major = mime.split("/")[0]
+    if major in ("image", "video", "audio", "text"):
+        return major
+    return "document" if mime in ("application/pdf", "application/msword") else "data"
+
+
+def _project(value: Any, paths: list[list[str]]) -> Any:
+    """Оставляет в ответе только поля из параметра fields (пути через точку, списки проходятся поэлементно)"""
+    if isinstance(value, list):
+        return [_project(element, paths) for element in value]
+    if not isinstance(value, dict):
+        return value
+    whole = {path[0] for path in paths if len(path) == 1}
+    nested: dict[str, list[list[str]]] = {}
+    for path in paths:
+        if len(path) > 1 and path[0] not in whole:
+            nested.setdefault(path[0], []).append(path[1:])
+    result = {name: value[name] for name in whole if name in value}
+    for name, rest in nested.items():
+        if name in value:
+            result[name] = _project(value[name], rest)
+    return result
+
+
+class _StoredFile(NamedTuple):
+    data: bytes
+    created: str
+    modified: str
+    md5: str
+    sha256: str
+    custom_properties: dict[str, Any] | None = None
+
+
+class _PendingUpload(NamedTuple):
+    path: str
+    received: bytearray
+
+
+class DiskState:
+    """Содержимое поддельного Диска в памяти"""
+
+    def __init__(self) -> None:
+        self.lock = threading.RLock()
+        self.dirs: dict[str, str] = {"": _now()}
+        self.files: dict[str, _StoredFile] = {}
+        self.uploads: dict[str, _PendingUpload] = {}
+        self.finished: set[str] = set()
+        self.downloads: dict[str, str] = {}
+
+    def parent_exists(self, key: str) -> bool:
+        return key.rsplit("/", 1)[0] in self.dirs if "/" in key else True
+
+    def children(self, key: str) -> list[str]:
+        prefix = f"{key}/" if key else ""
+        names = [
+            path for path in (*self.dirs, *self.files)
+            if path and path.startswith(prefix) and "/" not in path[len(prefix):]
+        ]
+        return sorted(names)
+
+    def store(self, key: str, data: bytes) -> None:
+        now = _now()
+        previous = self.files.get(key)
+        self.files[key] = _StoredFile(
+            data=data,
+            created=previous.created if previous else now,
+            modified=now,
+            md5=hashlib.md5(data).hexdigest(),
+            sha256=hashlib.sha256(data).hexdigest(),
+        )
+
+    def resource(self, key: str) -> dict[str, Any]:
+        name = key.rsplit("/", 1)[-1] if key else "disk"
+        if key in self.dirs:
+            return {
+                "name": name, "path": f"disk:/{key}", "type": "dir",
+                "created": self.dirs[key], "modified": self.dirs[key],
+            }
+        stored = self.files[key]
+        resource = {
+            "name": name, "path": f"disk:/{key}", "type": "file",
+            "created": stored.created, "modified": stored.modified,
+            "size": len(stored.data), "md5": stored.md5, "sha256": stored.sha256,
+            "mime_type": mimetypes.guess_type(key)[0] or "application/octet-stream",
+            "media_type": _media_type(key),
+        }
+        if stored.custom_properties:
+            resource["custom_properties"] = stored.custom_properties
+        return resource
+
+
+class StubDiskServer:
+    """
+    Локальная замена API Яндекс Диска для тестов и бенчмарков.
+    Поддерживает ресурсы (с custom_properties через PATCH), выдачу ссылок на загрузку и скачивание,
+    сами передачи данных (с докачкой через Content-Range и Range-запросами) и постраничные листинги.
+    latency - задержка перед каждым ответом в секундах,
+    bandwidth - ограничение скорости передачи тела в байтах в секунду,
+    api_rate_limit - сколько запросов к API в секунду обслуживать, остальным отвечать 429.
+    drop_upload_after, drop_download_after - разовый обрыв соединения: следующая передача данных
+    в эту сторону обрывается после стольких байт тела (принятое при загрузке сохраняется для докачки,
+    скачивание обрывается только у тела длиннее этого).
+    requests считает запросы по эндпоинтам, а под upload_bytes и download_bytes - переданные байты тел.
+    """
+
+    def __init__(
+            self,
+            host: str = "127.0.0.1",
+            port: int = 0,
+            latency: float = 0.0,
+            bandwidth: float | None = None,
+            api_rate_limit: float | None = None,
+    ) -> None:
+        self.state = DiskState()
+        self.api_rate_limit = api_rate_limit
+        self._api_tokens = api_rate_limit or 0.0
+        self._api_refilled = time.monotonic()
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.drop_upload_after: int | None = None
+        self.drop_download_after: int | None = None
+        self.requests: Counter[str] = Counter()
+        self._requests_lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), _make_handler(self))
+        self._httpd.daemon_threads = True
+        self._thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def base_url(self) -> str:
+        return f"{self.url}{API_PREFIX}"
+
+    def settings(self) -> YandexSettings:
+        """Настройки клиента, направленные на этот сервер"""
+        return YandexSettings(
+            access_token="stub",
+            base_url=self.base_url,
+            resources_endpoint="/resources",
+            upload_endpoint="/resources/upload",
+            download_endpoint="/resources/download",
+            files_endpoint="/resources/files",
+        )
+
+    def count(self, endpoint: str, amount: int = 1) -> None:
+        with self._requests_lock:
+            self.requests[endpoint] += amount
+
+    def take_drop(self, direction: str, size: int | None = None) -> int | None:
+        """
+        Забирает разовый обрыв для передачи в direction (upload или download).
+        size - длина тела, если она известна: обрыв за его пределами не срабатывает и остается взведенным.
+        """
+        name = f"drop_{direction}_after"
+        with self._requests_lock:
+            drop = getattr(self, name)
+            if drop is None or (size is not None and drop >= size):
+                return None
+            setattr(self, name, None)
+            return drop
+
+    def admit_api_request(self) -> bool:
+        """Token bucket заглушки: False означает, что запрос нужно отклонить с 429"""
+        if not self.api_rate_limit:
+            return True
+        with self._requests_lock:
+            now = time.monotonic()
+            self._api_tokens = min(
+                self.api_rate_limit, self._api_tokens + (now - self._api_refilled) * self.api_rate_limit
+            )
+            self._api_refilled = now
+            if self._api_tokens < 1:
+                self.requests["rejected"] += 1
+                return False
+            self._api_tokens -= 1
+            return True
+
+    def start(self) -> StubDiskServer:
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def serve_forever(self) -> None:
+        self._httpd.serve_forever()
+
+    def __enter__(self) -> StubDiskServer:
+        return self.start()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
+
+
+def _make_handler(server: StubDiskServer) -> type[BaseHTTPRequestHandler]:
+    state = server.state
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def log_message(self, format: str, *args: Any) -> None:
+            pass
+
+        def _query(self) -> tuple[str, dict[str, str]]:
+            parts = urlsplit(self.path)
+            return parts.path, {name: values[-1] for name, values in parse_qs(parts.query).items()}
+
+        def _throttled_write(self, body: bytes) -> None:
+            if not server.bandwidth:
+                self.wfile.write(body)
+                return
+            for start in range(0, len(body), THROTTLE_CHUNK_SIZE):
+                chunk = body[start:start + THROTTLE_CHUNK_SIZE]
+                self.wfile.write(chunk)
+                time.sleep(len(chunk) / server.bandwidth)
+
+        def _read_body(self) -> bytes:
+            return self._read_partial_body()[0]
+
+        def _read_partial_body(self, limit: int | None = None) -> tuple[bytes, bool]:
+            """
+            Читает тело запроса, но не больше limit байт.
+            Второй элемент - прочитано ли тело целиком (False после обрыва соединения или на limit).
+            """
+            body = bytearray()
+            complete = True
+            if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+                while True:
+                    line = self.rfile.readline()
+                    if not line.strip():
+                        complete = False
+                        break
+                    size = int(line.split(b";")[0].strip(), 16)
+                    if not size:
+                        self.rfile.readline()
+                        break
+                    wanted = size if limit is None else min(size, limit - len(body))
+                    chunk = self.rfile.read(wanted)
+                    body += chunk
+                    if len(chunk) < size:
+                        complete = False
+                        break
+                    self.rfile.readline()
+            else:
+                length = int(self.headers.get("Content-Length", 0))
+                remaining = length if limit is None else min(length, limit)
+                while remaining:
+                    chunk = self.rfile.read(min(remaining, THROTTLE_CHUNK_SIZE))
+                    if not chunk:
+                        break
+                    body += chunk
+                    remaining -= len(chunk)
+                complete = len(body) == length
+            if server.bandwidth:
+                time.sleep(len(body) / server.bandwidth)
+            return bytes(body), complete
+
+        def _send(
+                self, status: int, body: bytes = b"", headers: dict[str, str] | None = None,
+                content_type: str = "application/json", cut_after: int | None = None,
+        ) -> None:
+            """cut_after - отправить только столько байт тела и закрыть соединение"""
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            if body and self.command != "HEAD":
+                self._throttled_write(body if cut_after is None else body[:cut_after])
+            if cut_after is not None:
+                self.close_connection = True
+
+        def _json(self, status: int, payload: dict[str, Any]) -> None:
+            fields = self._query()[1].get("fields") if status == 200 else None
+            if fields:
+                payload = _project(payload, [field.strip().split(".") for field in fields.split(",") if field.strip()])
+            self._send(status, json.dumps(payload).encode())
+
+        def _error(self, status: int, error: str, message: str) -> None:
+            self._json(status, {"error": error, "message": message, "description": message})
+
+        def _dispatch(self) -> None:
+            if server.latency:
+                time.sleep(server.latency)
+            path, query = self._query()
+            if path.startswith(DATA_PREFIX):
+                return self._data(path.removeprefix(DATA_PREFIX), query)
+            if not path.startswith(API_PREFIX):
+                self._read_body()
+                return self._error(404, "NotFoundError", "Ресурс не найден")
+            if self.headers.get("Authorization", "") == "":
+                self._read_body()
+                return self._error(401, "UnauthorizedError", "Не авторизован")
+            return self._api(path.removeprefix(API_PREFIX), query)
+
+        do_GET = do_PUT = do_PATCH = do_DELETE = do_HEAD = _dispatch
+
+        def _api(self, route: str, query: dict[str, str]) -> None:
+            body = self._read_body()
+            if not server.admit_api_request():
+                return self._error(429, "TooManyRequestsError", "Слишком много запросов")
+            key = _key(query.get("path", ""))
+            with state.lock:
+                if route in ("", "/"):
+                    server.count("disk")
+                    used = sum(len(stored.data) for stored in state.files.values())
+                    return self._json(200, {"total_space": 10 ** 12, "used_space": used})
+                if route == "/resources/files":
+                    server.count("files")
+                    return self._all_files(query)
+                if route == "/resources":
+                    server.count("resources")
+                    return self._resources(key, query, body)
+                if route == "/resources/upload":
+                    server.count("upload_href")
+                    return self._upload_href(key, query)
+                if route == "/resources/download":
+                    server.count("download_href")
+                    return self._download_href(key)
+            return self._error(404, "NotFoundError", "Ресурс не найден")
+
+        def _resources(self, key: str, query: dict[str, str], body: bytes = b"") -> None:
+            if self.command == "GET":
+                if key not in state.dirs and key not in state.files:
+                    return self._error(404, "DiskNotFoundError", "Не удалось найти запрошенный ресурс.")
+                payload = state.resource(key)
+                if key in state.dirs:
+                    offset = int(query.get("offset", 0))
+                    limit = int(query.get("limit", 20))
+                    children = state.children(key)
+                    payload["_embedded"] = {
+                        "path": payload["path"], "offset": offset, "limit": limit, "total": len(children),
+                        "items": [state.resource(child) for child in children[offset:offset + limit]],
+                    }
+                return self._json(200, payload)
+
+            if self.command == "PUT":
+                if key in state.dirs:
+                    return self._error(409, "DiskPathPointsToExistentDirectoryError", "Папка уже существует")
+                if key in state.files:
+                    return self._error(409, "DiskResourceAlreadyExistsError", "По этому пути находится файл")
+                if not state.parent_exists(key):
+                    return self._error(409, "DiskPathDoesntExistsError", "Указанного пути не существует.")
+                state.dirs[key] = _now()
+                return self._json(201, {"href": f"{server.base_url}/resources?path=disk:/{key}", "method": "GET"})
+
+            if self.command == "PATCH":
+                if key not in state.files:
+                    return self._error(404, "DiskNotFoundError", "Не удалось найти запрошенный ресурс.")
+                stored = state.files[key]
+                properties = dict(stored.custom_properties or {})
+                properties.update(json.loads(body or b"{}").get("custom_properties", {}))
+                properties = {name: value for name, value in properties.items() if value is not None}
+                state.files[key] = stored._replace(custom_properties=properties)
+                return self._json(200, state.resource(key))
+
+            if self.command == "DELETE":
+                if key in state.files:
+                    del state.files[key]
+                elif key in state.dirs and key:
+                    prefix = f"{key}/"
+                    for path in [p for p in state.files if p.startswith(prefix)]:
+                        del state.files[path]
+                    for path in [p for p in state.dirs if p == key or p.startswith(prefix)]:
+                        del state.dirs[path]
+                else:
+                    return self._error(404, "DiskNotFoundError", "Не удалось найти запрошенный ресурс.")
+                return self._send(204)
+
+            return self._error(405, "MethodNotAllowedError", "Метод не поддерживается")
+
+        def _all_files(self, query: dict[str, str]) -> None:
+            offset = int(query.get("offset", 0))
+            limit = int(query.get("limit", 20))
+            media_types = set(filter(None, query.get("media_type", "").split(",")))
+            paths = sorted(state.files)
+            if media_types:
+                paths = [path for path in paths if _media_type(path) in media_types]
+            items = [state.resource(path) for path in paths[offset:offset + limit]]
+            return self._json(200, {"items": items, "offset": offset, "limit": limit})
+
+        def _upload_href(self, key: str, query: dict[str, str]) -> None:
+            if not state.parent_exists(key):
+                return self._error(409, "DiskPathDoesntExistsError", "Указанного пути не существует.")
+            if key in state.dirs:
+                return self._error(409, "DiskPathPointsToExistentDirectoryError", "По пути находится папка")
+            if key in state.files and query.get("overwrite", "false") != "true":
+                return self._error(409, "DiskResourceAlreadyExistsError", "Ресурс уже существует")
+            token = uuid.uuid4().hex
+            state.uploads[token] = _PendingUpload(key, bytearray())
+            return self._json(200, {"href": f"{server.url}{DATA_PREFIX}/upload/{token}", "method": "PUT"})
+
+        def _download_href(self, key: str) -> None:
+            if key not in state.files:
+                return self._error(404, "DiskNotFoundError", "Не удалось найти запрошенный ресурс.")
+            token = uuid.uuid4().hex
+            state.downloads[token] = key
+            return self._json(200, {"href": f"{server.url}{DATA_PREFIX}/download/{token}", "method": "GET"})
+
+        def _data(self, route: str, query: dict[str, str]) -> None:
+            kind, _, token = route.strip("/").partition("/")
+            if kind == "upload" and self.command == "PUT":
+                server.count("upload_data")
+                return self._receive(token)
+            if kind == "download" and self.command in ("GET", "HEAD"):
+                server.count("download_data")
+                self._read_body()
+                return self._serve(token)
+            self._read_body()
+            return self._error(404, "NotFoundError", "Ресурс не найден")
+
+        def _receive(self, token: str) -> None:
+            """
+            Прием загрузки. Тело, оборванное вместе с соединением, не считается загруженным файлом:
+            принятые байты остаются в ожидающей загрузке, и запрос Content-Range: bytes */size
+            отвечает 308 с уже принятым диапазоном (или 201, если загрузка завершена).
+            """
+            content_range = self.headers.get("Content-Range")
+            span, _, total = (content_range or "").removeprefix("bytes ").partition("/")
+            drop = None if span == "*" else server.take_drop("upload")
+            body, complete = self._read_partial_body(drop)
+            server.count("upload_bytes", len(body))
+            with state.lock:
+                if span == "*" and token in state.finished:
+                    return self._send(201)
+                pending = state.uploads.get(token)
+                if pending is None:
+                    return self._error(404, "NotFoundError", "Ссылка для загрузки недействительна")
+                if span == "*":
+                    headers = {"Range": f"bytes=0-{len(pending.received) - 1}"} if pending.received else {}
+                    return self._send(308, headers=headers)
+
+                content_type = self.headers.get("Content-Type", "")
+                if content_range:
+                    if int(span.split("-")[0]) != len(pending.received):
+                        return self._error(416, "RangeNotSatisfiable", "Неверное смещение")
+                    pending.received.extend(body)
+                    finished = complete and len(pending.received) >= int(total)
+                elif content_type.startswith("multipart/form-data"):
+                    if complete:
+                        header = b"Content-Type: " + content_type.encode() + b"\r\n\r\n"
+                        message = BytesParser().parsebytes(header + body)
+                        parts = message.get_payload()
+                        pending.received[:] = parts[0].get_payload(decode=True) if parts else b""
+                    finished = complete
+                else:
+                    pending.received[:] = body
+                    finished = complete
+
+                if finished:
+                    state.store(pending.path, bytes(pending.received))
+                    del state.uploads[token]
+                    state.finished.add(token)
+                if drop is not None or not complete:
+                    self.close_connection = True
+                    return None
+                if finished:
+                    return self._send(201)
+                return self._send(202, headers={"Range": f"bytes=0-{len(pending.received) - 1}"})
+
+        def _serve(self, token: str) -> None:
+            with state.lock:
+                key = state.downloads.get(token)
+                stored = state.files.get(key) if key is not None else None
+            if stored is None:
+                return self._error(404, "NotFoundError", "Ссылка для скачивания недействительна")
+
+            data = stored.data
+            requested = self.headers.get("Range")
+            if not requested:
+                drop = server.take_drop("download", len(data))
+                server.count("download_bytes", len(data) if drop is None else drop)
+                return self._send(200, data, content_type="application/octet-stream", cut_after=drop)
+
+            start_text, _, end_text = requested.removeprefix("bytes=").partition("-")
+            start = int(start_text)
+            end = min(int(end_text), len(data) - 1) if end_text else len(data) - 1
+            if start >= len(data):
+                return self._send(416, headers={"Content-Range": f"bytes */{len(data)}"})
+            drop = server.take_drop("download", end + 1 - start)
+            server.count("download_bytes", end + 1 - start if drop is None else drop)
+            return self._send(
+                206,
+                data[start:end + 1],
+                headers={"Content-Range": f"bytes {start}-{end}/{len(data)}"},
+                content_type="application/octet-stream",
+                cut_after=drop,
+            )
+
+    return Handler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Локальная замена API Яндекс Диска")
+    parser.add_argument("--host", default="127.0.0.1", help="Адрес для прослушивания")
+    parser.add_argument("--port", type=int, default=8080, help="Порт для прослушивания")
+    parser.add_argument("--latency", type=float, default=0.0, help="Задержка ответа в секундах")
+    parser.add_argument("--bandwidth", type=float, help="Скорость передачи данных в байтах в секунду")
+    parser.add_argument("--api-rate-limit", type=float, help="Лимит запросов к API в секунду (сверх него - 429)")
+    args = parser.parse_args()
+
+    server = StubDiskServer(
+        args.host,
+        args.port,
+        latency=args.latency,
+        bandwidth=args.bandwidth,
+        api_rate_limit=args.api_rate_limit,
+    )
+    print("Заглушка API Яндекс Диска запущена, настройки клиента:")
+    print("YANDEX_ACCESS_TOKEN=stub")
+    print(f"YANDEX_BASE_URL={server.base_url}")
+    print("YANDEX_RESOURCES_ENDPOINT=/resources")
+    print("YANDEX_UPLOAD_ENDPOINT=/resources/upload")
+    print("YANDEX_DOWNLOAD_ENDPOINT=/resources/download")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
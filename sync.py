@@ -0,0 +1,240 @@
+from __future__ import annotations
+
+import os
+import shutil
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterable, Iterator, NamedTuple
+
+import requests
+
+from client import CODEC_ITEM_FIELDS, TransferResult, YandexDiskClient, file_md5
+from compression import by_local_name, get_codec, original_content
+from models import Resource
+
+DIRECTIONS = ("push", "pull", "both")
+TRANSFER_KINDS = ("upload", "download")
+MTIME_TOLERANCE = 2.0
+
+
+class SyncAction(NamedTuple):
+    """Одно действие плана синхронизации."""
+
+    kind: str
+    local_path: Path
+    remote_path: Path
+    size: int = 0
+    mtime: float | None = None
+    compress: str | None = None
+    """Кодек, которым сжат файл на Диске: загрузка сжимает им же, remote_path - имя с суффиксом"""
+
+
+class SyncSummary(NamedTuple):
+    """Итог выполнения плана синхронизации."""
+
+    done: dict[str, int]
+    transferred_bytes: int
+    failed: list[TransferResult]
+
+
+class _LocalEntry(NamedTuple):
+    is_dir: bool
+    size: int
+    mtime: float
+
+
+def _remote_mtime(item: Resource) -> float:
+    return item.mtime or 0.0
+
+
+def _scan_local(folder: Path) -> dict[str, _LocalEntry]:
+    if not folder.is_dir():
+        return {}
+    entries = {}
+    with os.scandir(folder) as it:
+        for entry in it:
+            stat = entry.stat()
+            entries[entry.name] = _LocalEntry(entry.is_dir(), stat.st_size, stat.st_mtime)
+    return entries
+
+
+def _scan_remote(client: YandexDiskClient, folder: Path) -> dict[str, Resource]:
+    """Листинг папки Диска: из индекса клиента, если он свежий, иначе с Диска (и тогда он сохраняется в индекс)"""
+    index = client.index
+    indexed = index.list_folder(folder) if index is not None else None
+    if indexed is not None:
+        return by_local_name(indexed)
+    try:
+        items = list(client.iter_files(folder, fields=CODEC_ITEM_FIELDS))
+    except requests.HTTPError as e:
+        if e.response is not None and e.response.status_code == 404:
+            return {}
+        raise
+    if index is not None:
+        index.update_folder(folder, items)
+    return by_local_name(items)
+
+
+def plan_sync(
+        client: YandexDiskClient,
+        local_folder: Path,
+        remote_folder: Path,
+        direction: str = "push",
+        delete: bool = False,
+) -> Iterator[SyncAction]:
+    """
+    Строит план синхронизации обходом папок в глубину.
+    push - Диск приводится к локальной папке, pull - наоборот, both - побеждает более новый файл.
+    Файл считается измененным, если отличается размер или он новее копии на другой стороне
+    больше чем на MTIME_TOLERANCE секунд (Диск хранит время с точностью до секунды).
+    Файл того же размера и с тем же md5 не передается, как бы ни отличалось время:
+    после загрузки modified на Диске - время загрузки, и без этой проверки both скачивал бы файл обратно.
+    Удаления (delete) возможны только для push и pull.
+    Файл, сжатый при загрузке (x.log.gz с отметкой в custom_properties), сравнивается с локальным x.log
+    по исходным размеру и md5 и при загрузке снова сжимается тем же кодеком.
+    В памяти одновременно находятся листинги только одной папки с каждой стороны.
+    Если у клиента есть индекс (client.index), свежие листинги папок Диска берутся из него без запросов к API.
+    """
+    if direction not in DIRECTIONS:
+        raise ValueError(f"Неизвестное направление синхронизации: {direction}")
+
+    push = direction in ("push", "both")
+    pull = direction in ("pull", "both")
+    pending: list[tuple[Path, Path, bool, bool]] = [(local_folder, remote_folder, True, True)]
+
+    while pending:
+        local_dir, remote_dir, local_exists, remote_exists = pending.pop()
+        local = _scan_local(local_dir) if local_exists else {}
+        remote = _scan_remote(client, remote_dir) if remote_exists else {}
+
+        for name in sorted(local.keys() | remote.keys()):
+            local_entry = local.get(name)
+            remote_item = remote.get(name)
+            local_path = local_dir / name
+            remote_path = remote_dir / (remote_item.name if remote_item else name)
+
+            if local_entry and remote_item is None:
+                if local_entry.is_dir and push:
+                    yield SyncAction("mkdir", local_path, remote_path)
+                    pending.append((local_path, remote_path, True, False))
+                elif push:
+                    yield SyncAction("upload", local_path, remote_path, local_entry.size)
+                elif delete:
+                    yield SyncAction("delete_local", local_path, remote_path, local_entry.size)
+
+            elif remote_item and local_entry is None:
+                size = remote_item.size or 0
+                if remote_item.is_dir and pull:
+                    yield SyncAction("mkdir_local", local_path, remote_path)
+                    pending.append((local_path, remote_path, False, True))
+                elif pull:
+                    yield SyncAction("download", local_path, remote_path, size, _remote_mtime(remote_item))
+                elif delete:
+                    yield SyncAction("delete", local_path, remote_path, size)
+
+            elif local_entry and remote_item:
+                if local_entry.is_dir != remote_item.is_dir:
+                    continue
+                if local_entry.is_dir:
+                    pending.append((local_path, remote_path, True, True))
+                    continue
+
+                remote_size, remote_md5, codec = original_content(remote_item)
+                remote_mtime = _remote_mtime(remote_item)
+                same_size = local_entry.size == remote_size
+                local_newer = local_entry.mtime > remote_mtime + MTIME_TOLERANCE
+                remote_newer = remote_mtime > local_entry.mtime + MTIME_TOLERANCE
+                if push and not pull:
+                    upload, download = local_newer or not same_size, False
+                elif pull and not push:
+                    upload, download = False, remote_newer or not same_size
+                else:
+                    upload, download = local_newer, remote_newer
+
+                if (upload or download) and same_size and remote_md5 and file_md5(local_path) == remote_md5:
+                    continue
+                if upload:
+                    yield SyncAction("upload", local_path, remote_path, local_entry.size, compress=codec)
+                elif download:
+                    yield SyncAction("download", local_path, remote_path, remote_item.size or 0, remote_mtime)
+
+
+def describe_plan(actions: Iterable[SyncAction]) -> tuple[dict[str, int], dict[str, int]]:
+    """Печатает план и возвращает количество действий и байт по видам"""
+    counts: dict[str, int] = {}
+    sizes: dict[str, int] = {}
+    for action in actions:
+        print(f"{action.kind:<12} {action.local_path} <-> {action.remote_path} ({action.size} bytes)")
+        counts[action.kind] = counts.get(action.kind, 0) + 1
+        sizes[action.kind] = sizes.get(action.kind, 0) + action.size
+    return counts, sizes
+
+
+def _apply(client: YandexDiskClient, action: SyncAction) -> TransferResult:
+    """Выполняет одно действие плана, не прерывая синхронизацию при ошибке"""
+    response = None
+    try:
+        if action.kind == "upload" and action.compress:
+            original = action.remote_path.name.removesuffix(get_codec(action.compress).suffix)
+            response = client.upload_file(
+                action.local_path, action.remote_path.with_name(original), compress=action.compress
+            )
+        elif action.kind == "upload":
+            response = client.upload_file(action.local_path, action.remote_path)
+        elif action.kind == "download":
+            response = client.download_file(action.remote_path, action.local_path)
+            if action.mtime is not None:
+                os.utime(action.local_path, (action.mtime, action.mtime))
+        elif action.kind == "mkdir":
+            client.create_folder(action.remote_path)
+        elif action.kind == "mkdir_local":
+            action.local_path.mkdir(parents=True, exist_ok=True)
+        elif action.kind == "delete":
+            response = client.delete(action.remote_path)
+        elif action.kind == "delete_local":
+            if action.local_path.is_dir():
+                shutil.rmtree(action.local_path)
+            else:
+                action.local_path.unlink()
+    except Exception as e:
+        return TransferResult(action.local_path, action.remote_path, response, e)
+    return TransferResult(action.local_path, action.remote_path, response)
+
+
+def run_sync(client: YandexDiskClient, actions: Iterable[SyncAction], jobs: int = 4) -> SyncSummary:
+    """
+    Выполняет план по мере его построения.
+    Создание папок выполняется сразу, до передачи вложенных файлов;
+    передачи и удаления идут параллельно, в работе не больше 2 * jobs действий.
+    """
+    done: dict[str, int] = {}
+    transferred = 0
+    failed: list[TransferResult] = []
+    lock = threading.Lock()
+    slots = threading.BoundedSemaphore(jobs * 2)
+
+    def record(action: SyncAction, result: TransferResult) -> None:
+        nonlocal transferred
+        with lock:
+            if result.ok:
+                done[action.kind] = done.get(action.kind, 0) + 1
+                if action.kind in TRANSFER_KINDS:
+                    transferred += action.size
+            else:
+                failed.append(result)
+
+    def finished(action: SyncAction, future: Future[TransferResult]) -> None:
+        record(action, future.result())
+        slots.release()
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        for action in actions:
+            if action.kind in ("mkdir", "mkdir_local"):
+                record(action, _apply(client, action))
+                continue
+            slots.acquire()
+            future = executor.submit(_apply, client, action)
+            future.add_done_callback(lambda f, a=action: finished(a, f))
+
+    return SyncSummary(done=done, transferred_bytes=transferred, failed=failed)
@@ -0,0 +1,23 @@
+from __future__ import annotations
+
+from typing import Iterator
+
+import pytest
+
+from client import YandexDiskClient
+from retry import RetryBudget
+from stub_server import StubDiskServer
+from tests.helpers import FAST_RETRIES
+
+
+@pytest.fixture
+def server() -> Iterator[StubDiskServer]:
+    with StubDiskServer() as server:
+        yield server
+
+
+@pytest.fixture
+def client(server: StubDiskServer) -> Iterator[YandexDiskClient]:
+    settings = server.settings()
+    with YandexDiskClient(settings, retry_policies=FAST_RETRIES, retry_budget=RetryBudget(reserve=100)) as client:
+        yield client
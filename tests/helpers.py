@@ -0,0 +1,18 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+from retry import DEFAULT_RETRY_POLICIES
+
+FAST_RETRIES = {
+    name: policy._replace(backoff=0.001, max_backoff=0.001) for name, policy in DEFAULT_RETRY_POLICIES.items()
+}
+"""Политики повторов без заметных пауз, чтобы тесты на повторы не ждали"""
+
+
+def write_files(folder: Path, files: dict[str, str]) -> None:
+    """Создает в folder файлы {относительный путь: содержимое}"""
+    for name, text in files.items():
+        path = folder / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text)
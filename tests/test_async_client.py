@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import asyncio
+from pathlib import Path
+
+from async_client import AsyncYandexDiskClient
+from retry import RetryBudget
+from stub_server import StubDiskServer
+from tests.helpers import FAST_RETRIES, write_files
+
+
+def _client(server: StubDiskServer) -> AsyncYandexDiskClient:
+    return AsyncYandexDiskClient(server.settings(), retry_policies=FAST_RETRIES, retry_budget=RetryBudget(reserve=100))
+
+
+def test_upload_folder_twice(server: StubDiskServer, tmp_path: Path) -> None:
+    """Повторная загрузка в существующие папки не считается ошибкой"""
+    write_files(tmp_path, {"deep/d/f.txt": "x", "g.txt": "y"})
+
+    async def upload() -> list[bool]:
+        async with _client(server) as client:
+            return [result.ok for result in await client.upload_folder(tmp_path, Path("a/x"), jobs=4)]
+
+    assert all(asyncio.run(upload()))
+    assert all(asyncio.run(upload()))
+    assert server.state.files["a/x/deep/d/f.txt"].data == b"x"
+    assert server.state.files["a/x/g.txt"].data == b"y"
+
+
+def test_download_round_trip(server: StubDiskServer, tmp_path: Path) -> None:
+    write_files(tmp_path, {"f.txt": "data" * 1000})
+
+    async def round_trip() -> int:
+        async with _client(server) as client:
+            await client.upload_file(tmp_path / "f.txt", Path("f.txt"))
+            return (await client.download_file(Path("f.txt"), tmp_path / "g.txt")).status
+
+    assert asyncio.run(round_trip()) == 200
+    assert (tmp_path / "g.txt").read_text() == (tmp_path / "f.txt").read_text()
+
+
+def test_refused_upload_href_is_not_retried_twice(server: StubDiskServer, tmp_path: Path) -> None:
+    """Повторы ссылки на загрузку делает только запрос к API, а не еще и попытка загрузки поверх него"""
+    write_files(tmp_path, {"f.txt": "x"})
+
+    def refuse() -> bool:
+        server.requests["rejected"] += 1
+        return False
+
+    server.admit_api_request = refuse  # type: ignore[method-assign]
+
+    async def upload() -> int:
+        async with _client(server) as client:
+            return (await client.upload_file(tmp_path / "f.txt", Path("f.txt"))).status
+
+    assert asyncio.run(upload()) == 429
+    assert server.requests["rejected"] == FAST_RETRIES["api"].attempts
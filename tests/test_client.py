@@ -0,0 +1,258 @@
+from __future__ import annotations
+
+import hashlib
+import threading
+from pathlib import Path
+
+import pytest
+import requests
+
+from client import YandexDiskClient
+from retry import RetryBudget, RetryPolicy
+from stub_server import StubDiskServer
+from tests.helpers import FAST_RETRIES, write_files
+
+
+def test_requests_share_pooled_connections(server: StubDiskServer, client: YandexDiskClient) -> None:
+    for _ in range(5):
+        assert client.check_disk_access().status_code == 200
+
+    stats = client.pool_stats()
+
+    assert (stats.requests, stats.connections, stats.hosts) == (5, 1, 1)
+    assert stats.reused == 4
+
+
+def test_close_releases_pools(server: StubDiskServer) -> None:
+    with YandexDiskClient(server.settings()) as client:
+        client.check_disk_access()
+
+    assert client.pool_stats().hosts == 0
+
+
+def test_upload_and_download_file(server: StubDiskServer, client: YandexDiskClient, tmp_path: Path) -> None:
+    write_files(tmp_path, {"f.txt": "data" * 1000})
+    client.create_folder(Path("deep/dir"))
+
+    response = client.upload_file(tmp_path / "f.txt", Path("deep/dir/f.txt"))
+
+    assert response.status_code in (200, 201)
+    assert server.state.files["deep/dir/f.txt"].data == (tmp_path / "f.txt").read_bytes()
+    client.download_file(Path("deep/dir/f.txt"), tmp_path / "g.txt")
+    assert (tmp_path / "g.txt").read_bytes() == (tmp_path / "f.txt").read_bytes()
+    assert client.pool_stats().hosts == 1
+
+
+def test_list_files_walks_all_pages(server: StubDiskServer, client: YandexDiskClient) -> None:
+    client.create_folder(Path("many"))
+    for i in range(10):
+        server.state.store(f"many/f{i:02d}.txt", b"x" * i)
+    before = server.requests["resources"]
+
+    result = client.list_files(Path("many"), page_size=3)
+
+    assert [item.name for item in result.files] == [f"f{i:02d}.txt" for i in range(10)]
+    assert server.requests["resources"] - before == 4
+    assert [item.name for item in client.iter_files(Path("many"), page_size=5)] == [item.name for item in result.files]
+    assert list(client.list_files(Path("many"), page_size=3, columnar=True).files) == result.files
+
+
+def test_flat_listing_pages_without_total(server: StubDiskServer, client: YandexDiskClient) -> None:
+    """В плоском списке нет total: последней считается неполная страница, в том числе пустая"""
+    for i in range(6):
+        server.state.store(f"f{i}.txt", b"x")
+    before = server.requests["files"]
+
+    names = [item.name for item in client.iter_all_files(page_size=3)]
+
+    assert sorted(names) == [f"f{i}.txt" for i in range(6)]
+    assert server.requests["files"] - before == 3
+
+
+def test_custom_properties_only_in_listings_that_read_them(
+        server: StubDiskServer, client: YandexDiskClient, tmp_path: Path
+) -> None:
+    write_files(tmp_path, {"x.log": "hello world\n" * 5000})
+    client.upload_files([(tmp_path / "x.log", Path("x.log"))], compress="gzip")
+
+    [plain] = client.list_files(Path("/")).files
+    marked = client._remote_items_by_name(Path("/"))["x.log"]
+
+    assert plain.name == "x.log.gz" and plain.custom_properties is None
+    assert marked.custom_properties["compression"] == "gzip"
+
+
+def test_listing_error_is_raised(client: YandexDiskClient) -> None:
+    with pytest.raises(requests.HTTPError):
+        list(client.iter_files(Path("missing")))
+
+
+def test_retries_rate_limited_api(server: StubDiskServer) -> None:
+    """Ответы 429 повторяются, пока заглушка не начнет пропускать запросы"""
+    server.api_rate_limit = 5
+    server._api_tokens = 0.0
+    policies = {"api": RetryPolicy(attempts=6, backoff=0.05, jitter=0.0)}
+
+    with YandexDiskClient(server.settings(), retry_policies=policies) as client:
+        assert client.create_folder(Path("limited"))
+
+    assert server.requests["rejected"] > 0
+    assert "limited" in server.state.dirs
+
+
+def test_make_dir_caches_only_existing_folders(server: StubDiskServer, client: YandexDiskClient) -> None:
+    response = client._make_dir("missing/child")
+    assert response is not None and response.status_code == 409
+    assert "missing/child" not in client._dir_cache
+
+    client.create_folder(Path("a"))
+    client.invalidate_dir_cache()
+    assert client._make_dir("a") is None
+    assert "a" in client._dir_cache
+
+    server.state.store("a/f", b"x")
+    response = client._make_dir("a/f")
+    assert response is not None and response.status_code == 409
+    assert "a/f" not in client._dir_cache
+
+
+def test_create_folder_over_file_fails(server: StubDiskServer, client: YandexDiskClient) -> None:
+    client.create_folder(Path("a"))
+    server.state.store("a/f", b"x")
+
+    with pytest.raises(Exception, match="a/f"):
+        client.create_folder(Path("a/f/g"))
+
+
+def test_known_folders_are_not_created_again(server: StubDiskServer, client: YandexDiskClient) -> None:
+    client.create_folder(Path("a/b/c"))
+    before = server.requests["resources"]
+
+    client.create_folder(Path("a/b/c"))
+    client.create_folder(Path("a/b/d"))
+
+    assert server.requests["resources"] - before == 1
+
+
+@pytest.fixture
+def large_file(tmp_path: Path) -> Path:
+    path = tmp_path / "large.bin"
+    path.write_bytes(bytes(range(256)) * 1024)
+    return path
+
+
+def _resumable_client(server: StubDiskServer) -> YandexDiskClient:
+    return YandexDiskClient(
+        server.settings(), large_file_threshold=1024, retry_policies=FAST_RETRIES, retry_budget=RetryBudget(reserve=100)
+    )
+
+
+def test_interrupted_upload_resends_only_the_rest(server: StubDiskServer, large_file: Path) -> None:
+    size = large_file.stat().st_size
+    server.drop_upload_after = 100_000
+
+    with _resumable_client(server) as client:
+        response = client.upload_file(large_file, Path("large.bin"))
+
+    assert response.status_code == 201
+    assert server.state.files["large.bin"].data == large_file.read_bytes()
+    assert server.requests["upload_href"] == 1
+    assert server.requests["upload_bytes"] == size
+
+
+def test_upload_finished_before_drop_is_not_repeated(server: StubDiskServer, large_file: Path) -> None:
+    """Ответ потерян, но файл принят целиком: проверка докачки отвечает 201, и файл не отправляется снова"""
+    size = large_file.stat().st_size
+    server.drop_upload_after = size
+
+    with _resumable_client(server) as client:
+        response = client.upload_file(large_file, Path("large.bin"))
+
+    assert response.status_code == 201
+    assert server.state.files["large.bin"].data == large_file.read_bytes()
+    assert (server.requests["upload_href"], server.requests["upload_bytes"]) == (1, size)
+
+
+def test_upload_dropped_before_any_byte_reuses_href(server: StubDiskServer, large_file: Path) -> None:
+    """308 без Range означает, что не принято ничего: файл отправляется заново по той же ссылке"""
+    server.drop_upload_after = 0
+
+    with _resumable_client(server) as client:
+        response = client.upload_file(large_file, Path("large.bin"))
+
+    assert response.status_code == 201
+    assert server.state.files["large.bin"].data == large_file.read_bytes()
+    assert server.requests["upload_href"] == 1
+
+
+def test_segment_cut_mid_body_resumes(server: StubDiskServer, client: YandexDiskClient, tmp_path: Path) -> None:
+    """Оборванный посреди тела диапазон докачивается с недокачанного байта, а не скачивается заново"""
+    data = bytes(range(256)) * 4096 * 3
+    server.state.store("big.bin", data)
+    server.drop_download_after = 300_000
+
+    client.download_file(Path("big.bin"), tmp_path / "big.bin", segments=3)
+
+    assert (tmp_path / "big.bin").read_bytes() == data
+    assert server.drop_download_after is None
+    assert server.requests["download_data"] == 5
+    resent = server.requests["download_bytes"] - (1 + len(data))
+    assert 0 <= resent < 65536, "заново отправлен только недописанный кусок, а не весь диапазон"
+
+
+def test_download_folder_reports_from_calling_thread(
+        server: StubDiskServer, client: YandexDiskClient, tmp_path: Path, capsys: pytest.CaptureFixture[str]
+) -> None:
+    """Рабочие потоки ничего не печатают, о каждом результате сообщается в потоке вызывающего"""
+    server.state.dirs.update({"d": "2024-01-01T00:00:00+00:00", "d/sub": "2024-01-01T00:00:00+00:00"})
+    for name in ("d/a.txt", "d/b.txt", "d/sub/c.txt"):
+        server.state.store(name, name.encode())
+    reported: list[tuple[threading.Thread, Path]] = []
+
+    results = client.download_folder(
+        Path("d"), tmp_path / "out", jobs=3,
+        on_result=lambda result: reported.append((threading.current_thread(), result.remote_path)),
+    )
+
+    assert {thread for thread, _ in reported} == {threading.current_thread()}
+    assert sorted(path for _, path in reported) == sorted(result.remote_path for result in results)
+    assert len(results) == 4 and all(result.ok for result in results)
+    assert capsys.readouterr().out == ""
+
+
+def test_compressed_upload_round_trip(server: StubDiskServer, client: YandexDiskClient, tmp_path: Path) -> None:
+    write_files(tmp_path, {"x.log": "hello world\n" * 5000})
+    original = (tmp_path / "x.log").read_bytes()
+    client.create_folder(Path("r"))
+
+    client.upload_files([(tmp_path / "x.log", Path("r/x.log"))], compress="gzip")
+
+    stored = server.state.files["r/x.log.gz"]
+    assert len(stored.data) < len(original)
+    assert stored.custom_properties == {
+        "compression": "gzip", "original_size": len(original), "original_md5": hashlib.md5(original).hexdigest()
+    }
+    out = tmp_path / "out"
+    out.mkdir()
+    client.download_file(Path("r/x.log.gz"), out / "kept.gz")
+    assert (out / "kept.gz").read_bytes() == original
+    client.download_folder(Path("r"), out / "folder")
+    assert [path.name for path in (out / "folder").iterdir()] == ["x.log"]
+    assert (out / "folder" / "x.log").read_bytes() == original
+
+
+def test_download_folder_keeps_gz_name_next_to_raw_file(
+        server: StubDiskServer, client: YandexDiskClient, tmp_path: Path
+) -> None:
+    """x.log.gz при несжатом x.log в той же папке не распаковывается поверх него"""
+    write_files(tmp_path, {"x.log": "compressed text\n" * 5000})
+    client.upload_files([(tmp_path / "x.log", Path("x.log"))], compress="gzip")
+    server.state.store("x.log", b"raw")
+    out = tmp_path / "out"
+
+    results = client.download_folder(Path("/"), out, jobs=2)
+
+    assert all(result.ok for result in results)
+    assert sorted(path.name for path in out.iterdir()) == ["x.log", "x.log.gz"]
+    assert (out / "x.log").read_bytes() == b"raw"
+    assert (out / "x.log.gz").read_bytes() == server.state.files["x.log.gz"].data
@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from client import YandexDiskClient
+from disk_index import DiffEntry, DiskIndex
+from stub_server import StubDiskServer
+from sync import plan_sync
+from tests.helpers import write_files
+
+
+@pytest.fixture
+def index() -> DiskIndex:
+    with DiskIndex(":memory:") as index:
+        yield index
+
+
+@pytest.fixture
+def indexed_client(server: StubDiskServer, index: DiskIndex) -> YandexDiskClient:
+    with YandexDiskClient(server.settings(), index=index) as client:
+        yield client
+
+
+def test_refresh_answers_existence_and_listing_locally(
+        server: StubDiskServer, index: DiskIndex, indexed_client: YandexDiskClient, tmp_path: Path
+) -> None:
+    write_files(tmp_path, {"a.txt": "aaa", "sub/b.txt": "b"})
+    indexed_client.upload_folder(tmp_path, Path("r"))
+    assert index.refresh(indexed_client, Path("r")) == 3
+    before = sum(server.requests.values())
+
+    assert [(item.name, item.size) for item in index.list_folder(Path("r"))] == [("a.txt", 3), ("sub", None)]
+    assert index.exists(Path("r/sub/b.txt"), "file") is True
+    assert index.exists(Path("r/sub"), "file") is False
+    assert index.exists(Path("r/missing/x.txt")) is False
+    assert index.exists(Path("other/x.txt")) is None
+    assert sum(server.requests.values()) == before
+
+
+def test_stale_only_refresh_relists_only_stale_folders(
+        server: StubDiskServer, index: DiskIndex, indexed_client: YandexDiskClient, tmp_path: Path
+) -> None:
+    write_files(tmp_path, {"a/1.txt": "1", "b/2.txt": "2", "b/c/3.txt": "3"})
+    indexed_client.upload_folder(tmp_path, Path("r"))
+    index.refresh(indexed_client, Path("r"))
+    server.state.store("r/b/new.txt", b"n")
+    index.invalidate(Path("r/b"), recursive=False)
+    before = server.requests["resources"]
+
+    index.refresh(indexed_client, Path("r"), stale_only=True)
+
+    assert server.requests["resources"] - before == 1
+    assert "new.txt" in [item.name for item in index.list_folder(Path("r/b"))]
+
+
+def test_diff_against_index(index: DiskIndex, indexed_client: YandexDiskClient, tmp_path: Path) -> None:
+    local = tmp_path / "local"
+    write_files(local, {"same.txt": "s", "changed.txt": "c", "gone.txt": "g", "sub/x.txt": "x"})
+    indexed_client.upload_folder(local, Path("r"))
+    index.refresh(indexed_client, Path("r"))
+    (local / "gone.txt").unlink()
+    write_files(local, {"changed.txt": "longer", "new.txt": "n", "fresh/y.txt": "y"})
+    index.invalidate(Path("r/sub"), recursive=False)
+
+    entries = sorted(index.diff(local, Path("r")))
+
+    assert entries == sorted([
+        DiffEntry("modified", Path("changed.txt")),
+        DiffEntry("deleted", Path("gone.txt")),
+        DiffEntry("added", Path("new.txt")),
+        DiffEntry("added", Path("fresh")),
+        DiffEntry("unknown", Path("sub")),
+    ])
+
+
+def test_indexed_folders_are_not_created_or_listed_again(
+        server: StubDiskServer, index: DiskIndex, indexed_client: YandexDiskClient, tmp_path: Path
+) -> None:
+    write_files(tmp_path, {"a.txt": "a", "sub/b.txt": "b"})
+    indexed_client.upload_folder(tmp_path, Path("r"))
+    index.refresh(indexed_client, Path("r"))
+    indexed_client.invalidate_dir_cache()
+    before = sum(server.requests.values())
+
+    results = indexed_client.upload_folder(tmp_path, Path("r"), skip_unchanged=True)
+
+    assert all(result.skipped for result in results if result.local_path.is_file())
+    assert sum(server.requests.values()) == before
+
+
+def test_fresh_index_plans_without_api_calls(
+        server: StubDiskServer, index: DiskIndex, indexed_client: YandexDiskClient, tmp_path: Path
+) -> None:
+    write_files(tmp_path, {"a.txt": "a", "sub/b.txt": "b"})
+    indexed_client.upload_folder(tmp_path, Path("r"))
+    index.refresh(indexed_client, Path("r"))
+    before = sum(server.requests.values())
+
+    assert list(plan_sync(indexed_client, tmp_path, Path("r"), "push", False)) == []
+    assert sum(server.requests.values()) == before
+
+    write_files(tmp_path, {"new.txt": "n"})
+    indexed_client.upload_file(tmp_path / "new.txt", Path("r/new.txt"))
+    assert list(plan_sync(indexed_client, tmp_path, Path("r"), "push", False)) == []
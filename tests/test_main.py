@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+import pytest
+
+import main
+from client import YandexDiskClient
+from stub_server import StubDiskServer
+
+
+@pytest.fixture
+def cli(server: StubDiskServer, monkeypatch: pytest.MonkeyPatch) -> list[YandexDiskClient]:
+    """Направляет CLI на заглушку; возвращает список закрытых клиентов"""
+    for name, value in server.settings().model_dump().items():
+        monkeypatch.setenv(f"YANDEX_{name.upper()}", value)
+    closed: list[YandexDiskClient] = []
+    close = YandexDiskClient.close
+
+    def recording_close(client: YandexDiskClient) -> None:
+        closed.append(client)
+        close(client)
+
+    monkeypatch.setattr(YandexDiskClient, "close", recording_close)
+    return closed
+
+
+def _run(monkeypatch: pytest.MonkeyPatch, *args: str) -> None:
+    monkeypatch.setattr(sys, "argv", ["main.py", *args])
+    main.main()
+
+
+def test_main_closes_client(
+        server: StubDiskServer, cli: list[YandexDiskClient], monkeypatch: pytest.MonkeyPatch,
+        capsys: pytest.CaptureFixture[str],
+) -> None:
+    server.state.store("f.txt", b"x")
+
+    _run(monkeypatch, "list")
+
+    assert "f.txt" in capsys.readouterr().out
+    assert len(cli) == 1
+
+
+def test_main_closes_client_on_error(
+        server: StubDiskServer, cli: list[YandexDiskClient], monkeypatch: pytest.MonkeyPatch,
+        capsys: pytest.CaptureFixture[str],
+) -> None:
+    _run(monkeypatch, "--no-access-check", "download", "missing.txt", "out.txt")
+
+    assert "Произошла ошибка" in capsys.readouterr().out
+    assert len(cli) == 1
+
+
+def test_diff_answers_from_index_without_api_calls(
+        server: StubDiskServer, cli: list[YandexDiskClient], monkeypatch: pytest.MonkeyPatch,
+        capsys: pytest.CaptureFixture[str], tmp_path: Path,
+) -> None:
+    server.state.dirs["r"] = "2024-01-01T00:00:00+00:00"
+    server.state.store("r/a.txt", b"a")
+    (tmp_path / "local").mkdir()
+    (tmp_path / "local" / "b.txt").write_text("b")
+    db = str(tmp_path / "disk.db")
+    _run(monkeypatch, "--index", db, "refresh", "r")
+    before = sum(server.requests.values())
+
+    _run(monkeypatch, "--index", db, "diff", str(tmp_path / "local"), "r")
+
+    out = capsys.readouterr().out
+    assert "deleted  a.txt" in out and "added    b.txt" in out
+    assert sum(server.requests.values()) == before
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import re
+from pathlib import Path
+
+import pytest
+
+from client import YandexDiskClient
+from metrics import Histogram, RequestMetrics
+from retry import RetryBudget
+from stub_server import StubDiskServer
+from tests.helpers import FAST_RETRIES, write_files
+
+
+@pytest.fixture
+def metrics() -> RequestMetrics:
+    return RequestMetrics()
+
+
+@pytest.fixture
+def measured_client(server: StubDiskServer, metrics: RequestMetrics) -> YandexDiskClient:
+    with YandexDiskClient(
+            server.settings(), metrics=metrics, retry_policies=FAST_RETRIES, retry_budget=RetryBudget(reserve=100)
+    ) as client:
+        yield client
+
+
+def test_histogram_buckets_and_quantiles() -> None:
+    histogram = Histogram((1.0, 2.0, 4.0))
+    for value in (0.5, 1.5, 3.0, 10.0):
+        histogram.observe(value)
+
+    assert histogram.counts == [1, 1, 1, 1]
+    assert histogram.quantile(0.5) == 2.0
+    assert histogram.quantile(1.0) == 4.0
+    assert histogram.summary()["count"] == 4 and histogram.summary()["mean"] == 3.75
+
+
+def test_requests_are_counted_by_endpoint_and_status(
+        metrics: RequestMetrics, measured_client: YandexDiskClient, tmp_path: Path
+) -> None:
+    write_files(tmp_path, {"f.txt": "x" * 5000})
+    measured_client.create_folder(Path("d"))
+    measured_client.upload_file(tmp_path / "f.txt", Path("d/f.txt"))
+    measured_client.download_file(Path("d/f.txt"), tmp_path / "g.txt")
+
+    summary = metrics.summary()
+
+    assert summary["requests"] == {
+        "resources": {"201": 1}, "upload_href": {"200": 1}, "download_href": {"200": 1}, "data": {"201": 1, "200": 1},
+    }
+    assert summary["bytes"]["data"]["received"] == 5000
+    assert summary["bytes"]["data"]["sent"] >= 5000
+    assert {"dns", "connect", "ttfb", "total"} <= set(summary["phases"]["resources"])
+    assert "connect" not in summary["phases"]["upload_href"], "соединение переиспользуется"
+    assert summary["hosts"]["127.0.0.1"]["count"] == 5
+
+
+def test_retried_responses_are_counted_separately(
+        server: StubDiskServer, metrics: RequestMetrics, measured_client: YandexDiskClient
+) -> None:
+    refusals = [False]
+    server.admit_api_request = lambda: refusals.pop() if refusals else True  # type: ignore[method-assign]
+
+    measured_client.create_folder(Path("d"))
+
+    assert metrics.summary()["requests"]["resources"] == {"201": 1, "429": 1}
+
+
+def test_prometheus_exposition(metrics: RequestMetrics, measured_client: YandexDiskClient) -> None:
+    measured_client.create_folder(Path("a"))
+    measured_client.create_folder(Path("b"))
+
+    text = metrics.to_prometheus(prefix="disk")
+
+    assert 'disk_requests_total{endpoint="resources",status="201"} 2\n' in text
+    assert "# TYPE disk_phase_seconds histogram" in text
+    pattern = r'disk_phase_seconds_bucket\{endpoint="resources",phase="total",le="[^"]+"} (\d+)'
+    buckets = [int(count) for count in re.findall(pattern, text)]
+    assert buckets == sorted(buckets) and buckets[-1] == 2
+    assert 'disk_phase_seconds_count{endpoint="resources",phase="total"} 2\n' in text
+    assert 'disk_host_seconds_count{host="127.0.0.1"} 2\n' in text
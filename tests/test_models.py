@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+from models import Resource, ResourceColumns
+
+ITEMS = [
+    {"name": "a.txt", "path": "disk:/a.txt", "type": "file", "size": 3,
+     "modified": "2024-05-01T10:00:00+03:00", "md5": "0cc175b9c0f1b6a831c399e269772661"},
+    {"name": "b.log.gz", "path": "disk:/b.log.gz", "type": "file", "size": 10,
+     "modified": "2024-05-01T10:00:00.5+00:00", "custom_properties": {"compression": "gzip"}},
+    {"name": "dir", "path": "disk:/dir", "type": "dir"},
+]
+
+
+def test_columns_round_trip() -> None:
+    resources = [Resource.from_json(item) for item in ITEMS]
+
+    columns = ResourceColumns(resources)
+
+    assert len(columns) == 3
+    assert list(columns) == resources
+    assert columns[1:] == resources[1:]
+    assert [item.modified for item in columns] == [item.get("modified") for item in ITEMS]
+    assert columns[1].custom_properties == {"compression": "gzip"}
+    assert columns[0].md5 == ITEMS[0]["md5"]
+    assert columns[2].is_dir and columns[2].md5 is None
+    assert columns.total_size() == 13
+
+
+def test_mtime_is_parsed_from_modified() -> None:
+    resource = Resource.from_json(ITEMS[0])
+
+    assert resource.mtime == 1714546800.0
+    assert Resource.from_json(ITEMS[2]).mtime is None
+
+
+def test_from_json_reads_fields_from_the_item() -> None:
+    item = dict(ITEMS[1])
+
+    resource = Resource.from_json(item)
+    item["size"] = 11
+
+    assert resource.size == 11
+    assert resource.custom_properties == {"compression": "gzip"}
+    assert resource.sha256 is None and not resource.is_dir
+
+
+def test_equal_resources_hash_equally() -> None:
+    built = Resource("dir", "disk:/dir", "dir")
+    parsed = Resource.from_json(ITEMS[2])
+
+    assert built == parsed and hash(built) == hash(parsed)
+    assert len({built, parsed, Resource.from_json(ITEMS[0])}) == 2
+    assert Resource.from_json(ITEMS[1]) != Resource("b.log.gz", "disk:/b.log.gz", size=10)
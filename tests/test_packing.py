@@ -0,0 +1,286 @@
+from __future__ import annotations
+
+import hashlib
+import io
+import json
+import tarfile
+from pathlib import Path
+from typing import Any, Callable
+
+import pytest
+from requests.models import Response
+
+from client import YandexDiskClient
+from packing import (
+    PACK_DIR,
+    ManifestEntry,
+    PackStream,
+    build_manifest,
+    extract_archive,
+    extract_range,
+    latest_entries,
+    plan_packs,
+    plan_ranges,
+    read_manifest,
+    safe_target,
+)
+from stub_server import StubDiskServer
+from tests.helpers import write_files
+
+
+def _versioned(folder: Path, version: int, count: int = 20) -> None:
+    """Мелкие файлы разного размера, содержимое которых зависит от version"""
+    write_files(folder, {f"f{i:02d}.txt": f"v{version}-" + "x" * (i * 37 + version * 11) for i in range(count)})
+
+
+def _pack_files(server: StubDiskServer) -> list[str]:
+    return sorted(key for key in server.state.files if f"/{PACK_DIR}/" in key)
+
+
+def test_pack_layout_matches_tar(tmp_path: Path) -> None:
+    """Смещения из плана совпадают с реальным tar, архивы не превышают pack_size"""
+    _versioned(tmp_path, 1)
+    files = [(path, path.name) for path in sorted(tmp_path.iterdir())]
+    packs = plan_packs(files, pack_size=4096, run_id="test")
+
+    assert len(packs) > 1
+    assert [member.name for pack in packs for member in pack.members] == [name for _, name in files]
+    for pack in packs:
+        assert pack.name.startswith("pack-test-")
+        assert pack.size <= 4096
+        stream = PackStream(pack)
+        data = stream.read()
+        assert len(data) == len(stream) == pack.size
+        with tarfile.open(fileobj=io.BytesIO(data)) as archive:
+            assert archive.getnames() == [member.name for member in pack.members]
+        for member in pack.members:
+            content = member.local_path.read_bytes()
+            assert data[member.offset:member.offset + member.size] == content
+            assert stream.md5s[member.name] == hashlib.md5(content).hexdigest()
+
+
+def test_pack_names_differ_between_runs(tmp_path: Path) -> None:
+    _versioned(tmp_path, 1, count=2)
+    files = [(path, path.name) for path in sorted(tmp_path.iterdir())]
+    assert plan_packs(files)[0].name != plan_packs(files)[0].name
+
+
+def test_manifest_round_trip(tmp_path: Path) -> None:
+    _versioned(tmp_path, 1, count=3)
+    pack = plan_packs([(path, path.name) for path in sorted(tmp_path.iterdir())])[0]
+    stream = PackStream(pack)
+    stream.read()
+
+    manifest = read_manifest(build_manifest(pack, stream.md5s))
+
+    assert manifest.archive == pack.archive_name
+    assert manifest.size == pack.size
+    assert manifest.created > 0
+    assert [(entry.name, entry.offset, entry.size, entry.md5) for entry in manifest.entries] == [
+        (member.name, member.offset, member.size, stream.md5s[member.name]) for member in pack.members
+    ]
+
+
+def test_manifest_version_1_has_no_md5() -> None:
+    data = json.dumps({
+        "version": 1, "archive": "a.tar", "size": 2048,
+        "names": ["x"], "offsets": [512], "sizes": [3], "mtimes": [0],
+    }).encode()
+
+    manifest = read_manifest(data)
+
+    assert manifest.entries == [ManifestEntry("x", 512, 3, 0, None)]
+    assert manifest.created == 0.0
+
+
+def test_latest_entries_prefers_newest_manifest() -> None:
+    old = read_manifest(json.dumps({
+        "archive": "old.tar", "size": 0, "created": 1.0,
+        "names": ["a", "b"], "offsets": [512, 1536], "sizes": [1, 1], "mtimes": [0, 0],
+    }).encode())
+    new = read_manifest(json.dumps({
+        "archive": "new.tar", "size": 0, "created": 2.0,
+        "names": ["b"], "offsets": [512], "sizes": [1], "mtimes": [0],
+    }).encode())
+
+    chosen = latest_entries([new, old])
+
+    assert [entry.name for entry in chosen["old.tar"]] == ["a"]
+    assert [entry.name for entry in chosen["new.tar"]] == ["b"]
+
+
+def test_plan_ranges_merges_close_members() -> None:
+    entries = [ManifestEntry("c", 100_000, 10, 0), ManifestEntry("a", 512, 10, 0), ManifestEntry("b", 1536, 10, 0)]
+
+    ranges = plan_ranges(entries, gap=1024)
+
+    assert [(start, end, [entry.name for entry in group]) for start, end, group in ranges] == [
+        (512, 1545, ["a", "b"]),
+        (100_000, 100_009, ["c"]),
+    ]
+
+
+def test_safe_target_rejects_escaping_names(tmp_path: Path) -> None:
+    assert safe_target(tmp_path, "sub/file.txt") == tmp_path.resolve() / "sub" / "file.txt"
+    with pytest.raises(ValueError):
+        safe_target(tmp_path, "../outside.txt")
+
+
+def test_extract_range_refuses_mismatched_md5(tmp_path: Path) -> None:
+    """Данные, не совпавшие с md5 манифеста, не попадают на место файла"""
+    (tmp_path / "keep.txt").write_text("old")
+    entry = ManifestEntry("keep.txt", 0, 3, 0, hashlib.md5(b"new").hexdigest())
+
+    with pytest.raises(ValueError):
+        extract_range(io.BytesIO(b"bad"), 0, [entry], tmp_path)
+
+    assert (tmp_path / "keep.txt").read_text() == "old"
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["keep.txt"]
+
+
+def test_extract_archive_checks_manifest_md5(tmp_path: Path) -> None:
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w") as archive:
+        info = tarfile.TarInfo("a.txt")
+        info.size = 3
+        archive.addfile(info, io.BytesIO(b"bad"))
+    good = ManifestEntry("a.txt", 512, 3, 0, hashlib.md5(b"bad").hexdigest())
+
+    assert extract_archive(io.BytesIO(buffer.getvalue()), tmp_path / "ok", [good]) == [tmp_path / "ok" / "a.txt"]
+    corrupt = good._replace(md5=hashlib.md5(b"new").hexdigest())
+    with pytest.raises(ValueError):
+        extract_archive(io.BytesIO(buffer.getvalue()), tmp_path / "bad", [corrupt])
+    with pytest.raises(ValueError, match="b.txt"):
+        extract_archive(io.BytesIO(buffer.getvalue()), tmp_path / "missing", [good, good._replace(name="b.txt")])
+    assert not (tmp_path / "bad" / "a.txt").exists()
+
+
+def test_upload_and_restore_packed(server: StubDiskServer, client: YandexDiskClient, tmp_path: Path) -> None:
+    src, out = tmp_path / "src", tmp_path / "out"
+    _versioned(src, 1)
+    write_files(src, {"sub/big.bin": "b" * 10_000})
+
+    results = client.upload_folder(src, Path("p"), pack_below=1000, pack_size=4096)
+
+    assert all(result.ok for result in results)
+    assert "p/sub/big.bin" in server.state.files
+    assert len(_pack_files(server)) > 2
+    restored = client.restore_packed(Path("p"), out)
+    assert all(result.ok for result in restored)
+    assert {path.name: path.read_text() for path in out.iterdir()} == {
+        path.name: path.read_text() for path in src.iterdir() if path.is_file()
+    }
+
+
+def test_failed_manifest_keeps_previous_upload_restorable(
+        server: StubDiskServer, client: YandexDiskClient, tmp_path: Path
+) -> None:
+    """Повторная загрузка, у которой не записался манифест, не портит прошлую"""
+    src = tmp_path / "src"
+    _versioned(src, 1)
+    client.upload_folder(src, Path("p"), pack_below=10**6, pack_size=4096)
+    first = (src / "f10.txt").read_text()
+    _versioned(src, 2)
+
+    upload_body = client._upload_body
+
+    def failing_manifests(remote_path: Path, make_body: Callable[[], Any]) -> Response:
+        if remote_path.suffix == ".json":
+            raise Exception("manifest lost")
+        return upload_body(remote_path, make_body)
+
+    client._upload_body = failing_manifests  # type: ignore[method-assign]
+    assert not all(result.ok for result in client.upload_folder(src, Path("p"), pack_below=10**6, pack_size=4096))
+    client._upload_body = upload_body  # type: ignore[method-assign]
+
+    out = tmp_path / "out"
+    restored = client.restore_packed(Path("p"), out, names=["f10.txt"])
+    assert [result.ok for result in restored] == [True]
+    assert (out / "f10.txt").read_text() == first
+
+
+def test_reupload_replaces_old_packs(server: StubDiskServer, client: YandexDiskClient, tmp_path: Path) -> None:
+    src, out = tmp_path / "src", tmp_path / "out"
+    _versioned(src, 1)
+    client.upload_folder(src, Path("p"), pack_below=10**6, pack_size=4096)
+    first = _pack_files(server)
+    _versioned(src, 2)
+
+    client.upload_folder(src, Path("p"), pack_below=10**6, pack_size=4096)
+
+    second = _pack_files(server)
+    assert len(second) == len(first) and not set(first) & set(second)
+    client.restore_packed(Path("p"), out)
+    assert all((out / path.name).read_text() == path.read_text() for path in src.iterdir())
+
+
+def test_ranged_restore_refuses_corrupt_archive(
+        server: StubDiskServer, client: YandexDiskClient, tmp_path: Path
+) -> None:
+    src, out = tmp_path / "src", tmp_path / "out"
+    _versioned(src, 1)
+    client.upload_folder(src, Path("p"), pack_below=10**6, pack_size=4096)
+    key = next(key for key in _pack_files(server) if key.endswith("-000001.tar"))
+    data = bytearray(server.state.files[key].data)
+    data[1536:1540] = b"ZZZZ"
+    server.state.store(key, bytes(data))
+
+    restored = client.restore_packed(Path("p"), out, names=["f01.txt", "f02.txt"])
+
+    assert restored and not any(result.ok for result in restored)
+    assert not out.exists() or not any(out.iterdir())
+
+
+def test_packed_only_folders_are_not_created(server: StubDiskServer, client: YandexDiskClient, tmp_path: Path) -> None:
+    """Папки, все файлы которых ушли в архивы, не создаются на Диске, а восстанавливаются из архивов"""
+    src, out = tmp_path / "src", tmp_path / "out"
+    write_files(src, {f"d{i:02d}/f{j}.txt": f"{i}-{j}" for i in range(20) for j in range(5)})
+    write_files(src, {"mixed/big.bin": "b" * 10_000, "mixed/small.txt": "s"})
+    (src / "empty").mkdir()
+
+    results = client.upload_folder(src, Path("p"), pack_below=1000, jobs=4)
+
+    assert all(result.ok for result in results)
+    created = {key for key in server.state.dirs if key.startswith("p")}
+    assert created == {"p", "p/empty", "p/mixed", f"p/{PACK_DIR}"}
+    assert server.requests["resources"] == 6, "проверка и создание p, папка архивов, mixed, empty, листинг архивов"
+    client.restore_packed(Path("p"), out)
+    assert (out / "d07" / "f3.txt").read_text() == "7-3" and (out / "mixed" / "small.txt").read_text() == "s"
+
+
+def test_stale_packs_are_deleted_permanently(client: YandexDiskClient, tmp_path: Path) -> None:
+    src = tmp_path / "src"
+    _versioned(src, 1)
+    client.upload_folder(src, Path("p"), pack_below=10**6, pack_size=4096)
+    _versioned(src, 2)
+    deleted: list[tuple[Path, bool]] = []
+    delete = client.delete
+
+    def recording_delete(remote_path: Path, permanently: bool = False) -> Response:
+        deleted.append((remote_path, permanently))
+        return delete(remote_path, permanently)
+
+    client.delete = recording_delete  # type: ignore[method-assign]
+    client.upload_folder(src, Path("p"), pack_below=10**6, pack_size=4096)
+
+    assert deleted and all(permanently for _, permanently in deleted)
+
+
+def test_whole_archive_restore_refuses_corrupt_archive(
+        server: StubDiskServer, client: YandexDiskClient, tmp_path: Path
+) -> None:
+    src, out = tmp_path / "src", tmp_path / "out"
+    _versioned(src, 1)
+    client.upload_folder(src, Path("p"), pack_below=10**6, pack_size=4096)
+    key = next(key for key in _pack_files(server) if key.endswith("-000001.tar"))
+    data = bytearray(server.state.files[key].data)
+    data[1536:1540] = b"ZZZZ"
+    server.state.store(key, bytes(data))
+
+    restored = client.restore_packed(Path("p"), out)
+
+    assert any(not result.ok and result.remote_path.as_posix() == key for result in restored)
+    assert all(result.ok for result in restored if result.remote_path.as_posix() != key)
+    for result in restored:
+        if result.local_path.exists():
+            assert result.local_path.read_text() == (src / result.local_path.name).read_text()
@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import threading
+import time
+from pathlib import Path
+from typing import Callable
+
+import pytest
+import requests
+
+import client as client_module
+from client import YandexDiskClient, _HrefPrefetcher
+from stub_server import StubDiskServer
+from tests.helpers import write_files
+
+
+def _href_response() -> requests.Response:
+    response = requests.Response()
+    response.status_code = 200
+    response._content = b'{"href": "http://example/upload"}'
+    return response
+
+
+def _wait_for(condition: Callable[[], bool]) -> None:
+    deadline = time.monotonic() + 5
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.005)
+
+
+GatedFetch = tuple[Callable[[Path], requests.Response], list[Path], threading.Event]
+
+
+@pytest.fixture
+def gated_fetch() -> GatedFetch:
+    """Запрос ссылки, который записывает путь и ждет release"""
+    started: list[Path] = []
+    release = threading.Event()
+    response = _href_response()
+
+    def fetch(remote_path: Path) -> requests.Response:
+        started.append(remote_path)
+        release.wait(5)
+        return response
+
+    return fetch, started, release
+
+
+def test_prefetch_keeps_at_most_lookahead_hrefs_in_flight(gated_fetch: GatedFetch) -> None:
+    fetch, started, release = gated_fetch
+    with _HrefPrefetcher(fetch, lookahead=2, workers=4) as prefetcher:
+        for i in range(5):
+            prefetcher.add(Path(f"f{i}"))
+        _wait_for(lambda: len(started) == 2)
+        time.sleep(0.05)
+        assert started == [Path("f0"), Path("f1")]
+
+        release.set()
+        assert prefetcher.take(Path("f0")) is not None
+        _wait_for(lambda: len(started) == 3)
+
+    assert started[2] == Path("f2")
+
+
+def test_unstarted_href_is_left_to_the_caller(gated_fetch: GatedFetch) -> None:
+    fetch, started, release = gated_fetch
+    with _HrefPrefetcher(fetch, lookahead=1) as prefetcher:
+        prefetcher.add(Path("f0"))
+        prefetcher.add(Path("f1"))
+
+        assert prefetcher.take(Path("f1")) is None
+        release.set()
+
+    assert started == [Path("f0")]
+
+
+def test_expired_or_failed_href_is_not_used(monkeypatch: pytest.MonkeyPatch) -> None:
+    def fail(remote_path: Path) -> requests.Response:
+        raise requests.ConnectionError("down")
+
+    with _HrefPrefetcher(fail, lookahead=1) as prefetcher:
+        prefetcher.add(Path("f"))
+        assert prefetcher.take(Path("f")) is None
+
+    monkeypatch.setattr(client_module, "HREF_TTL", -1)
+    with _HrefPrefetcher(lambda remote_path: _href_response(), lookahead=1) as prefetcher:
+        prefetcher.add(Path("f"))
+        assert prefetcher.take(Path("f")) is None
+
+
+def test_upload_files_request_one_href_per_file(
+        server: StubDiskServer, client: YandexDiskClient, tmp_path: Path
+) -> None:
+    write_files(tmp_path, {f"f{i}.txt": str(i) * 100 for i in range(8)})
+    client.create_folder(Path("r"))
+
+    results = client.upload_files([(tmp_path / f"f{i}.txt", Path(f"r/f{i}.txt")) for i in range(8)], jobs=3)
+
+    assert all(result.ok for result in results)
+    assert [server.state.files[f"r/f{i}.txt"].data for i in range(8)] == [str(i).encode() * 100 for i in range(8)]
+    assert server.requests["upload_href"] == server.requests["upload_data"] == 8
+
+
+def test_download_files_request_one_href_per_file(
+        server: StubDiskServer, client: YandexDiskClient, tmp_path: Path
+) -> None:
+    for i in range(8):
+        server.state.store(f"f{i}.bin", bytes([i]) * 1000)
+    pairs = [(Path(f"f{i}.bin"), tmp_path / f"f{i}.bin") for i in range(8)]
+
+    results = client.download_files(pairs, jobs=3)
+
+    assert all(result.ok for result in results)
+    assert [(tmp_path / f"f{i}.bin").read_bytes() for i in range(8)] == [bytes([i]) * 1000 for i in range(8)]
+    assert server.requests["download_href"] == server.requests["download_data"] == 8
+
+
+def test_missing_file_fails_only_its_download(
+        server: StubDiskServer, client: YandexDiskClient, tmp_path: Path
+) -> None:
+    server.state.store("a.bin", b"a")
+    server.state.store("c.bin", b"c")
+    names = ("a.bin", "missing.bin", "c.bin")
+
+    results = client.download_files([(Path(name), tmp_path / name) for name in names], jobs=2)
+
+    assert [result.ok for result in results] == [True, False, True]
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["a.bin", "c.bin"]
+    assert server.requests["download_href"] == 3
@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import time
+
+import pytest
+
+from ratelimit import AdaptiveRateLimiter
+
+
+def test_slow_start_then_additive_increase() -> None:
+    limiter = AdaptiveRateLimiter(rate=10.0, increase=1.0)
+
+    limiter.on_response(200)
+    limiter.on_response(200)
+    assert limiter.rate == 12.0
+
+    limiter.on_response(429)
+    assert limiter.rate == 6.0
+    limiter.on_response(200)
+    assert limiter.rate == pytest.approx(6.0 + 1.0 / 6.0)
+
+
+def test_decrease_once_per_cooldown() -> None:
+    limiter = AdaptiveRateLimiter(rate=40.0, cooldown=60.0)
+
+    limiter.on_response(429)
+    limiter.on_response(429)
+
+    assert limiter.rate == 20.0
+
+
+def test_rate_stays_within_bounds() -> None:
+    limiter = AdaptiveRateLimiter(rate=2.0, min_rate=1.5, max_rate=3.0, cooldown=0.0)
+
+    for _ in range(3):
+        limiter.on_response(429)
+    assert limiter.rate == 1.5
+
+    for _ in range(100):
+        limiter.on_response(200)
+    assert limiter.rate == 3.0
+
+
+def test_server_errors_do_not_change_rate() -> None:
+    limiter = AdaptiveRateLimiter(rate=10.0)
+
+    limiter.on_response(503)
+
+    assert limiter.rate == 10.0
+
+
+def test_acquire_waits_after_burst() -> None:
+    limiter = AdaptiveRateLimiter(rate=20.0, burst=2.0)
+
+    started = time.monotonic()
+    for _ in range(4):
+        limiter.acquire()
+    elapsed = time.monotonic() - started
+
+    assert 0.08 <= elapsed < 1.0
@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import email.utils
+import time
+
+import pytest
+import requests
+
+from retry import RetryBudget, RetryPolicy, call_with_retry, parse_retry_after
+
+
+def _response(status: int, headers: dict[str, str] | None = None) -> requests.Response:
+    response = requests.Response()
+    response.status_code = status
+    response.headers.update(headers or {})
+    response._content = b""
+    response._content_consumed = True
+    return response
+
+
+class _Server:
+    """Отдает заранее заданные ответы или исключения по одному на вызов"""
+
+    def __init__(self, *outcomes: int | Exception, headers: dict[str, str] | None = None) -> None:
+        self._outcomes = list(outcomes)
+        self._headers = headers
+        self.calls = 0
+
+    def __call__(self) -> requests.Response:
+        outcome = self._outcomes[min(self.calls, len(self._outcomes) - 1)]
+        self.calls += 1
+        if isinstance(outcome, Exception):
+            raise outcome
+        return _response(outcome, self._headers)
+
+
+def _call(
+        send: _Server, policy: RetryPolicy, budget: RetryBudget | None = None
+) -> tuple[requests.Response, list[float]]:
+    sleeps: list[float] = []
+    response = call_with_retry(send, policy, budget or RetryBudget(), sleeps.append)
+    return response, sleeps
+
+
+def test_retries_until_success() -> None:
+    send = _Server(503, 500, 200)
+
+    response, sleeps = _call(send, RetryPolicy(backoff=1.0, jitter=0.0))
+
+    assert response.status_code == 200
+    assert send.calls == 3
+    assert sleeps == [1.0, 2.0]
+
+
+def test_other_statuses_are_not_retried() -> None:
+    send = _Server(404)
+
+    response, sleeps = _call(send, RetryPolicy())
+
+    assert response.status_code == 404
+    assert send.calls == 1 and sleeps == []
+
+
+def test_last_response_after_all_attempts() -> None:
+    send = _Server(503)
+
+    response, sleeps = _call(send, RetryPolicy(attempts=3))
+
+    assert response.status_code == 503
+    assert send.calls == 3 and len(sleeps) == 2
+
+
+def test_network_errors_are_retried_then_raised() -> None:
+    send = _Server(requests.ConnectionError("down"))
+
+    with pytest.raises(requests.ConnectionError):
+        _call(send, RetryPolicy(attempts=2))
+    assert send.calls == 2
+
+    assert _call(_Server(requests.Timeout("slow"), 200), RetryPolicy())[0].status_code == 200
+
+
+def test_retry_after_overrides_backoff() -> None:
+    _, sleeps = _call(_Server(429, 200, headers={"Retry-After": "7"}), RetryPolicy(backoff=0.1))
+    assert sleeps == [7.0]
+
+    _, sleeps = _call(_Server(429, 200, headers={"Retry-After": "600"}), RetryPolicy(max_backoff=30.0))
+    assert sleeps == [30.0]
+
+
+def test_budget_limits_retries() -> None:
+    budget = RetryBudget(ratio=0.0, reserve=2.0)
+
+    _call(_Server(503), RetryPolicy(attempts=10), budget)
+    send = _Server(503, 200)
+    response, sleeps = _call(send, RetryPolicy(attempts=10), budget)
+
+    assert response.status_code == 503
+    assert send.calls == 1 and sleeps == []
+
+
+def test_backoff_grows_and_is_capped() -> None:
+    policy = RetryPolicy(backoff=0.5, max_backoff=4.0, jitter=0.0)
+    assert [policy.delay(attempt) for attempt in range(5)] == [0.5, 1.0, 2.0, 4.0, 4.0]
+
+    jittered = RetryPolicy(backoff=0.5, max_backoff=4.0, jitter=1.0)
+    assert all(0.0 <= jittered.delay(3) <= 4.0 for _ in range(100))
+
+
+def test_parse_retry_after() -> None:
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after("12") == 12.0
+    assert parse_retry_after("-3") == 0.0
+    later = email.utils.formatdate(time.time() + 60, usegmt=True)
+    assert 55 <= parse_retry_after(later) <= 60
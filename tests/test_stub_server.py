@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+from typing import Any
+
+import requests
+
+from stub_server import StubDiskServer
+
+HEADERS = {"Authorization": "OAuth stub"}
+
+
+def _api(server: StubDiskServer, method: str, route: str, **params: Any) -> requests.Response:
+    return requests.request(method, f"{server.base_url}{route}", headers=HEADERS, params=params)
+
+
+def test_folder_creation_errors(server: StubDiskServer) -> None:
+    assert _api(server, "PUT", "/resources", path="a").status_code == 201
+
+    exists = _api(server, "PUT", "/resources", path="a")
+    missing_parent = _api(server, "PUT", "/resources", path="b/c")
+
+    assert (exists.status_code, exists.json()["error"]) == (409, "DiskPathPointsToExistentDirectoryError")
+    assert (missing_parent.status_code, missing_parent.json()["error"]) == (409, "DiskPathDoesntExistsError")
+    assert _api(server, "GET", "/resources", path="missing").status_code == 404
+
+
+def test_listing_pages_and_fields(server: StubDiskServer) -> None:
+    server.state.dirs["d"] = "2024-01-01T00:00:00+00:00"
+    for i in range(5):
+        server.state.store(f"d/f{i}.txt", b"x" * i)
+
+    page = _api(server, "GET", "/resources", path="d", offset=2, limit=2, fields="_embedded.total,_embedded.items.name")
+
+    assert page.json() == {"_embedded": {"total": 5, "items": [{"name": "f2.txt"}, {"name": "f3.txt"}]}}
+    assert server.requests["resources"] == 1
+
+
+def test_upload_and_ranged_download(server: StubDiskServer) -> None:
+    href = _api(server, "GET", "/resources/upload", path="f.bin", overwrite="true").json()["href"]
+    assert requests.put(href, data=b"0123456789").status_code == 201
+    assert server.state.files["f.bin"].data == b"0123456789"
+
+    download = _api(server, "GET", "/resources/download", path="f.bin").json()["href"]
+    part = requests.get(download, headers={"Range": "bytes=2-4"})
+
+    assert (part.status_code, part.content, part.headers["Content-Range"]) == (206, b"234", "bytes 2-4/10")
+    assert requests.get(download, headers={"Range": "bytes=10-"}).status_code == 416
+    assert requests.get(download).content == b"0123456789"
+
+
+def test_api_rate_limit_answers_429(server: StubDiskServer) -> None:
+    server.api_rate_limit = 1
+    server._api_tokens = 0.0
+
+    assert _api(server, "GET", "").status_code == 429
+    assert server.requests["rejected"] == 1
@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import json
+import os
+import time
+from pathlib import Path
+
+import pytest
+
+from client import YandexDiskClient
+from stub_server import StubDiskServer
+from sync import SyncAction, plan_sync, run_sync
+from tests.helpers import write_files
+
+
+def _plan(client: YandexDiskClient, local: Path, direction: str, delete: bool = False) -> list[SyncAction]:
+    return list(plan_sync(client, local, Path("r"), direction, delete))
+
+
+def _kinds(actions: list[SyncAction]) -> list[tuple[str, str]]:
+    return [(action.kind, action.local_path.name) for action in actions]
+
+
+def _age(path: Path, seconds: float) -> None:
+    moment = time.time() + seconds
+    os.utime(path, (moment, moment))
+
+
+@pytest.fixture
+def remote(client: YandexDiskClient) -> Path:
+    client.create_folder(Path("r"))
+    return Path("r")
+
+
+def test_unknown_direction(client: YandexDiskClient, tmp_path: Path) -> None:
+    with pytest.raises(ValueError):
+        _plan(client, tmp_path, "sideways")
+
+
+def test_push_then_nothing_to_do(client: YandexDiskClient, remote: Path, tmp_path: Path) -> None:
+    write_files(tmp_path, {"a.txt": "a", "sub/b.txt": "b"})
+
+    plan = _plan(client, tmp_path, "push")
+
+    assert sorted(_kinds(plan)) == [("mkdir", "sub"), ("upload", "a.txt"), ("upload", "b.txt")]
+    summary = run_sync(client, plan)
+    assert not summary.failed
+    assert _plan(client, tmp_path, "push") == []
+
+
+def test_push_delete_removes_remote_only_files(
+        server: StubDiskServer, client: YandexDiskClient, remote: Path, tmp_path: Path
+) -> None:
+    server.state.store("r/gone.txt", b"x")
+    write_files(tmp_path, {"a.txt": "a"})
+
+    assert sorted(_kinds(_plan(client, tmp_path, "push"))) == [("upload", "a.txt")]
+    assert sorted(_kinds(_plan(client, tmp_path, "push", delete=True))) == [("delete", "gone.txt"), ("upload", "a.txt")]
+
+
+def test_both_does_not_bounce_uploaded_file(client: YandexDiskClient, remote: Path, tmp_path: Path) -> None:
+    """После загрузки modified на Диске новее локального файла, но скачивать его обратно нельзя"""
+    write_files(tmp_path, {"f.txt": "hello"})
+    _age(tmp_path / "f.txt", -100)
+
+    run_sync(client, _plan(client, tmp_path, "both"))
+
+    assert _plan(client, tmp_path, "both") == []
+    (tmp_path / "f.txt").write_text("HELLO")
+    _age(tmp_path / "f.txt", 10)
+    assert _kinds(_plan(client, tmp_path, "both")) == [("upload", "f.txt")]
+
+
+def test_pull_with_delete(
+        server: StubDiskServer, client: YandexDiskClient, remote: Path, tmp_path: Path
+) -> None:
+    server.state.store("r/new.txt", b"remote")
+    write_files(tmp_path, {"local.txt": "l"})
+
+    plan = _plan(client, tmp_path, "pull", delete=True)
+
+    assert sorted(_kinds(plan)) == [("delete_local", "local.txt"), ("download", "new.txt")]
+    assert not run_sync(client, plan).failed
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["new.txt"]
+    assert (tmp_path / "new.txt").read_bytes() == b"remote"
+
+
+def test_compressed_files_match_their_originals(
+        server: StubDiskServer, client: YandexDiskClient, remote: Path, tmp_path: Path
+) -> None:
+    """x.log.gz, сжатый при загрузке, соответствует локальному x.log и не скачивается и не удаляется заново"""
+    src, dst = tmp_path / "src", tmp_path / "dst"
+    write_files(src, {"x.log": "\n".join(json.dumps({"i": i, "msg": "hello world"}) for i in range(3000))})
+    client.upload_files([(src / "x.log", Path("r/x.log"))], compress="gzip")
+    assert "r/x.log.gz" in server.state.files
+    dst.mkdir()
+
+    for _ in range(2):
+        assert not run_sync(client, _plan(client, dst, "pull", delete=True)).failed
+    assert sorted(path.name for path in dst.iterdir()) == ["x.log"]
+    assert (dst / "x.log").read_text() == (src / "x.log").read_text()
+    assert _plan(client, src, "push", delete=True) == []
+    assert _plan(client, src, "both") == []
+
+
+def test_changed_compressed_file_is_compressed_again(
+        server: StubDiskServer, client: YandexDiskClient, remote: Path, tmp_path: Path
+) -> None:
+    write_files(tmp_path, {"x.log": "line\n" * 2000})
+    client.upload_files([(tmp_path / "x.log", Path("r/x.log"))], compress="gzip")
+    (tmp_path / "x.log").write_text("changed\n" * 2000)
+
+    plan = _plan(client, tmp_path, "push")
+
+    assert [(action.kind, action.remote_path.name, action.compress) for action in plan] == [
+        ("upload", "x.log.gz", "gzip")
+    ]
+    assert not run_sync(client, plan).failed
+    assert sorted(key for key in server.state.files if key.startswith("r/")) == ["r/x.log.gz"]
+    assert _plan(client, tmp_path, "both") == []
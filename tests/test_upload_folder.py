@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+from client import YandexDiskClient
+from stub_server import StubDiskServer
+from tests.helpers import write_files
+
+
+def _delta(server: StubDiskServer, before: dict[str, int]) -> dict[str, int]:
+    return {name: count - before.get(name, 0) for name, count in server.requests.items() if count - before.get(name, 0)}
+
+
+def test_skip_unchanged_uploads_only_changed_files(
+        server: StubDiskServer, client: YandexDiskClient, tmp_path: Path
+) -> None:
+    write_files(tmp_path, {"a.txt": "aaa", "b.txt": "bbb", "sub/c.txt": "ccc"})
+    client.upload_folder(tmp_path, Path("r"), jobs=2)
+    (tmp_path / "b.txt").write_text("BBB")
+    before = dict(server.requests)
+
+    results = client.upload_folder(tmp_path, Path("r"), jobs=2, skip_unchanged=True)
+
+    assert sorted(result.local_path.name for result in results if result.skipped) == ["a.txt", "c.txt"]
+    assert all(result.ok for result in results)
+    assert server.state.files["r/b.txt"].data == b"BBB"
+    assert _delta(server, before)["upload_href"] == _delta(server, before)["upload_data"] == 1
+
+
+def test_without_skip_unchanged_everything_is_uploaded(
+        server: StubDiskServer, client: YandexDiskClient, tmp_path: Path
+) -> None:
+    write_files(tmp_path, {"a.txt": "aaa", "b.txt": "bbb"})
+    client.upload_folder(tmp_path, Path("r"))
+    before = dict(server.requests)
+
+    results = client.upload_folder(tmp_path, Path("r"))
+
+    assert not any(result.skipped for result in results)
+    assert _delta(server, before)["upload_data"] == 2
+
+
+def test_new_tree_creates_each_folder_once(server: StubDiskServer, client: YandexDiskClient, tmp_path: Path) -> None:
+    """Одна проверка корня, затем по одному PUT на каждую недостающую папку"""
+    write_files(tmp_path, {"a/b/c/1.txt": "1", "a/d/2.txt": "2", "e/3.txt": "3", "4.txt": "4"})
+    (tmp_path / "empty").mkdir()
+    client.create_folder(Path("dst"))
+    before = dict(server.requests)
+
+    results = client.upload_folder(tmp_path, Path("dst/r"), jobs=4)
+
+    assert all(result.ok for result in results) and len(results) == 10
+    assert {"dst/r/a/b/c", "dst/r/a/d", "dst/r/e", "dst/r/empty"} <= set(server.state.dirs)
+    assert _delta(server, before)["resources"] == 1 + 7
+    assert _delta(server, before)["upload_data"] == 4
+
+
+def test_existing_folders_are_listed_not_created(
+        server: StubDiskServer, client: YandexDiskClient, tmp_path: Path
+) -> None:
+    write_files(tmp_path, {"a/b/1.txt": "1", "c/2.txt": "2"})
+    client.upload_folder(tmp_path, Path("r"), jobs=4)
+    client.invalidate_dir_cache()
+    before = dict(server.requests)
+
+    results = client.upload_folder(tmp_path, Path("r"), jobs=4)
+
+    assert all(result.ok for result in results)
+    assert sorted(result.remote_path.as_posix() for result in results if result.response is None) == [
+        "r/a", "r/a/b", "r/c"
+    ]
+    assert _delta(server, before)["resources"] == 4, "по одному листингу на каждую существующую папку"
+
+
+def test_folder_that_cannot_be_created_fails_its_contents(
+        server: StubDiskServer, client: YandexDiskClient, tmp_path: Path
+) -> None:
+    write_files(tmp_path, {"a/1.txt": "1", "a/sub/2.txt": "2", "b.txt": "b"})
+    client.create_folder(Path("r"))
+    server.state.store("r/a", b"file in the way")
+
+    results = {result.remote_path.as_posix(): result for result in client.upload_folder(tmp_path, Path("r"), jobs=2)}
+
+    assert results["r/b.txt"].ok
+    assert not any(results[path].ok for path in ("r/a", "r/a/1.txt", "r/a/sub", "r/a/sub/2.txt"))
+    assert server.state.files["r/a"].data == b"file in the way"
+
+
+def test_skip_unchanged_matches_compressed_counterpart(
+        server: StubDiskServer, client: YandexDiskClient, tmp_path: Path
+) -> None:
+    """x.log.gz прошлой загрузки с compress соответствует x.log: без изменений он пропускается, иначе сжимается снова"""
+    write_files(tmp_path, {"x.log": "line\n" * 2000})
+    client.upload_folder(tmp_path, Path("r"), compress="gzip")
+
+    results = client.upload_folder(tmp_path, Path("r"), skip_unchanged=True)
+
+    assert [result.skipped for result in results] == [True]
+    (tmp_path / "x.log").write_text("changed\n" * 2000)
+    assert all(result.ok for result in client.upload_folder(tmp_path, Path("r"), skip_unchanged=True))
+    assert sorted(key for key in server.state.files if key.startswith("r/")) == ["r/x.log.gz"]
+    assert server.state.files["r/x.log.gz"].custom_properties["original_size"] == len("changed\n" * 2000)